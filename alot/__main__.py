@@ -9,11 +9,11 @@ import sys
 import alot
 from alot.settings.const import settings
 from alot.settings.errors import ConfigError
+from alot.settings.utils import ConfigCache
 from alot.helper import get_xdg_env
 from alot.db.manager import DBManager
 from alot.ui import UI
-from alot.commands import *
-from alot.commands import CommandParseError, COMMANDS
+from alot.commands import CommandParseError, COMMANDS, load_commands
 from alot.utils import argparse as cargparse
 
 from twisted.internet import asyncioreactor
@@ -21,7 +21,7 @@ asyncioreactor.install()
 
 
 _SUBCOMMANDS = ['search', 'compose', 'bufferlist', 'taglist', 'namedqueries',
-                'pyshell']
+                'outbox', 'pyshell']
 
 
 def parser():
@@ -71,6 +71,7 @@ def parser():
         # We have a command after the initial options so we also parse that.
         # But we just use the parser that is already defined for the internal
         # command that will back this subcommand.
+        load_commands('global')
         parser = argparse.ArgumentParser()
         subparsers = parser.add_subparsers(dest='subcommand')
         for subcommand in _SUBCOMMANDS:
@@ -107,6 +108,10 @@ def main():
         if os.path.exists(alotconfig):
             cpath = alotconfig
 
+    # validated config files are cached between runs
+    cache_dir = get_xdg_env('XDG_CACHE_HOME', os.path.expanduser('~/.cache'))
+    settings.cache = ConfigCache(os.path.join(cache_dir, 'alot', 'config'))
+
     try:
         settings.read_config(cpath)
         settings.read_notmuch_config(options.notmuch_config)
@@ -4,15 +4,24 @@
 # This file is released under the GNU GPL, version 3 or a later revision.
 # For further details see the COPYING file
 import abc
-import glob
+import email.generator
+import email.message
+import email.parser
+import email.utils
+import io
 import logging
 import mailbox
 import operator
 import os
 import re
+import socket
+import time
+import uuid
 
 from .helper import call_cmd_async
+from .helper import SpooledMail
 from .helper import split_commandstring
+from .smtp import SMTPError, SMTPPool
 
 
 class Address:
@@ -160,6 +169,72 @@ class StoreMailError(Exception):
     pass
 
 
+def _maildir_name():
+    """a new unique file name for a maildir, as described in maildir(5)"""
+    host = socket.gethostname().replace('/', r'\057').replace(':', r'\072')
+    return '{:.6f}.P{}Q{}.{}'.format(time.time(), os.getpid(),
+                                     uuid.uuid4().hex, host)
+
+
+def _write_message(fp, msg):
+    """
+    writes `msg` to the binary file `fp` with unix line endings, like
+    :class:`mailbox.Maildir` stores mails
+
+    :type msg: :class:`email.message.Message`, str, bytes or binary file
+    """
+    if isinstance(msg, email.message.Message):
+        email.generator.BytesGenerator(fp, mangle_from_=False,
+                                       maxheaderlen=0).flatten(msg)
+        return
+    if isinstance(msg, str):
+        msg = msg.encode('utf-8', 'surrogateescape')
+    if isinstance(msg, bytes):
+        msg = io.BytesIO(msg)
+    for line in msg:
+        if line.endswith(b'\r\n'):
+            line = line[:-2] + b'\n'
+        elif line.endswith(b'\r'):
+            line = line[:-1] + b'\n'
+        fp.write(line)
+
+
+def add_to_maildir(mbx, msg, flags=''):
+    """
+    writes `msg` into a new file in the `tmp/` directory of the maildir `mbx`
+    and, once it is complete, renames it into `new/`. Unlike
+    :meth:`mailbox.Maildir.add` this returns the path of the file.
+
+    :param mbx: the maildir
+    :type mbx: :class:`mailbox.Maildir`
+    :param msg: the mail
+    :type msg: :class:`email.message.Message`, str, bytes or binary file
+    :param flags: maildir flags to set, e.g. 'S'
+    :type flags: str
+    :returns: absolute path of the new file
+    :rtype: str
+    """
+    name = _maildir_name()
+    tmp = os.path.join(mbx._path, 'tmp', name)
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    try:
+        with open(fd, 'wb') as f:
+            _write_message(f, msg)
+            f.flush()
+            os.fsync(f.fileno())
+        if flags:
+            name += mbx.colon + '2,' + flags
+        path = os.path.join(mbx._path, 'new', name)
+        os.rename(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    return path
+
+
 class Account:
     """
     Datastructure that represents an email account. It manages this account's
@@ -168,7 +243,8 @@ class Account:
     .. note::
         This is an abstract class that leaves :meth:`send_mail` unspecified.
         See :class:`SendmailAccount` for a subclass that uses a sendmail
-        command to send out mails.
+        command to send out mails and :class:`SMTPAccount` for one that
+        talks to an SMTP or LMTP server.
     """
 
     __metaclass__ = abc.ABCMeta
@@ -264,10 +340,15 @@ class Account:
         stores given mail in mailbox. If mailbox is maildir, set the S-flag and
         return path to newly added mail. Oherwise this will return `None`.
 
+        Maildirs are written to directly, without locking them (see
+        :func:`add_to_maildir`). As this blocks on the disk, it is best called
+        from a worker thread.
+
         :param mbx: mailbox to use
         :type mbx: :class:`mailbox.Mailbox`
         :param mail: the mail to store
-        :type mail: :class:`email.message.Message` or str
+        :type mail: :class:`email.message.Message`, str or
+                    :class:`~alot.helper.SpooledMail`
         :returns: absolute path of mail-file for Maildir or None if mail was
                   successfully stored
         :rtype: str or None
@@ -277,15 +358,25 @@ class Account:
             logging.debug('Not a mailbox')
             return False
 
-        mbx.lock()
-        if isinstance(mbx, mailbox.Maildir):
+        if isinstance(mail, SpooledMail):
+            # copied over as it is, without parsing it again
+            msg = mail.open()
+        elif isinstance(mbx, mailbox.Maildir):
             logging.debug('Maildir')
             msg = mailbox.MaildirMessage(mail)
-            msg.set_flags('S')
         else:
             logging.debug('no Maildir')
             msg = mailbox.Message(mail)
 
+        if isinstance(mbx, mailbox.Maildir):
+            try:
+                path = add_to_maildir(mbx, msg, flags='S')
+            except Exception as e:
+                raise StoreMailError(e)
+            logging.debug('path of saved msg: %s', path)
+            return path
+
+        mbx.lock()
         try:
             message_id = mbx.add(msg)
             mbx.flush()
@@ -293,31 +384,22 @@ class Account:
             logging.debug('got mailbox msg id : %s', message_id)
         except Exception as e:
             raise StoreMailError(e)
-
-        path = None
-        # add new Maildir message to index and add tags
-        if isinstance(mbx, mailbox.Maildir):
-            # this is a dirty hack to get the path to the newly added file
-            # I wish the mailbox module were more helpful...
-            plist = glob.glob1(os.path.join(mbx._path, 'new'),
-                               message_id + '*')
-            if plist:
-                path = os.path.join(mbx._path, 'new', plist[0])
-                logging.debug('path of saved msg: %s', path)
-        return path
+        return None
 
     def store_sent_mail(self, mail):
         """
-        stores mail (:class:`email.message.Message` or str) in send-store if
-        :attr:`sent_box` is set.
+        stores mail (:class:`email.message.Message`, str or
+        :class:`~alot.helper.SpooledMail`) in send-store if :attr:`sent_box`
+        is set.
         """
         if self.sent_box is not None:
             return self.store_mail(self.sent_box, mail)
 
     def store_draft_mail(self, mail):
         """
-        stores mail (:class:`email.message.Message` or str) as draft if
-        :attr:`draft_box` is set.
+        stores mail (:class:`email.message.Message`, str or
+        :class:`~alot.helper.SpooledMail`) as draft if :attr:`draft_box` is
+        set.
         """
         if self.draft_box is not None:
             return self.store_mail(self.draft_box, mail)
@@ -328,11 +410,16 @@ class Account:
         sends given mail
 
         :param mail: the mail to send
-        :type mail: :class:`email.message.Message` or string
+        :type mail: :class:`email.message.Message`, string or
+                    :class:`~alot.helper.SpooledMail`
         :raises SendingMailFailed: if sending fails
         """
         pass
 
+    async def close(self):
+        """close the connections this account keeps open, if any"""
+        pass
+
 
 class SendmailAccount(Account):
     """:class:`Account` that pipes a message to a `sendmail` shell command for
@@ -350,14 +437,20 @@ class SendmailAccount(Account):
         """Pipe the given mail to the configured sendmail command.  Display a
         short message on success or a notification on error.
         :param mail: the mail to send out
-        :type mail: :class:`email.message.Message` or string
+        :type mail: :class:`email.message.Message`, string or
+                    :class:`~alot.helper.SpooledMail`
         :raises: class:`SendingMailFailed` if sending failes
         """
         cmdlist = split_commandstring(self.cmd)
+        if isinstance(mail, SpooledMail):
+            # the command reads the spooled file itself
+            stdin = mail.open()
+        else:
+            # make sure self.mail is a string
+            stdin = str(mail)
 
         try:
-            # make sure self.mail is a string
-            out, err, code = await call_cmd_async(cmdlist, stdin=str(mail))
+            out, err, code = await call_cmd_async(cmdlist, stdin=stdin)
             if code != 0:
                 msg = 'The sendmail command {} returned with code {}{}'.format(
                     self.cmd, code, ':\n' + err.strip() if err else '.')
@@ -367,3 +460,70 @@ class SendmailAccount(Account):
             raise SendingMailFailed(str(e))
         logging.info('sent mail successfully')
         logging.info(out)
+
+
+class SMTPAccount(Account):
+    """:class:`Account` that hands mails to a local SMTP or LMTP server.
+
+    The connections to the server are kept open and reused for subsequent
+    mails, and the commands of each transaction are pipelined if the server
+    supports it. Like `sendmail -t`, envelope sender and recipients are taken
+    from the (Resent-)From, To, Cc and Bcc headers, and Bcc headers are left
+    out of the mail sent.
+    """
+
+    HIDDEN_HEADERS = ('Bcc', 'Resent-Bcc')
+    """headers that are not passed on to the server"""
+
+    def __init__(self, url, connections=2, **kwargs):
+        """
+        :param url: the server to connect to, `smtp://host[:port]` or
+                    `lmtp://host[:port]`, or `smtp:///path/to/socket` or
+                    `lmtp:///path/to/socket` for a unix domain socket
+        :type url: str
+        :param connections: maximal number of connections to keep open
+        :type connections: int
+        """
+        super(SMTPAccount, self).__init__(**kwargs)
+        self.url = url
+        self.pool = SMTPPool(url, size=connections)
+
+    async def close(self):
+        await self.pool.close()
+
+    def _envelope(self, headers):
+        """returns envelope sender and recipients for a mail's headers"""
+        prefix = 'Resent-' if 'Resent-From' in headers or \
+            'Resent-To' in headers else ''
+        sender = email.utils.parseaddr(headers.get(prefix + 'From', ''))[1]
+        values = []
+        for name in ('To', 'Cc', 'Bcc'):
+            values += headers.get_all(prefix + name, [])
+        recipients = [a for _, a in email.utils.getaddresses(values) if a]
+        return sender or str(self.address), recipients
+
+    async def send_mail(self, mail):
+        """Hand the given mail to the configured server.
+        :param mail: the mail to send out
+        :type mail: :class:`email.message.Message`, string or
+                    :class:`~alot.helper.SpooledMail`
+        :raises: class:`SendingMailFailed` if sending failes
+        """
+        if isinstance(mail, SpooledMail):
+            headers, data = mail.headers, mail.open()
+        elif isinstance(mail, email.message.Message):
+            headers, data = mail, io.BytesIO(str(mail).encode('utf-8'))
+        else:
+            headers = email.parser.HeaderParser().parsestr(str(mail))
+            data = io.BytesIO(str(mail).encode('utf-8'))
+        sender, recipients = self._envelope(headers)
+        if not recipients:
+            raise SendingMailFailed('no recipients')
+
+        try:
+            await self.pool.send(sender, recipients, data,
+                                 hidden=self.HIDDEN_HEADERS)
+        except SMTPError as e:
+            logging.error(str(e))
+            raise SendingMailFailed(str(e))
+        logging.info('sent mail successfully')
@@ -4,6 +4,8 @@
 import re
 import abc
 
+from .index import ContactIndex
+
 
 class AddressbookError(Exception):
     pass
@@ -17,23 +19,58 @@ class AddressBook:
         This is an abstract class that leaves :meth:`get_contacts`
         unspecified. See :class:`AbookAddressBook` and
         :class:`ExternalAddressbook` for implementations.
+
+    Lookups are answered from a :class:`~alot.addressbook.index.ContactIndex`
+    that is built on first use and rebuilt only if :meth:`contacts_changed`
+    says so.
     """
 
     __metaclass__ = abc.ABCMeta
 
     def __init__(self, ignorecase=True):
         self.reflags = re.IGNORECASE if ignorecase else 0
+        self._index = None
 
     @abc.abstractmethod
     def get_contacts(self):  # pragma no cover
         """list all contacts tuples in this abook as (name, email) tuples"""
         return []
 
-    def lookup(self, query=''):
-        """looks up all contacts where name or address match query"""
-        res = []
-        query = re.compile('.*%s.*' % re.escape(query), self.reflags)
-        for name, email in self.get_contacts():
-            if query.match(name) or query.match(email):
-                res.append((name, email))
-        return res
+    def contacts_changed(self):
+        """
+        returns `True` if the contacts may have changed since they were last
+        listed by :meth:`get_contacts`.
+        """
+        return False
+
+    def get_index(self):
+        """
+        returns the index of all contacts in this abook, rebuilding it if
+        they changed.
+
+        :rtype: :class:`~alot.addressbook.index.ContactIndex`
+        """
+        if self._index is None or self.contacts_changed():
+            self._index = self._build_index(self.get_contacts())
+        return self._index
+
+    def _build_index(self, contacts):
+        return ContactIndex(contacts,
+                            ignorecase=bool(self.reflags & re.IGNORECASE))
+
+    def lookup(self, query='', limit=None):
+        """
+        looks up all contacts where name or address match query, best
+        matches first
+
+        :param limit: return at most that many contacts
+        :type limit: int
+        """
+        return self.get_index().lookup(query, limit)
+
+    async def lookup_async(self, query='', limit=None):
+        """
+        coroutine version of :meth:`lookup` for address books that have to
+        wait for other processes. By default, this just calls :meth:`lookup`.
+        """
+        return self.lookup(query, limit)
@@ -17,11 +17,26 @@ class AbookAddressBook(AddressBook):
         DEFAULTSPATH = os.path.join(os.path.dirname(__file__), '..',
                                     'defaults')
         self._spec = os.path.join(DEFAULTSPATH, 'abook_contacts.spec')
-        path = os.path.expanduser(path)
-        self._config = read_config(path, self._spec)
+        self._path = os.path.expanduser(path)
+        self._read()
+
+    def _mtime(self):
+        try:
+            return os.stat(self._path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _read(self):
+        self._read_mtime = self._mtime()
+        self._config = read_config(self._path, self._spec)
         del self._config['format']
 
+    def contacts_changed(self):
+        return self._mtime() != self._read_mtime
+
     def get_contacts(self):
+        if self.contacts_changed():
+            self._read()
         c = self._config
         res = []
         for id in c.sections:
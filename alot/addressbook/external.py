@@ -2,8 +2,10 @@
 # This file is released under the GNU GPL, version 3 or a later revision.
 # For further details see the COPYING file
 import re
+import time
 
 from ..helper import call_cmd
+from ..helper import call_cmd_async
 from ..helper import split_commandstring
 from . import AddressBook, AddressbookError
 import logging
@@ -13,7 +15,7 @@ class ExternalAddressbook(AddressBook):
     """:class:`AddressBook` that parses a shell command's output"""
 
     def __init__(self, commandline, regex, reflags=0,
-                 external_filtering=True,
+                 external_filtering=True, cache_ttl=0,
                  **kwargs):
         """
         :param commandline: commandline
@@ -37,6 +39,9 @@ class ExternalAddressbook(AddressBook):
                         additional parameters and the result list is filtered
                         according to the search string.
         :type external_filtering: bool
+        :param cache_ttl: seconds for which the output of the command is
+                          re-used for further lookups (0 disables caching)
+        :type cache_ttl: int
         """
         AddressBook.__init__(self, **kwargs)
         self.commandline = commandline
@@ -44,19 +49,66 @@ class ExternalAddressbook(AddressBook):
         if reflags:
             self.reflags = reflags
         self.external_filtering = external_filtering
+        self.cache_ttl = cache_ttl
+        self._listed = None  # time of the last call to get_contacts
+        self._results = {}  # prefix -> results of externally filtered lookups
+        self._results_time = None
+
+    def _expired(self, since):
+        return since is None or time.monotonic() - since >= self.cache_ttl
+
+    def contacts_changed(self):
+        return self._expired(self._listed)
 
     def get_contacts(self):
+        self._listed = time.monotonic()
         return self._call_and_parse(self.commandline)
 
-    def lookup(self, prefix):  # pragma: no cover
+    def _cached_results(self, prefix):
+        """
+        the results of an earlier externally filtered lookup of `prefix`, or
+        None if there is none or they are too old
+        """
+        if self._expired(self._results_time):
+            self._results = {}
+            self._results_time = time.monotonic()
+        return self._results.get(prefix)
+
+    def lookup(self, prefix, limit=None):
         if self.external_filtering:
-            return self._call_and_parse(self.commandline + " " + prefix)
+            results = self._cached_results(prefix)
+            if results is None:
+                results = self._call_and_parse(
+                    self.commandline + " " + prefix)
+                self._results[prefix] = results
+            return results[:limit]
         else:
-            return AddressBook.lookup(self, prefix)
+            return AddressBook.lookup(self, prefix, limit)
+
+    async def lookup_async(self, prefix, limit=None):
+        """like :meth:`lookup`, but runs the command asynchronously"""
+        if self.external_filtering:
+            results = self._cached_results(prefix)
+            if results is None:
+                results = await self._call_and_parse_async(
+                    self.commandline + " " + prefix)
+                self._results[prefix] = results
+            return results[:limit]
+        if self._index is None or self.contacts_changed():
+            self._listed = time.monotonic()
+            contacts = await self._call_and_parse_async(self.commandline)
+            self._index = self._build_index(contacts)
+        return self._index.lookup(prefix, limit)
 
     def _call_and_parse(self, commandline):
         cmdlist = split_commandstring(commandline)
-        resultstring, errmsg, retval = call_cmd(cmdlist)
+        return self._parse(commandline, *call_cmd(cmdlist))
+
+    async def _call_and_parse_async(self, commandline):
+        cmdlist = split_commandstring(commandline)
+        return self._parse(commandline, *await call_cmd_async(cmdlist))
+
+    def _parse(self, commandline, resultstring, errmsg, retval):
         if retval != 0:
             msg = 'abook command "%s" returned with ' % commandline
             msg += 'return code %d' % retval
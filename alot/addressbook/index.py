@@ -0,0 +1,133 @@
+# This file is released under the GNU GPL, version 3 or a later revision.
+# For further details see the COPYING file
+from array import array
+from bisect import bisect_right
+from collections import defaultdict
+import re
+
+
+class ContactIndex:
+    """
+    Index over (name, email) contacts that answers substring queries
+    without scanning all contacts.
+
+    For every string of up to three characters the index lists the contacts
+    with a name or address that starts with it, the contacts with another
+    word that starts with it, and, for trigrams, all contacts that contain
+    it. All lists keep the order of the contacts, so lookups that are
+    limited to the best few results stop as soon as they have found them.
+    """
+
+    _WORD_SEPARATORS = str.maketrans(' .-_<@', '\n' * 6)
+    _WORD_START = re.compile(r'(?<![^\n .\-_<@])[^\n .\-_<@]')
+
+    def __init__(self, contacts, ignorecase=True):
+        """
+        :param contacts: name and address pairs
+        :type contacts: list of (str, str)
+        :param ignorecase: match queries case-insensitively
+        :type ignorecase: bool
+        """
+        self.contacts = list(contacts)
+        self.ignorecase = ignorecase
+        self._keys = [self._normalize('%s\n%s' % (name or '', email))
+                      for name, email in self.contacts]
+        # the keys with all word separators replaced by newlines
+        self._words = [key.translate(self._WORD_SEPARATORS)
+                       for key in self._keys]
+        # all keys in one string, and the offset of each key in it
+        self._text = '\0'.join(self._keys)
+        self._offsets = array('I')
+        offset = 0
+        for key in self._keys:
+            self._offsets.append(offset)
+            offset += len(key) + 1
+        trigrams = defaultdict(list)
+        heads = (defaultdict(list), defaultdict(list))
+        for i, key in enumerate(self._keys):
+            for trigram in {key[j:j + 3] for j in range(len(key) - 2)}:
+                trigrams[trigram].append(i)
+            found = (set(), set())
+            for match in self._WORD_START.finditer(key):
+                p = match.start()
+                rank = 0 if p == 0 or key[p - 1] == '\n' else 1
+                found[rank].update((key[p], key[p:p + 2], key[p:p + 3]))
+            for rank in (0, 1):
+                for head in found[rank]:
+                    heads[rank][head].append(i)
+        self._trigrams = {t: array('I', ids) for t, ids in trigrams.items()}
+        self._heads = tuple({h: array('I', ids) for h, ids in table.items()}
+                            for table in heads)
+
+    def __len__(self):
+        return len(self.contacts)
+
+    def _normalize(self, text):
+        return text.lower() if self.ignorecase else text
+
+    def _name_matches(self, query):
+        """the contacts whose name or address starts with `query`"""
+        ids = self._heads[0].get(query[:3], ())
+        if len(query) <= 3:
+            return ids
+        keys = self._keys
+        start = '\n' + query
+        return (i for i in ids
+                if keys[i].startswith(query) or start in keys[i])
+
+    def _word_matches(self, query):
+        """the contacts with a word that starts with `query`"""
+        ids = self._heads[1].get(query[:3], ())
+        if len(query) <= 3:
+            return ids
+        words = self._words
+        start = '\n' + query.translate(self._WORD_SEPARATORS)
+        return (i for i in ids if start in words[i])
+
+    def _substring_matches(self, query):
+        """the contacts that contain `query`"""
+        if len(query) >= 3:
+            rarest = None
+            for j in range(len(query) - 2):
+                ids = self._trigrams.get(query[j:j + 3])
+                if ids is None:
+                    return
+                if rarest is None or len(ids) < len(rarest):
+                    rarest = ids
+            keys = self._keys
+            yield from (i for i in rarest if query in keys[i])
+            return
+        text = self._text
+        offsets = self._offsets
+        at = text.find(query)
+        while at != -1:
+            i = bisect_right(offsets, at) - 1
+            yield i
+            # continue after the contact just found
+            at = text.find(query, offsets[i] + len(self._keys[i]) + 1)
+
+    def lookup(self, query='', limit=None):
+        """
+        returns the contacts whose name or address contain `query`. Contacts
+        where one of them starts with `query` come first, followed by those
+        where a word in them starts with it.
+
+        :param limit: return at most that many contacts
+        :type limit: int
+        :rtype: list of (str, str)
+        """
+        query = self._normalize(query)
+        if not query:
+            return self.contacts[:limit]
+        found = []
+        seen = set()
+        for matches in (self._name_matches(query),
+                        self._word_matches(query),
+                        self._substring_matches(query)):
+            for i in matches:
+                if i not in seen:
+                    seen.add(i)
+                    found.append(self.contacts[i])
+                    if len(found) == limit:
+                        return found
+        return found
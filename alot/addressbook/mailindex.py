@@ -0,0 +1,286 @@
+# This file is released under the GNU GPL, version 3 or a later revision.
+# For further details see the COPYING file
+import asyncio
+import base64
+import email.utils
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+from notmuch import Database, NotmuchError
+
+from . import AddressBook
+from ..helper import get_xdg_env
+from ..scheduler import scheduler
+
+
+class NotmuchAddressBook(AddressBook):
+    """
+    :class:`AddressBook` of everyone that appears in the From, To or Cc
+    headers of the messages in the notmuch index.
+
+    Contacts are ranked by how often and how recently they occurred: each
+    address scores the number of messages it appeared in, weighted down by
+    half for every `halflife` days since the last one.
+
+    The contact table is kept in a gzipped cache file together with the
+    database revision it was built at. Later updates only look at the messages
+    that were added or modified since (using notmuch's ``lastmod:`` prefix),
+    the whole index is only scanned if the cache is missing or belongs to a
+    different database. While the interface is running, updates run as a
+    background job of the :class:`~alot.scheduler.IdleScheduler`.
+    """
+
+    HEADERS = ('From', 'To', 'Cc')
+    """headers to collect addresses from"""
+
+    UPDATE_PRIORITY = 20
+    """scheduler priority of the job that updates the contact table"""
+
+    CHECK_INTERVAL = 5
+    """seconds between checks whether the index got modified"""
+
+    _CACHE_VERSION = 1
+
+    def __init__(self, query='*', path=None, cachefile=None, halflife=90,
+                 **kwargs):
+        """
+        :param query: notmuch query selecting the messages to learn from
+        :type query: str
+        :param path: path to the notmuch index, `None` uses the one in the
+                     notmuch config alot read
+        :type path: str
+        :param cachefile: file to keep the contact table in, `None` picks one
+                          below $XDG_CACHE_HOME/alot/contacts
+        :type cachefile: str
+        :param halflife: days after which an occurrence counts half as much
+        :type halflife: float
+        """
+        AddressBook.__init__(self, **kwargs)
+        self.query = query
+        self.path = path
+        if cachefile is None:
+            digest = hashlib.sha1(query.encode('utf-8')).hexdigest()[:16]
+            cachefile = os.path.join(
+                get_xdg_env('XDG_CACHE_HOME',
+                            os.path.expanduser('~/.cache')),
+                'alot', 'contacts', digest)
+        self.cachefile = os.path.expanduser(cachefile)
+        self.halflife = halflife
+        self._table = None  # lowercase address -> [address, name, count, date]
+        self._seen = set()  # digests of the message ids counted already
+        self._uuid = None
+        self._revision = 0
+        self._changed = False
+        self._job = None
+        self._updating = False
+        self._next_check = 0
+        self._lock = threading.Lock()
+
+    def _open_database(self):
+        path = self.path
+        if path is None:
+            # imported here, the settings import this module
+            from ..settings.const import settings
+            path = settings.get_notmuch_setting('database', 'path')
+        return Database(path=path)
+
+    def _load(self):
+        """read the contact table from the cache file, if there is one"""
+        self._table = {}
+        self._seen = set()
+        self._uuid = None
+        self._revision = 0
+        try:
+            with gzip.open(self.cachefile, 'rt', encoding='utf-8') as f:
+                data = json.load(f)
+            if (data['version'] != self._CACHE_VERSION or
+                    data['query'] != self.query):
+                return
+            seen = base64.b64decode(data['seen'])
+            self._table = {c[0].lower(): c for c in data['contacts']}
+            self._seen = {seen[i:i + 8] for i in range(0, len(seen), 8)}
+            self._uuid = data['uuid']
+            self._revision = data['revision']
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logging.warning('ignoring broken contacts cache %s: %s',
+                            self.cachefile, e)
+            self._table = {}
+            self._seen = set()
+
+    def _save(self):
+        with self._lock:
+            data = json.dumps({
+                'version': self._CACHE_VERSION,
+                'query': self.query,
+                'uuid': self._uuid,
+                'revision': self._revision,
+                'contacts': list(self._table.values()),
+                'seen': base64.b64encode(b''.join(self._seen)).decode('ascii'),
+            }, separators=(',', ':'))
+        tmp = self.cachefile + '.tmp'
+        try:
+            os.makedirs(os.path.dirname(self.cachefile), exist_ok=True)
+            with gzip.open(tmp, 'wt', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp, self.cachefile)
+        except OSError as e:
+            logging.warning('could not write contacts cache %s: %s',
+                            self.cachefile, e)
+
+    def _add_message(self, msg, found):
+        """
+        count the addresses in the headers of `msg` into `found` unless the
+        message was counted before
+        """
+        digest = hashlib.blake2b(msg.get_message_id().encode('utf-8'),
+                                 digest_size=8).digest()
+        if digest in self._seen:
+            return
+        self._seen.add(digest)
+        date = msg.get_date()
+        values = [msg.get_header(header) for header in self.HEADERS]
+        for name, address in email.utils.getaddresses(values):
+            if '@' not in address:
+                continue
+            contact = found.get(address.lower())
+            if contact is None:
+                found[address.lower()] = [address, name, 1, date]
+                continue
+            contact[2] += 1
+            if date >= contact[3]:
+                contact[3] = date
+                contact[1] = name or contact[1]
+
+    def _merge(self, found):
+        for key, (address, name, count, date) in found.items():
+            contact = self._table.get(key)
+            if contact is None:
+                self._table[key] = [address, name, count, date]
+                continue
+            contact[2] += count
+            if date >= contact[3]:
+                contact[3] = date
+                contact[1] = name or contact[1]
+
+    def _update(self):
+        """
+        bring the contact table up to date with the index, yielding after
+        each message read
+        """
+        with self._lock:
+            if self._updating:
+                return
+            self._updating = True
+            if self._table is None:
+                self._load()
+        try:
+            db = self._open_database()
+            revision, uuid = db.get_revision()
+            if uuid != self._uuid:
+                # a new or rebuilt database: revisions are not comparable
+                self._seen = set()
+                self._revision = 0
+            if revision == self._revision:
+                return
+            querystring = self.query
+            if self._revision:
+                querystring = '(%s) and lastmod:%d..%d' % (
+                    self.query, self._revision + 1, revision)
+            logging.debug('updating contacts from %r', querystring)
+            # collect into a separate table so that lookups meanwhile (maybe
+            # from a completion thread) see a consistent one
+            found = {}
+            for msg in db.create_query(querystring).search_messages():
+                self._add_message(msg, found)
+                yield
+            with self._lock:
+                if uuid != self._uuid:
+                    self._table = {}
+                self._merge(found)
+                self._uuid = uuid
+                self._revision = revision
+                self._changed = True
+            self._save()
+        finally:
+            self._updating = False
+
+    def _run_update(self):
+        try:
+            yield from self._update()
+        finally:
+            self._job = None
+
+    def update(self):
+        """synchronously bring the contact table up to date with the index"""
+        for _ in self._update():
+            pass
+
+    def _index_revision(self):
+        try:
+            return self._open_database().get_revision()
+        except NotmuchError as e:
+            logging.warning('could not read notmuch revision: %s', e)
+            return self._revision, self._uuid
+
+    def _schedule_update(self):
+        if self._job is None and not self._updating:
+            self._job = scheduler.schedule(
+                self._run_update(), priority=self.UPDATE_PRIORITY,
+                name='contacts from %r' % self.query)
+
+    def _request_update(self):
+        try:
+            loop = asyncio.get_event_loop()
+        except RuntimeError:
+            # a worker thread, e.g. one that computes completions
+            loop = None
+        if loop is not None and loop.is_running():
+            self._schedule_update()
+        elif scheduler.loop is not None:
+            scheduler.loop.call_soon_threadsafe(self._schedule_update)
+        elif loop is not None:
+            # nothing runs background jobs, as outside of the interface
+            self.update()
+        # otherwise the next check after the interface started schedules it
+
+    def contacts_changed(self):
+        """
+        returns `True` if an update of the contact table finished since the
+        contacts got last listed. At most every :attr:`CHECK_INTERVAL`
+        seconds, this checks whether the index got modified and if so,
+        starts an update as a background job of the scheduler. Only when
+        there is no event loop to run it on, the update is run right away.
+        """
+        if self._table is None:
+            return True
+        now = time.monotonic()
+        if self._job is None and not self._updating and \
+                now >= self._next_check:
+            self._next_check = now + self.CHECK_INTERVAL
+            if self._index_revision() != (self._revision, self._uuid):
+                self._request_update()
+        return self._changed
+
+    def get_contacts(self):
+        if self._table is None:
+            with self._lock:
+                if self._table is None:
+                    self._load()
+            self.contacts_changed()
+        self._changed = False
+        now = time.time()
+
+        def score(contact):
+            age = max(now - contact[3], 0) / 86400
+            return contact[2] * 0.5 ** (age / self.halflife)
+
+        with self._lock:
+            ranked = sorted(self._table.values(), key=score, reverse=True)
+        return [(name, address) for address, name, _, _ in ranked]
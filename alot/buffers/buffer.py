@@ -25,6 +25,13 @@ class Buffer:
         """tells the buffer to (re)construct its visible content."""
         pass
 
+    def refresh(self):
+        """
+        tells the buffer to update its visible content, e.g. after the index
+        changed. Unless overwritten this simply calls :meth:`rebuild`.
+        """
+        self.rebuild()
+
     def keypress(self, size, key):
         return self.body.keypress(size, key)
 
@@ -0,0 +1,73 @@
+# This file is released under the GNU GPL, version 3 or a later revision.
+# For further details see the COPYING file
+import urwid
+
+from .buffer import Buffer
+from ..outbox import outbox
+from ..settings.const import settings
+from ..widgets.outbox import OutboxlineWidget
+
+
+class OutboxBuffer(Buffer):
+    """lists the mails waiting in the outbox to be sent"""
+
+    modename = 'outbox'
+
+    def __init__(self, ui):
+        self.ui = ui
+        self.isinitialized = False
+        self.entrylist = None
+        self.rebuild()
+        Buffer.__init__(self, ui, self.body)
+
+    def rebuild(self):
+        if self.isinitialized:
+            focusposition = self.entrylist.get_focus()[1] or 0
+        else:
+            focusposition = 0
+
+        lines = []
+        for (num, entry) in enumerate(outbox.entries):
+            line = OutboxlineWidget(entry)
+            if (num % 2) == 0:
+                attr = settings.get_theming_attribute('outbox', 'line_even')
+            else:
+                attr = settings.get_theming_attribute('outbox', 'line_odd')
+            focus_att = settings.get_theming_attribute('outbox', 'line_focus')
+
+            line = urwid.AttrMap(line, attr, focus_att)
+            lines.append(line)
+
+        self.entrylist = urwid.ListBox(urwid.SimpleListWalker(lines))
+        self.body = self.entrylist
+
+        if lines:
+            self.entrylist.set_focus(min(focusposition, len(lines) - 1))
+
+        self.isinitialized = True
+
+    def focus_first(self):
+        """Focus the first queued mail."""
+        if self.entrylist.body:
+            self.body.set_focus(0)
+
+    def focus_last(self):
+        allpos = self.entrylist.body.positions(reverse=True)
+        if allpos:
+            lastpos = allpos[0]
+            self.body.set_focus(lastpos)
+
+    def get_selected_entry(self):
+        """returns the selected :class:`~alot.outbox.OutboxEntry` or None"""
+        focus = self.entrylist.get_focus()[0]
+        if focus is None:
+            return None
+        return focus.original_widget.entry
+
+    def get_info(self):
+        info = {}
+
+        info['queued_count'] = len(outbox.entries)
+        info['failed_count'] = len([e for e in outbox.entries if e.attempts])
+
+        return info
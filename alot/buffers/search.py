@@ -1,6 +1,8 @@
 # Copyright (C) 2011-2018  Patrick Totzke <patricktotzke@gmail.com>
 # This file is released under the GNU GPL, version 3 or a later revision.
 # For further details see the COPYING file
+import itertools
+
 import urwid
 from notmuch import NotmuchError
 
@@ -27,8 +29,12 @@ class SearchBuffer(Buffer):
         self.result_count = 0
         self.search_threads_rebuild_limit = \
             settings.get('search_threads_rebuild_limit')
+        self.search_threads_prefetch_limit = \
+            settings.get('search_threads_prefetch_limit')
+        self.search_threads_window = settings.get('search_threads_window')
         self.isinitialized = False
         self.threadlist = None
+        self._revision = None
         self.rebuild()
         Buffer.__init__(self, ui, self.body)
 
@@ -44,27 +50,35 @@ class SearchBuffer(Buffer):
         info['result_count_positive'] = 's' if self.result_count > 1 else ''
         return info
 
-    def rebuild(self, reverse=False):
-        self.isinitialized = True
-        self.reversed = reverse
-        selected_thread = None
-
-        if reverse:
+    def _query_threads(self):
+        """
+        look up the result count, the current index revision and an iterator
+        over the thread ids matching this buffers query.
+        """
+        if self.reversed:
             order = self._REVERSE[self.sort_order]
         else:
             order = self.sort_order
 
-        if self.threadlist:
-            selected_thread = self.get_selected_thread()
-
         exclude_tags = settings.get_notmuch_setting('search', 'exclude_tags')
         if exclude_tags:
             exclude_tags = [t for t in exclude_tags.split(';') if t]
 
+        self.result_count = self.dbman.count_messages(self.querystring)
+        self._revision = self.dbman.get_revision()
+        return self.dbman.get_threads(self.querystring, order, exclude_tags)
+
+    def rebuild(self, reverse=False):
+        self.isinitialized = True
+        self.reversed = reverse
+        selected_thread = None
+
+        if self.threadlist:
+            selected_thread = self.get_selected_thread()
+            self.threadlist.cancel_prefetch()
+
         try:
-            self.result_count = self.dbman.count_messages(self.querystring)
-            threads = self.dbman.get_threads(
-                self.querystring, order, exclude_tags)
+            threads = self._query_threads()
         except NotmuchError:
             self.ui.notify('malformed query string: %s' % self.querystring,
                            'error')
@@ -72,9 +86,11 @@ class SearchBuffer(Buffer):
             self.body = self.listbox
             return
 
-        self.threadlist = IterableWalker(threads, ThreadlineWidget,
-                                         dbman=self.dbman,
-                                         reverse=reverse)
+        self.threadlist = IterableWalker(
+            threads, ThreadlineWidget, dbman=self.dbman, reverse=reverse,
+            key=lambda tid: tid,
+            prefetch=self.search_threads_prefetch_limit,
+            window=self.search_threads_window)
 
         self.listbox = urwid.ListBox(self.threadlist)
         self.body = self.listbox
@@ -82,6 +98,60 @@ class SearchBuffer(Buffer):
         if selected_thread:
             self.focus_thread(selected_thread)
 
+    def refresh(self):
+        """
+        update the result list in place instead of rebuilding it.
+
+        The query is re-run and compared against the thread ids read so far:
+        lines for threads that are still part of the result are re-used and
+        only rebuilt if one of their messages changed since the last update
+        (according to notmuch's `lastmod:` revisions). Lines for new threads
+        are created and the ones for threads that dropped out of the result
+        set are discarded. Focus stays on the selected thread if it is still
+        part of the read thread ids.
+        """
+        if not self.threadlist:
+            return self.rebuild(self.reversed)
+
+        old_revision = self._revision
+        old_tids = self.threadlist.get_items()
+        selected = self.get_selected_threadline()
+        try:
+            threads = self._query_threads()
+            (revision, uuid) = self._revision
+            changed = None
+            if old_revision is not None and old_revision[1] == uuid:
+                if revision > old_revision[0]:
+                    changed = self.dbman.get_changed_thread_ids(
+                        old_revision[0], revision)
+                else:
+                    changed = set()
+        except NotmuchError:
+            return self.rebuild(self.reversed)
+
+        known = set(old_tids)
+        widgets = {w.tid: w for w in self.threadlist.get_lines()}
+        tids = []
+        lines = []
+        for tid in itertools.islice(threads, len(old_tids)):
+            widget = widgets.get(tid)
+            if tid not in known:
+                widget = ThreadlineWidget(tid, dbman=self.dbman)
+            elif widget is not None and (changed is None or tid in changed):
+                widget.rebuild()
+            tids.append(tid)
+            lines.append(widget)
+        self.threadlist.reset(threads, tids, lines)
+
+        if selected is not None:
+            pos = self.threadlist.get_position(selected.tid)
+            if pos is not None:
+                self.body.set_focus(pos)
+
+    def cleanup(self):
+        if self.threadlist:
+            self.threadlist.cancel_prefetch()
+
     def get_selected_threadline(self):
         """
         returns curently focussed :class:`alot.widgets.ThreadlineWidget`
@@ -99,16 +169,8 @@ class SearchBuffer(Buffer):
         return thread
 
     def consume_pipe(self):
-        while not self.threadlist.empty:
-            self.threadlist._get_next_item()
-
-    def consume_pipe_until(self, predicate, limit=0):
-        n = limit
-        while not limit or n > 0:
-            if self.threadlist.empty \
-               or predicate(self.threadlist._get_next_item()):
-                break
-            n -= 1
+        """read all remaining thread ids without building their lines"""
+        self.threadlist.read_all()
 
     def focus_first(self):
         if not self.reversed:
@@ -120,19 +182,17 @@ class SearchBuffer(Buffer):
         if self.reversed:
             self.body.set_focus(0)
         elif self.result_count < 200 or self.sort_order not in self._REVERSE:
+            # thread ids are cheap to read, lines in between the current focus
+            # and the last one get built only once they are scrolled to
             self.consume_pipe()
-            num_lines = len(self.threadlist.get_lines())
-            self.body.set_focus(num_lines - 1)
+            last = self.threadlist.get_last_position()
+            if last is not None:
+                self.body.set_focus(last)
         else:
             self.rebuild(reverse=True)
 
     def focus_thread(self, thread):
         tid = thread.get_thread_id()
-        self.consume_pipe_until(lambda w:
-                                w and w.get_thread().get_thread_id() == tid,
-                                self.search_threads_rebuild_limit)
-
-        for pos, threadlinewidget in enumerate(self.threadlist.get_lines()):
-            if threadlinewidget.get_thread().get_thread_id() == tid:
-                self.body.set_focus(pos)
-                break
+        pos = self.threadlist.find(tid, self.search_threads_rebuild_limit)
+        if pos is not None:
+            self.body.set_focus(pos)
@@ -11,6 +11,7 @@ from .buffer import Buffer
 from ..settings.const import settings
 from ..widgets.thread import ThreadTree
 from .. import commands
+from ..db.cryptopool import pool as cryptopool
 from ..db.errors import NonexistantObjectError
 
 
@@ -33,9 +34,14 @@ class ThreadBuffer(Buffer):
         self._auto_unread_dont_touch_mids = set([])
         self._auto_unread_writing = False
 
+        # messages handed to the crypto pool and how many of them are done
+        self._crypto_task = None
+        self._crypto_progress = (0, 0)
+
         self._indent_width = settings.get('thread_indent_replies')
         self.rebuild()
         Buffer.__init__(self, ui, self.body)
+        self._parse_crypto_messages()
 
     def __str__(self):
         return '[thread] %s (%d message%s)' % (self.thread.get_subject(),
@@ -58,8 +64,55 @@ class ThreadBuffer(Buffer):
         info['intersection_tags'] = self.translated_tags_str(intersection=True)
         info['mimetype'] = (
             self.get_selected_message().get_mime_part().get_content_type())
+        done, total = self._crypto_progress
+        info['crypto_progress'] = \
+            'gpg %d/%d ' % (done, total) if done < total else ''
         return info
 
+    def cleanup(self):
+        if self._crypto_task is not None:
+            self._crypto_task.cancel()
+
+    def _parse_crypto_messages(self):
+        """
+        hand all signed or encrypted messages of this thread to the crypto
+        worker pool, so that they get decrypted and verified concurrently
+        before they are unfolded.
+        """
+        if not cryptopool.workers:
+            return
+        loop = asyncio.get_event_loop()
+        if not loop.is_running():
+            return
+        futures = []
+        for msg in self.thread.get_messages():
+            if msg.uses_crypto():
+                future = msg.parse_in(cryptopool)
+                if future is not None:
+                    futures.append(future)
+        if futures:
+            self._crypto_progress = (0, len(futures))
+            self._crypto_task = loop.create_task(
+                self._track_crypto_progress(futures))
+
+    async def _track_crypto_progress(self, futures):
+        pending = {asyncio.wrap_future(f) for f in futures}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    # errors are dealt with when the message is read
+                    if not future.cancelled():
+                        future.exception()
+                self._crypto_progress = (len(futures) - len(pending),
+                                         len(futures))
+                self.ui.update()
+        except asyncio.CancelledError:
+            for future in futures:
+                future.cancel()
+            raise
+
     def get_selected_thread(self):
         """Return the displayed :class:`~alot.db.Thread`."""
         return self.thread
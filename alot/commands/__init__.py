@@ -3,6 +3,7 @@
 # For further details see the COPYING file
 import argparse
 import glob
+import importlib
 import logging
 import os
 import re
@@ -46,10 +47,36 @@ COMMANDS = {
     'bufferlist': {},
     'taglist': {},
     'namedqueries': {},
+    'outbox': {},
     'thread': {},
     'global': {},
 }
 
+# modules that register the commands of each mode
+_MODULES = {
+    'search': 'search',
+    'envelope': 'envelope',
+    'bufferlist': 'bufferlist',
+    'taglist': 'taglist',
+    'namedqueries': 'namedqueries',
+    'outbox': 'outbox',
+    'thread': 'thread',
+    'global': 'globals',
+}
+
+
+def load_commands(*modes):
+    """
+    makes sure the commands of the given modes are registered in
+    :data:`COMMANDS`. The modules defining them are only imported when
+    their commands are needed first, to keep startup fast.
+
+    :param modes: mode identifiers
+    :type modes: str
+    """
+    for mode in modes:
+        importlib.import_module('.' + _MODULES[mode], __name__)
+
 
 def lookup_command(cmdname, mode):
     """
@@ -63,6 +90,7 @@ def lookup_command(cmdname, mode):
     :rtype: (:class:`Command`, :class:`~argparse.ArgumentParser`,
             dict(str->dict))
     """
+    load_commands(mode, 'global')
     if cmdname in COMMANDS[mode]:
         return COMMANDS[mode][cmdname]
     elif cmdname in COMMANDS['global']:
@@ -3,18 +3,19 @@
 # This file is released under the GNU GPL, version 3 or a later revision.
 # For further details see the COPYING file
 import argparse
+import asyncio
 import datetime
 import email
 import email.policy
 import fnmatch
 import glob
 import logging
+import mailbox
 import os
 import re
 import tempfile
 import textwrap
 import traceback
-import sys
 
 from . import Command, registerCommand
 from . import globals
@@ -24,10 +25,12 @@ from .. import commands
 from .. import crypto
 from ..account import SendingMailFailed, StoreMailError
 from ..db.errors import DatabaseError
-from ..errors import GPGProblem, ConversionError
+from ..errors import AttachmentChanged, GPGProblem, ConversionError
 from ..helper import string_decode
 from ..helper import call_cmd
 from ..helper import split_commandstring
+from ..helper import SpooledMail
+from ..outbox import outbox
 from ..settings.const import settings
 from ..settings.errors import NoMatchingAccount
 from ..utils import argparse as cargparse
@@ -133,10 +136,17 @@ class SaveCommand(Command):
             ui.notify(msg.format(account.address), priority='error')
             return
 
-        mail = envelope.construct_mail()
-        # store mail locally
-        path = account.store_draft_mail(
-            mail.as_string(policy=email.policy.SMTP, maxheaderlen=sys.maxsize))
+        try:
+            mail = SpooledMail(envelope.construct_mail())
+        except AttachmentChanged as e:
+            ui.notify(str(e), priority='error')
+            return
+        # store mail locally, without blocking the interface
+        try:
+            path = await asyncio.get_event_loop().run_in_executor(
+                None, account.store_draft_mail, mail)
+        finally:
+            mail.close()
 
         msg = 'draft saved successfully'
 
@@ -243,19 +253,26 @@ class SendCommand(Command):
                                 timeout=-1)
 
             try:
-                self.mail = self.envelope.construct_mail()
-                self.mail = self.mail.as_string(policy=email.policy.SMTP,
-                                                maxheaderlen=sys.maxsize)
-            except GPGProblem as e:
+                self.mail = SpooledMail(self.envelope.construct_mail())
+            except (GPGProblem, AttachmentChanged) as e:
                 ui.clear_notify([clearme])
                 ui.notify(str(e), priority='error')
                 return
 
             ui.clear_notify([clearme])
 
+        try:
+            await self._send(ui)
+        finally:
+            if isinstance(self.mail, SpooledMail):
+                self.mail.close()
+
+    async def _send(self, ui):
         # determine account to use for sending
         msg = self.mail
-        if not isinstance(msg, email.message.Message):
+        if isinstance(msg, SpooledMail):
+            msg = msg.headers
+        elif not isinstance(msg, email.message.Message):
             msg = email.message_from_string(
                 self.mail, policy=email.policy.SMTP)
         address = msg.get('Resent-From', False) or msg.get('From', '')
@@ -268,6 +285,10 @@ class SendCommand(Command):
             return
         logging.debug("ACCOUNT: \"%s\"" % account.address)
 
+        if settings.get('outbox') and outbox.path is not None:
+            await self._queue(ui, account)
+            return
+
         # send out
         clearme = ui.notify('sending..', timeout=-1)
         if self.envelope is not None:
@@ -307,13 +328,74 @@ class SendCommand(Command):
 
             # store mail locally
             # This can raise StoreMailError
-            path = account.store_sent_mail(self.mail)
+            await _store_sent_mail(ui, account, self.mail, initial_tags)
 
-            # add mail to index if maildir path available
-            if path is not None:
-                logging.debug('adding new mail to index')
-                ui.dbman.add_message(path, account.sent_tags + initial_tags)
-                await ui.apply_command(globals.FlushCommand())
+    async def _queue(self, ui, account):
+        """put the mail into the outbox, to be sent in the background"""
+        tags = []
+        replied = passed = None
+        if self.envelope is not None:
+            tags = list(self.envelope.tags)
+            if self.envelope.replied:
+                replied = self.envelope.replied.get_message_id()
+            if self.envelope.passed:
+                passed = self.envelope.passed.get_message_id()
+        try:
+            outbox.add(self.mail, str(account.address), tags=tags,
+                       replied=replied, passed=passed)
+        except (OSError, mailbox.Error) as e:
+            logging.error(traceback.format_exc())
+            ui.notify('could not queue mail: {}'.format(e),
+                      priority='error', block=True)
+            return
+        if self.envelope is not None:
+            self.envelope.sent_time = datetime.datetime.now()
+        if self.envelope_buffer is not None:
+            cmd = commands.globals.BufferCloseCommand(self.envelope_buffer)
+            await ui.apply_command(cmd)
+        ui.notify('mail queued for sending')
+
+
+async def _store_sent_mail(ui, account, mail, tags):
+    """store a sent mail in the account's sent box and add it to the index"""
+    path = await asyncio.get_event_loop().run_in_executor(
+        None, account.store_sent_mail, mail)
+
+    # add mail to index if maildir path available
+    if path is not None:
+        logging.debug('adding new mail to index')
+        ui.dbman.add_message(path, account.sent_tags + tags)
+        await ui.apply_command(globals.FlushCommand())
+
+
+async def send_queued(ui, entry):
+    """
+    send a mail from the outbox (see :class:`~alot.outbox.Outbox`) and
+    finish up like :class:`SendCommand` does. Raises an exception if sending
+    failed, so that it is retried later.
+
+    :param entry: the queued mail
+    :type entry: :class:`~alot.outbox.OutboxEntry`
+    """
+    account = settings.account_matching_address(entry.account,
+                                                return_default=True)
+    mail = outbox.get_mail(entry)
+    try:
+        await account.send_mail(mail)
+        logging.debug('queued mail sent successfully')
+        try:
+            if entry.replied:
+                ui.dbman.tag('id:' + entry.replied, account.replied_tags)
+            if entry.passed:
+                ui.dbman.tag('id:' + entry.passed, account.passed_tags)
+            await _store_sent_mail(ui, account, mail, entry.tags)
+        except (StoreMailError, DatabaseError) as e:
+            # the mail is out already, it must not be sent again
+            logging.error(traceback.format_exc())
+            ui.notify('could not store sent mail: {}'.format(e),
+                      priority='error')
+    finally:
+        mail.close()
 
 
 @registerCommand(MODE, 'edit', arguments=[
@@ -566,7 +648,7 @@ class SignCommand(Command):
                 keyid = str(' '.join(self.keyid))
                 try:
                     envelope.sign_key = crypto.get_key(keyid, validate=True,
-                                                       sign=True)
+                                                       sign=True, cached=True)
                 except GPGProblem as e:
                     envelope.sign = False
                     ui.notify(str(e), priority='error')
@@ -640,7 +722,7 @@ class EncryptCommand(Command):
         if self.action == 'rmencrypt':
             try:
                 for keyid in self.encrypt_keys:
-                    tmp_key = crypto.get_key(keyid)
+                    tmp_key = crypto.get_key(keyid, cached=True)
                     del envelope.encrypt_keys[tmp_key.fpr]
             except GPGProblem as e:
                 ui.notify(str(e), priority='error')
@@ -657,7 +739,7 @@ class EncryptCommand(Command):
         if encrypt:
             if self.encrypt_keys:
                 for keyid in self.encrypt_keys:
-                    tmp_key = crypto.get_key(keyid)
+                    tmp_key = crypto.get_key(keyid, cached=True)
                     envelope.encrypt_keys[tmp_key.fpr] = tmp_key
             else:
                 await utils.update_keys(ui, envelope, signed_only=self.trusted)
@@ -25,12 +25,15 @@ from .. import buffers
 from .. import helper
 from ..helper import split_commandstring
 from ..helper import mailto_to_envelope
+from ..scheduler import scheduler
 from ..completion.commandline import CommandLineCompleter
 from ..completion.contacts import ContactsCompleter
 from ..completion.accounts import AccountCompleter
 from ..completion.tags import TagsCompleter
 from ..widgets.utils import DialogBox
-from ..db.errors import DatabaseLockedError
+from ..db.errors import DatabaseError, DatabaseLockedError, DatabaseROError
+from ..db.importer import MailImport
+from ..db.utils import is_subdir_of
 from ..db.envelope import Envelope
 from ..settings.const import settings
 from ..settings.errors import ConfigError, NoMatchingAccount
@@ -73,6 +76,7 @@ class ExitCommand(Command):
 
         for b in ui.buffers:
             b.cleanup()
+        await ui.finish_sending()
         await ui.apply_command(FlushCommand(callback=ui.exit))
         ui.cleanup()
 
@@ -119,7 +123,7 @@ class SearchCommand(Command):
                     ui.buffer_focus(to_be_focused)
                 else:
                     # refresh an already displayed search
-                    ui.current_buffer.rebuild()
+                    ui.current_buffer.refresh()
                     ui.update()
             else:
                 ui.buffer_open(buffers.SearchBuffer(ui, self.query,
@@ -168,7 +172,7 @@ class RefreshCommand(Command):
     repeatable = True
 
     def apply(self, ui):
-        ui.current_buffer.rebuild()
+        ui.current_buffer.refresh()
         ui.update()
 
 
@@ -194,7 +198,8 @@ class ExternalCommand(Command):
         """
         :param cmd: the command to call
         :type cmd: list or str
-        :param stdin: input to pipe to the process
+        :param stdin: input to pipe to the process. The process reads
+                      from files that have a file descriptor directly.
         :type stdin: file or str
         :param spawn: run command in a new terminal
         :type spawn: bool
@@ -246,6 +251,7 @@ class ExternalCommand(Command):
 
         # set standard input for subcommand
         stdin = None
+        proc_stdin = None
         if self.stdin is not None:
             # wrap strings in StrinIO so that they behaves like a file
             if isinstance(self.stdin, str):
@@ -254,6 +260,13 @@ class ExternalCommand(Command):
                 stdin = BytesIO(self.stdin.encode('utf-8'))
             else:
                 stdin = self.stdin
+            try:
+                # let the process read real files itself
+                stdin.fileno()
+            except (AttributeError, OSError):
+                proc_stdin = subprocess.PIPE
+            else:
+                proc_stdin, stdin = stdin, None
 
         logging.info('calling external command: %s', self.cmdlist)
 
@@ -275,7 +288,7 @@ class ExternalCommand(Command):
                     *cmdlist,
                     stdout=subprocess.PIPE,
                     stderr=subprocess.PIPE,
-                    stdin=subprocess.PIPE if stdin else None)
+                    stdin=proc_stdin)
             except OSError as e:
                 ret = str(e)
             else:
@@ -289,7 +302,7 @@ class ExternalCommand(Command):
                 try:
                     proc = subprocess.Popen(
                         self.cmdlist, shell=self.shell,
-                        stdin=subprocess.PIPE if stdin else None,
+                        stdin=proc_stdin,
                         stderr=subprocess.PIPE)
                 except OSError as e:
                     ret = str(e)
@@ -371,6 +384,26 @@ class PythonShellCommand(Command):
             code.interact(local=locals())
 
 
+@registerCommand(MODE, 'jobs')
+class JobsCommand(Command):
+
+    """show queued and running background jobs"""
+    def apply(self, ui):
+        text_att = settings.get_theming_attribute('help', 'text')
+        title_att = settings.get_theming_attribute('help', 'title')
+        jobs = scheduler.jobs()
+        if jobs:
+            lines = [urwid.Text((text_att, str(job))) for job in jobs]
+        else:
+            lines = [urwid.Text((text_att, 'no background jobs'))]
+        box = DialogBox(urwid.ListBox(lines), 'Jobs (escape cancels)',
+                        bodyattr=text_att, titleattr=title_att)
+        overlay = urwid.Overlay(box, ui.root_widget, 'center',
+                                ('relative', 70), 'middle',
+                                ('relative', 70))
+        ui.show_as_root_until_keypress(overlay, 'esc')
+
+
 @registerCommand(MODE, 'repeat')
 class RepeatCommand(Command):
 
@@ -591,6 +624,17 @@ class NamedQueriesCommand(Command):
         ui.buffer_open(buffers.NamedQueriesBuffer(ui, self.filtfun))
 
 
+@registerCommand(MODE, 'outbox')
+class OutboxCommand(Command):
+    """opens a buffer listing the mails waiting to be sent"""
+    def apply(self, ui):
+        blist = ui.get_buffers_of_type(buffers.OutboxBuffer)
+        if blist:
+            ui.buffer_focus(blist[0])
+        else:
+            ui.buffer_open(buffers.OutboxBuffer(ui))
+
+
 @registerCommand(MODE, 'flush')
 class FlushCommand(Command):
 
@@ -1034,9 +1078,10 @@ class ComposeCommand(Command):
         # set encryption if needed
         await self._set_gpg_encrypt(ui)
 
-        cmd = commands.envelope.EditCommand(envelope=self.envelope,
-                                            spawn=self.force_spawn,
-                                            refocus=False)
+        # the envelope commands are only loaded once they are needed
+        from .envelope import EditCommand
+        cmd = EditCommand(envelope=self.envelope, spawn=self.force_spawn,
+                          refocus=False)
         await ui.apply_command(cmd)
 
 
@@ -1180,6 +1225,80 @@ class RemoveQueryCommand(Command):
             ui.apply_command(commands.globals.FlushCommand())
 
 
+@registerCommand(
+    MODE, 'import',
+    arguments=[
+        (['--tags'], {'help': 'comma separated list of tags to add',
+                      'default': ''}),
+        (['--folder'], {'default': 'import',
+                        'help': 'maildir to copy mails into that are not '
+                                'below the notmuch root, relative to it'}),
+        (['paths'], {'nargs': '+',
+                     'help': 'maildirs, mbox files or mails to import, '
+                             'may contain glob patterns'}),
+    ],
+    help='add mails from maildirs or mbox files to the index')
+class ImportCommand(Command):
+
+    """add mails to the index in the background"""
+    repeatable = False
+
+    def __init__(self, paths, tags='', folder='import', **kwargs):
+        """
+        :param paths: maildirs, mbox files or mails to import
+        :type paths: list of str
+        :param tags: comma separated list of tags to add
+        :type tags: str
+        :param folder: maildir to copy mails into that are not below the
+                       notmuch root yet
+        :type folder: str
+        """
+        self.paths = paths
+        self.tags = [t for t in tags.split(',') if t]
+        self.folder = folder
+        Command.__init__(self, **kwargs)
+
+    async def apply(self, ui):
+        if ui.dbman.ro:
+            ui.notify('index in read-only mode', priority='error')
+            return
+        sources = []
+        for pattern in self.paths:
+            matches = sorted(glob.glob(os.path.expanduser(pattern)))
+            if not matches:
+                ui.notify('no such file: %s' % pattern, priority='error')
+                return
+            sources.extend(matches)
+        folder = os.path.join(ui.dbman.path, os.path.expanduser(self.folder))
+        if not is_subdir_of(folder, ui.dbman.path):
+            ui.notify('%s is not below the notmuch root' % folder,
+                      priority='error')
+            return
+
+        job = MailImport(ui.dbman, sources, folder, tags=self.tags)
+        loop = asyncio.get_event_loop()
+        job.on_progress = lambda _: loop.call_soon_threadsafe(ui.update)
+        ui.dbman.imports.append(job)
+        ui.update()
+        try:
+            added = await loop.run_in_executor(None, job.run)
+        except (DatabaseError, OSError) as e:
+            logging.exception(e)
+            ui.notify('import failed: %s\nrun it again to resume' % e,
+                      priority='error')
+            return
+        finally:
+            ui.dbman.imports.remove(job)
+            ui.update()
+        if job.cancelled:
+            return
+        msg = 'imported %d new of %d mails' % (added, job.total)
+        if job.skipped:
+            msg += ', skipped %d unreadable ones (see the log)' % job.skipped
+        ui.notify(msg)
+        await ui.apply_command(RefreshCommand())
+
+
 @registerCommand(
     MODE, 'confirmsequence',
     arguments=[
@@ -0,0 +1,39 @@
+# This file is released under the GNU GPL, version 3 or a later revision.
+# For further details see the COPYING file
+from . import Command, registerCommand
+from ..outbox import outbox
+
+MODE = 'outbox'
+
+
+@registerCommand(MODE, 'retry')
+class OutboxRetryCommand(Command):
+
+    """send the selected mail right away instead of at its next attempt"""
+    def apply(self, ui):
+        entry = ui.current_buffer.get_selected_entry()
+        if entry is None:
+            return
+        if entry.sending:
+            ui.notify('mail is being sent already')
+            return
+        outbox.retry(entry)
+
+
+@registerCommand(MODE, 'remove')
+class OutboxRemoveCommand(Command):
+
+    """remove the selected mail from the outbox without sending it"""
+    async def apply(self, ui):
+        entry = ui.current_buffer.get_selected_entry()
+        if entry is None:
+            return
+        if entry.sending:
+            ui.notify('mail is being sent, cannot remove it',
+                      priority='error')
+            return
+        if (await ui.choice('remove mail from outbox?', select='yes',
+                            cancel='no')) == 'no':
+            return
+        if entry in outbox.entries:
+            outbox.remove(entry)
@@ -200,7 +200,7 @@ class TagCommand(Command):
                 searchbuffer.result_count = searchbuffer.dbman.count_messages(
                     searchbuffer.querystring)
             else:
-                searchbuffer.rebuild()
+                searchbuffer.refresh()
 
             ui.update()
 
@@ -3,8 +3,8 @@
 # This file is released under the GNU GPL, version 3 or a later revision.
 # For further details see the COPYING file
 import argparse
+import asyncio
 import logging
-import mailcap
 import os
 import subprocess
 import tempfile
@@ -14,7 +14,6 @@ from email.utils import getaddresses, parseaddr
 from email.message import Message
 
 import urwid
-from io import BytesIO
 
 from . import Command, registerCommand
 from .globals import ExternalCommand
@@ -39,8 +38,11 @@ from ..settings.const import settings
 from ..helper import parse_mailcap_nametemplate
 from ..helper import split_commandstring
 from ..utils import argparse as cargparse
+from ..utils.lazy import lazy_import
 from ..widgets.globals import AttachmentWidget
 
+mailcap = lazy_import('mailcap')
+
 MODE = 'thread'
 
 
@@ -901,13 +903,7 @@ class SaveAttachmentCommand(Command):
                                             completer=pcomplete)
             if self.path:
                 if os.path.isdir(os.path.expanduser(self.path)):
-                    for a in msg.get_attachments():
-                        dest = a.save(self.path)
-                        name = a.get_filename()
-                        if name:
-                            ui.notify('saved %s as: %s' % (name, dest))
-                        else:
-                            ui.notify('saved attachment as: %s' % dest)
+                    await self._save_all(ui, msg.get_attachments())
                 else:
                     ui.notify('not a directory: %s' % self.path,
                               priority='error')
@@ -933,6 +929,52 @@ class SaveAttachmentCommand(Command):
                 else:
                     raise CommandCanceled()
 
+    async def _save_all(self, ui, attachments):
+        """
+        save `attachments` to the directory :attr:`path` concurrently, in
+        threads of the default executor
+        """
+        loop = asyncio.get_event_loop()
+        # attachments of the same name would end up in the same file: save
+        # those one after the other
+        batches = {}
+        for a in attachments:
+            batches.setdefault(a.get_filename() or id(a), []).append(a)
+
+        async def save_batch(batch):
+            saved = []
+            for a in batch:
+                try:
+                    dest = await loop.run_in_executor(None, a.save, self.path)
+                except (IOError, OSError) as e:
+                    dest = e
+                saved.append((a, dest))
+            return saved
+
+        def progress(done):
+            return ui.notify('saved %d of %d attachments' %
+                             (done, len(attachments)), timeout=-1)
+
+        done = 0
+        clearme = progress(done)
+        try:
+            for batch in asyncio.as_completed(
+                    [save_batch(b) for b in batches.values()]):
+                for a, dest in await batch:
+                    if isinstance(dest, Exception):
+                        ui.notify(str(dest), priority='error')
+                        continue
+                    done += 1
+                    name = a.get_filename()
+                    if name:
+                        ui.notify('saved %s as: %s' % (name, dest))
+                    else:
+                        ui.notify('saved attachment as: %s' % dest)
+                ui.clear_notify([clearme])
+                clearme = progress(done)
+        finally:
+            ui.clear_notify([clearme])
+
 
 class OpenAttachmentCommand(Command):
 
@@ -981,8 +1023,9 @@ class OpenAttachmentCommand(Command):
                 def afterwards():
                     os.unlink(tempfile_name)
             else:
-                handler_stdin = BytesIO()
+                handler_stdin = tempfile.TemporaryFile()
                 self.attachment.write(handler_stdin)
+                handler_stdin.seek(0)
 
             # create handler command list
             handler_cmd = mailcap.subst(handler_raw_commandstring, mimetype,
@@ -994,10 +1037,14 @@ class OpenAttachmentCommand(Command):
             # XXX: could this be repalced with "'needsterminal' not in entry"?
             overtakes = entry.get('needsterminal') is None
 
-            await ui.apply_command(ExternalCommand(handler_cmdlist,
-                                                   stdin=handler_stdin,
-                                                   on_success=afterwards,
-                                                   thread=overtakes))
+            try:
+                await ui.apply_command(ExternalCommand(handler_cmdlist,
+                                                       stdin=handler_stdin,
+                                                       on_success=afterwards,
+                                                       thread=overtakes))
+            finally:
+                if handler_stdin is not None:
+                    handler_stdin.close()
         else:
             ui.notify('unknown mime type')
 
@@ -84,14 +84,14 @@ async def _get_keys(ui, encrypt_keyids, block_error=False, signed_only=False):
     for keyid in encrypt_keyids:
         try:
             key = crypto.get_key(keyid, validate=True, encrypt=True,
-                                 signed_only=signed_only)
+                                 signed_only=signed_only, cached=True)
         except GPGProblem as e:
             if e.code == GPGCode.AMBIGUOUS_NAME:
-                tmp_choices = ['{} ({})'.format(k.uids[0].uid, k.fpr) for k in
-                               crypto.list_keys(hint=keyid)]
-                choices = {str(i): t for i, t in enumerate(tmp_choices, 1)}
-                keys_to_return = {str(i): t for i, t in enumerate([k for k in
-                                  crypto.list_keys(hint=keyid)], 1)}
+                candidates = list(crypto.list_keys(hint=keyid, cached=True))
+                choices = {str(i): '{} ({})'.format(k.uids[0].uid, k.fpr)
+                           for i, k in enumerate(candidates, 1)}
+                keys_to_return = {str(i): k
+                                  for i, k in enumerate(candidates, 1)}
                 choosen_key = await ui.choice("ambiguous keyid! Which " +
                                               "key do you want to use?",
                                               choices=choices,
@@ -1,6 +1,7 @@
 # Copyright (C) 2011-2019  Patrick Totzke <patricktotzke@gmail.com>
 # This file is released under the GNU GPL, version 3 or a later revision.
 # For further details see the COPYING file
+import asyncio
 
 from .completer import Completer
 from ..addressbook import AddressbookError
@@ -11,6 +12,9 @@ from ..errors import CompletionError
 class AbooksCompleter(Completer):
     """Complete a contact from given address books."""
 
+    LIMIT = 100
+    """number of contacts to offer from each address book"""
+
     def __init__(self, abooks, addressesonly=False):
         """
         :param abooks: used to look up email addresses
@@ -29,9 +33,24 @@ class AbooksCompleter(Completer):
         res = []
         for abook in self.abooks:
             try:
-                res = res + abook.lookup(prefix)
+                res = res + abook.lookup(prefix, self.LIMIT)
             except AddressbookError as e:
                 raise CompletionError(e)
+        return self._format(res)
+
+    async def complete_async(self, original, pos):
+        if not self.abooks:
+            return []
+        prefix = original[:pos]
+        try:
+            results = await asyncio.gather(
+                *[abook.lookup_async(prefix, self.LIMIT)
+                  for abook in self.abooks])
+        except AddressbookError as e:
+            raise CompletionError(e)
+        return self._format([c for res in results for c in res])
+
+    def _format(self, res):
         if self.addressesonly:
             returnlist = [(addr, len(addr)) for (name, addr) in res]
         else:
@@ -20,6 +20,7 @@ class CommandNameCompleter(Completer):
     def complete(self, original, pos):
         commandprefix = original[:pos]
         logging.debug('original="%s" prefix="%s"', original, commandprefix)
+        commands.load_commands('global', self.mode)
         cmdlist = commands.COMMANDS['global'].copy()
         cmdlist.update(commands.COMMANDS[self.mode])
         matching = [t for t in cmdlist if t.startswith(commandprefix)]
@@ -2,6 +2,7 @@
 # This file is released under the GNU GPL, version 3 or a later revision.
 # For further details see the COPYING file
 import abc
+import asyncio
 
 
 class Completer:
@@ -25,6 +26,18 @@ class Completer:
         """
         pass
 
+    async def complete_async(self, original, pos):
+        """
+        coroutine version of :meth:`complete` that does not block the event
+        loop. By default, :meth:`complete` is run in a worker thread;
+        completers that wait for external commands should override this.
+
+        :rtype: list of (str, int)
+        :raises: :exc:`CompletionError`
+        """
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, self.complete, original, pos)
+
     def relevant_part(self, original, pos):
         """
         Calculate the subword in a ' '-separated list of substrings of
@@ -4,6 +4,7 @@
 
 from alot import crypto
 from .stringlist import StringlistCompleter
+from ..utils.cached_property import cached_property
 
 
 class CryptoKeyCompleter(StringlistCompleter):
@@ -14,11 +15,16 @@ class CryptoKeyCompleter(StringlistCompleter):
         :param private: return private keys
         :type private: bool
         """
-        keys = crypto.list_keys(private=private)
+        self.private = private
+        StringlistCompleter.__init__(self, None, match_anywhere=True)
+
+    @cached_property
+    def resultlist(self):
+        # listing all keys is slow, so it is only done on first completion
         resultlist = []
-        for k in keys:
+        for k in crypto.list_keys(private=self.private, cached=True):
             for s in k.subkeys:
                 resultlist.append(s.keyid)
             for u in k.uids:
                 resultlist.append(u.email)
-        StringlistCompleter.__init__(self, resultlist, match_anywhere=True)
+        return resultlist
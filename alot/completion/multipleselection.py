@@ -39,8 +39,18 @@ class MultipleSelectionCompleter(Completer):
 
     def complete(self, original, pos):
         mypart, start, end, mypos = self.relevant_part(original, pos)
+        return self._insert(original, start, end,
+                            self._completer.complete(mypart, mypos))
+
+    async def complete_async(self, original, pos):
+        mypart, start, end, mypos = self.relevant_part(original, pos)
+        completions = await self._completer.complete_async(mypart, mypos)
+        return self._insert(original, start, end, completions)
+
+    def _insert(self, original, start, end, completions):
+        """put completions of the substring from `start` to `end` in place"""
         res = []
-        for c, _ in self._completer.complete(mypart, mypos):
+        for c, _ in completions:
             newprefix = original[:start] + c
             if not original[end:].startswith(self._separator):
                 newprefix += self._separator
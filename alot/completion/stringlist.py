@@ -1,6 +1,8 @@
 # Copyright (C) 2011-2019  Patrick Totzke <patricktotzke@gmail.com>
 # This file is released under the GNU GPL, version 3 or a later revision.
 # For further details see the COPYING file
+import bisect
+import itertools
 import re
 
 from .completer import Completer
@@ -11,22 +13,45 @@ class StringlistCompleter(Completer):
 
     def __init__(self, resultlist, ignorecase=True, match_anywhere=False):
         """
-        :param resultlist: strings used for completion
+        :param resultlist: strings used for completion, or `None` if a
+                           subclass provides them as `resultlist` attribute
         :type resultlist: list of str
         :param liberal: match case insensitive and not prefix-only
         :type liberal: bool
         """
-        self.resultlist = resultlist
+        if resultlist is not None:
+            self.resultlist = resultlist
         self.flags = re.IGNORECASE if ignorecase else 0
         self.match_anywhere = match_anywhere
+        self._indexed = None  # the resultlist the lists below belong to
+        self._keys = []  # normalized strings, in order of the resultlist
+        self._sorted = []  # sorted pairs of normalized string and position
 
-    def complete(self, original, pos):
-        pref = original[:pos]
-
-        re_prefix = '.*' if self.match_anywhere else ''
+    def _normalize(self, string):
+        return string.lower() if self.flags & re.IGNORECASE else string
 
-        def match(s, m):
-            r = '{}{}.*'.format(re_prefix, re.escape(m))
-            return re.match(r, s, flags=self.flags) is not None
+    def _index(self):
+        """
+        returns the current resultlist, after updating the lookup lists if it
+        has been replaced
+        """
+        resultlist = self.resultlist
+        if resultlist is not self._indexed:
+            self._keys = [self._normalize(s) for s in resultlist]
+            self._sorted = sorted((k, i) for i, k in enumerate(self._keys))
+            self._indexed = resultlist
+        return resultlist
 
-        return [(a, len(a)) for a in self.resultlist if match(a, pref)]
+    def complete(self, original, pos):
+        resultlist = self._index()
+        pref = self._normalize(original[:pos])
+
+        if self.match_anywhere:
+            ids = [i for i, k in enumerate(self._keys) if pref in k]
+        else:
+            # all strings starting with pref are sorted right after it
+            start = bisect.bisect_left(self._sorted, (pref,))
+            ids = sorted(i for _, i in itertools.takewhile(
+                lambda pair: pair[0].startswith(pref),
+                itertools.islice(self._sorted, start, None)))
+        return [(resultlist[i], len(resultlist[i])) for i in ids]
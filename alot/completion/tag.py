@@ -13,5 +13,10 @@ class TagCompleter(StringlistCompleter):
         :param dbman: used to look up available tagstrings
         :type dbman: :class:`~alot.db.DBManager`
         """
-        resultlist = dbman.get_all_tags()
-        StringlistCompleter.__init__(self, resultlist)
+        self.dbman = dbman
+        StringlistCompleter.__init__(self, None)
+
+    @property
+    def resultlist(self):
+        # cached by the DBManager until the index changes
+        return self.dbman.get_all_tags()
@@ -2,9 +2,14 @@
 # Copyright © 2017-2018 Dylan Baker <dylan@pnwbakers.com>
 # This file is released under the GNU GPL, version 3 or a later revision.
 # For further details see the COPYING file
-import gpg
+from collections import OrderedDict
+import os
+import threading
 
 from .errors import GPGProblem, GPGCode
+from .utils.lazy import lazy_import
+
+gpg = lazy_import('gpg')
 
 
 def RFC3156_micalg_from_algo(hash_algo):
@@ -27,7 +32,7 @@ def RFC3156_micalg_from_algo(hash_algo):
 
 
 def get_key(keyid, validate=False, encrypt=False, sign=False,
-            signed_only=False):
+            signed_only=False, cached=False):
     """
     Gets a key from the keyring by filtering for the specified keyid, but
     only if the given keyid is specific enough (if it matches multiple
@@ -52,6 +57,8 @@ def get_key(keyid, validate=False, encrypt=False, sign=False,
     :param signed_only: only return keys  whose uid is signed (trusted to
         belong to the key)
     :type signed_only: bool
+    :param cached: answer from (and remember in) the :data:`keyring` index
+    :type cached: bool
     :returns: A gpg key matching the given parameters
     :rtype: gpg.gpgme._gpgme_key
     :raises ~alot.errors.GPGProblem: if the keyid is ambiguous
@@ -60,7 +67,19 @@ def get_key(keyid, validate=False, encrypt=False, sign=False,
     :raises ~alot.errors.GPGProblem: if a key is found, but signed_only is true
         and the key is unused
     """
-    ctx = gpg.core.Context()
+    if cached:
+        return keyring.get_key(keyid, validate=validate, encrypt=encrypt,
+                               sign=sign, signed_only=signed_only)
+    return _get_key(gpg.core.Context(), list_keys, keyid, validate=validate,
+                    encrypt=encrypt, sign=sign, signed_only=signed_only)
+
+
+def _get_key(ctx, keylist, keyid, validate=False, encrypt=False, sign=False,
+             signed_only=False):
+    """
+    implements :func:`get_key` using the gpg context `ctx` and the function
+    `keylist` to list candidates for ambiguous key ids
+    """
     try:
         key = ctx.get_key(keyid)
         if validate:
@@ -78,7 +97,7 @@ def get_key(keyid, validate=False, encrypt=False, sign=False,
 
             valid_key = None
 
-            for k in list_keys(hint=keyid):
+            for k in keylist(hint=keyid):
                 try:
                     validate_key(k, encrypt=encrypt, sign=sign)
                 except GPGProblem:
@@ -116,7 +135,7 @@ def get_key(keyid, validate=False, encrypt=False, sign=False,
     return key
 
 
-def list_keys(hint=None, private=False):
+def list_keys(hint=None, private=False, cached=False):
     """
     Returns a generator of all keys containing the fingerprint, or all keys if
     hint is None.
@@ -128,13 +147,147 @@ def list_keys(hint=None, private=False):
     :type hint: str or None
     :param private: Whether to return public keys or secret keys
     :type private: bool
+    :param cached: answer from (and remember in) the :data:`keyring` index.
+        A list is returned in this case.
+    :type cached: bool
     :returns: A generator that yields keys.
     :rtype: Generator[gpg.gpgme.gpgme_key_t, None, None]
     """
+    if cached:
+        return keyring.list_keys(hint=hint, private=private)
     ctx = gpg.core.Context()
     return ctx.keylist(hint, private)
 
 
+class KeyringIndex:
+    """
+    Remembers the results of key lookups in the GPG keyring.
+
+    The last `size` results of :func:`get_key` (including failed lookups)
+    are kept by the key id or fingerprint they were looked up with, as are
+    key listings and :func:`check_uid_validity` results. Everything is
+    forgotten as soon as the modification time of one of the keyring files in
+    the GnuPG home directory changes. All lookups share one gpg context and
+    may be made from several threads.
+    """
+
+    KEYRING_FILES = ('pubring.kbx', 'pubring.gpg', 'secring.gpg',
+                     'trustdb.gpg', 'private-keys-v1.d',
+                     # the database of keyboxd (GnuPG 2.4), which writes to
+                     # its log first
+                     'public-keys.d', 'public-keys.d/pubring.db',
+                     'public-keys.d/pubring.db-wal')
+    """files in the GnuPG home whose modification invalidates the index"""
+
+    def __init__(self, size=256):
+        """
+        :param size: number of key lookups and listings to remember
+        :type size: int
+        """
+        self.size = size
+        self._lock = threading.RLock()
+        self._ctx = None
+        self._stamp = None
+        self._keys = OrderedDict()  # lookup arguments -> key or GPGProblem
+        self._keylists = OrderedDict()  # (hint, private) -> list of keys
+        self._validity = {}  # (fingerprint, email) -> bool
+
+    @staticmethod
+    def _homedir():
+        return os.environ.get('GNUPGHOME') or os.path.expanduser('~/.gnupg')
+
+    def stamp(self):
+        """
+        returns a value that changes whenever the keyring or the trust in its
+        keys may have changed
+        """
+        return self._keyring_stamp()
+
+    def _keyring_stamp(self):
+        home = self._homedir()
+        stamp = [home]
+        for name in self.KEYRING_FILES:
+            try:
+                stamp.append(os.stat(os.path.join(home, name)).st_mtime_ns)
+            except OSError:
+                stamp.append(None)
+        return tuple(stamp)
+
+    def _check(self):
+        stamp = self._keyring_stamp()
+        if stamp != self._stamp:
+            self.clear()
+            self._stamp = stamp
+
+    def clear(self):
+        """forget all remembered lookups"""
+        with self._lock:
+            self._ctx = None
+            self._keys.clear()
+            self._keylists.clear()
+            self._validity.clear()
+
+    def _context(self):
+        if self._ctx is None:
+            self._ctx = gpg.core.Context()
+        return self._ctx
+
+    def _remember(self, cache, args, value):
+        cache[args] = value
+        if len(cache) > self.size:
+            cache.popitem(last=False)
+
+    def get_key(self, keyid, validate=False, encrypt=False, sign=False,
+                signed_only=False):
+        """like :func:`get_key`, but answered from the index if possible"""
+        args = (keyid, validate, encrypt, sign, signed_only)
+        with self._lock:
+            self._check()
+            if args in self._keys:
+                self._keys.move_to_end(args)
+                result = self._keys[args]
+            else:
+                try:
+                    result = _get_key(self._context(), self.list_keys, *args)
+                    if not signed_only:
+                        # lookups by fingerprint can use this as well
+                        self._remember(self._keys, (result.fpr,) + args[1:],
+                                       result)
+                except GPGProblem as e:
+                    result = e
+                self._remember(self._keys, args, result)
+        if isinstance(result, GPGProblem):
+            raise GPGProblem(str(result), code=result.code)
+        return result
+
+    def list_keys(self, hint=None, private=False):
+        """like :func:`list_keys`, but returns a (remembered) list"""
+        args = (hint, private)
+        with self._lock:
+            self._check()
+            if args in self._keylists:
+                self._keylists.move_to_end(args)
+            else:
+                keys = list(self._context().keylist(hint, private))
+                self._remember(self._keylists, args, keys)
+            return self._keylists[args]
+
+    def check_uid_validity(self, key, email):
+        """like :func:`check_uid_validity`, but remembers the result"""
+        args = (key.fpr, email)
+        with self._lock:
+            self._check()
+            if args not in self._validity:
+                if len(self._validity) >= self.size:
+                    self._validity.clear()
+                self._validity[args] = check_uid_validity(key, email)
+            return self._validity[args]
+
+
+keyring = KeyringIndex()
+"""the index used for cached key lookups"""
+
+
 def detached_signature_for(plaintext_str, keys):
     """
     Signs the given plaintext string and returns the detached signature.
@@ -206,32 +359,36 @@ def verify_detached(message, signature):
         raise GPGProblem(str(e), code=e.getcode())
 
 
-def decrypt_verify(encrypted, session_keys=None):
+def decrypt_verify(encrypted, session_keys=None, verify=True):
     """Decrypts the given ciphertext string and returns both the
     signatures (if any) and the plaintext.
 
     :param bytes encrypted: the mail to decrypt
     :param list[str] session_keys: a list OpenPGP session keys
+    :param bool verify: verify signatures of the plaintext, if this is
+        `False` no signatures are returned
     :returns: the signatures and decrypted plaintext data
     :rtype: tuple[list[gpg.resuit.Signature], str]
     :raises alot.errors.GPGProblem: if the decryption fails
     """
     if session_keys is not None:
         try:
-            return _decrypt_verify_session_keys(encrypted, session_keys)
+            return _decrypt_verify_session_keys(encrypted, session_keys,
+                                                verify)
         except GPGProblem:
             pass
 
     ctx = gpg.core.Context()
-    return _decrypt_verify_with_context(ctx, encrypted)
+    return _decrypt_verify_with_context(ctx, encrypted, verify)
 
 
-def _decrypt_verify_session_keys(encrypted, session_keys):
+def _decrypt_verify_session_keys(encrypted, session_keys, verify=True):
     """Decrypts the given ciphertext string using the session_keys
     and returns both the signatures (if any) and the plaintext.
 
     :param bytes encrypted: the mail to decrypt
     :param list[str] session_keys: a list OpenPGP session keys
+    :param bool verify: verify signatures of the plaintext
     :returns: the signatures and decrypted plaintext data
     :rtype: tuple[list[gpg.resuit.Signature], str]
     :raises alot.errors.GPGProblem: if the decryption fails
@@ -240,26 +397,27 @@ def _decrypt_verify_session_keys(encrypted, session_keys):
         ctx = gpg.core.Context()
         ctx.set_ctx_flag("override-session-key", key)
         try:
-            return _decrypt_verify_with_context(ctx, encrypted)
+            return _decrypt_verify_with_context(ctx, encrypted, verify)
         except GPGProblem:
             continue
     raise GPGProblem("No valid session key", code=GPGCode.NOT_FOUND)
 
 
-def _decrypt_verify_with_context(ctx, encrypted):
+def _decrypt_verify_with_context(ctx, encrypted, verify=True):
     """Decrypts the given ciphertext string using the gpg context
     and returns both the signatures (if any) and the plaintext.
 
     :param gpg.Context ctx: the gpg context
     :param bytes encrypted: the mail to decrypt
+    :param bool verify: verify signatures of the plaintext
     :returns: the signatures and decrypted plaintext data
     :rtype: tuple[list[gpg.resuit.Signature], str]
     :raises alot.errors.GPGProblem: if the decryption fails
     """
     try:
         (plaintext, _, verify_result) = ctx.decrypt(
-                encrypted, verify=True)
-        sigs = verify_result.signatures
+                encrypted, verify=verify)
+        sigs = verify_result.signatures if verify else []
     except gpg.errors.GPGMEError as e:
         raise GPGProblem(str(e), code=e.getcode())
     except gpg.errors.BadSignatures as e:
@@ -303,7 +461,7 @@ def validate_key(key, sign=False, encrypt=False):
             code=GPGCode.KEY_CANNOT_SIGN)
 
 
-def check_uid_validity(key, email):
+def check_uid_validity(key, email, cached=False):
     """Check that a the email belongs to the given key.  Also check the trust
     level of this connection.  Only if the trust level is high enough (>=4) the
     email is assumed to belong to the key.
@@ -312,9 +470,14 @@ def check_uid_validity(key, email):
     :type key: gpg.gpgme._gpgme_key
     :param email: the email address that should belong to the key
     :type email: str
+    :param cached: answer from (and remember in) the :data:`keyring` index
+    :type cached: bool
     :returns: whether the key can be assumed to belong to the given email
     :rtype: bool
     """
+    if cached:
+        return keyring.check_uid_validity(key, email)
+
     def check(key_uid):
         return (email == key_uid.email and
                 not key_uid.revoked and
@@ -2,13 +2,16 @@
 # Copyright © 2018 Dylan Baker
 # This file is released under the GNU GPL, version 3 or a later revision.
 # For further details see the COPYING file
+import binascii
 import os
 import tempfile
 import email.charset as charset
 from copy import deepcopy
 
 from ..helper import string_decode, humanize_size, guess_mimetype
-from .utils import decode_header
+from ..helper import MAGIC_SAMPLE_SIZE, FilePart
+from .utils import decode_header, get_decoded_size
+from .utils import iter_decoded_payload, DECODE_CHUNK_SIZE
 
 charset.add_charset('utf-8', charset.QP, charset.QP, 'utf-8')
 
@@ -22,6 +25,7 @@ class Attachment:
         :type emailpart: :class:`email.message.Message`
         """
         self.part = emailpart
+        self._content_type = None
 
     def __str__(self):
         desc = '%s:%s (%s)' % (self.get_content_type(),
@@ -44,16 +48,39 @@ class Attachment:
 
     def get_content_type(self):
         """mime type of the attachment part"""
-        ctype = self.part.get_content_type()
-        # replace underspecified mime description by a better guess
-        if ctype in ['octet/stream', 'application/octet-stream',
-                     'application/octetstream']:
-            ctype = guess_mimetype(self.get_data())
-        return ctype
+        if self._content_type is None:
+            ctype = self.part.get_content_type()
+            # replace underspecified mime description by a better guess
+            if ctype in ['octet/stream', 'application/octet-stream',
+                         'application/octetstream']:
+                ctype = guess_mimetype(self._get_sample())
+            self._content_type = ctype
+        return self._content_type
+
+    def _get_sample(self):
+        """
+        returns the start of the decoded data, enough for file magic to
+        guess its type. Only that much of base64 encoded parts is decoded.
+        """
+        if self.part.get('Content-Transfer-Encoding', '').lower() == 'base64':
+            payload = self.part.get_payload()
+            # 4 characters encode 3 bytes, allow for line breaks in between
+            chars = (MAGIC_SAMPLE_SIZE + 2) // 3 * 4
+            encoded = ''.join(payload[:chars * 2].split())[:chars]
+            try:
+                return binascii.a2b_base64(encoded[:len(encoded) // 4 * 4])
+            except binascii.Error:
+                pass
+        return self.get_data()
 
     def get_size(self):
-        """returns attachments size in bytes"""
-        return len(self.part.get_payload())
+        """
+        returns attachments size in bytes, as estimated from its encoded
+        payload (see :func:`~alot.db.utils.get_decoded_size`)
+        """
+        if isinstance(self.part, FilePart):
+            return self.part.get_size()
+        return get_decoded_size(self.part)
 
     def save(self, path):
         """
@@ -75,8 +102,21 @@ class Attachment:
         return file_.name
 
     def write(self, fhandle):
-        """writes content to a given filehandle"""
-        fhandle.write(self.get_data())
+        """
+        writes content to a given filehandle. The content is decoded and
+        written piece by piece (see :meth:`iter_data`).
+        """
+        for chunk in self.iter_data():
+            fhandle.write(chunk)
+
+    def iter_data(self, chunksize=DECODE_CHUNK_SIZE):
+        """
+        yields the content in pieces, without decoding all of it at once
+        (see :func:`~alot.db.utils.iter_decoded_payload`)
+
+        :rtype: iterator of bytes
+        """
+        return iter_decoded_payload(self.part, chunksize)
 
     def get_data(self):
         """return data blob from wrapped file"""
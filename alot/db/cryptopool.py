@@ -0,0 +1,88 @@
+# This file is released under the GNU GPL, version 3 or a later revision.
+# For further details see the COPYING file
+"""
+Parses messages in a pool of worker processes, so that the messages of a
+thread can be decrypted and their signatures verified concurrently instead
+of one after the other in the interface.
+"""
+import concurrent.futures
+import logging
+import multiprocessing
+import sys
+
+from . import utils
+from .verification import cache as verification_cache
+
+
+_cachefile = None  # the verification cache this worker uses
+
+
+def _parse(path, session_keys, cachefile):
+    global _cachefile
+    if cachefile != _cachefile:
+        _cachefile = cachefile
+        if cachefile is not None:
+            verification_cache.open(cachefile)
+    with open(path, 'rb') as f:
+        return utils.decrypted_message_from_bytes(f.read(), session_keys)
+
+
+class CryptoPool:
+    """
+    a pool of processes that read and parse message files.
+
+    The workers are separate processes rather than threads because gpgme
+    keeps per-process state and a decryption may block on the gpg agent.
+    They are started on first use and share the interface's
+    :class:`~alot.db.verification.VerificationCache`.
+    """
+
+    def __init__(self, workers=4):
+        """
+        :param workers: maximal number of messages to parse at the same time
+        :type workers: int
+        """
+        self.workers = workers
+        self._executor = None
+        self._futures = set()  # the submitted jobs that may not be done
+
+    def submit(self, path, session_keys=None):
+        """
+        start reading and parsing the message file at `path`, as
+        :func:`alot.db.utils.decrypted_message_from_bytes` would
+
+        :param path: path of the message file
+        :type path: str
+        :param session_keys: OpenPGP session keys to decrypt with
+        :type session_keys: list of str
+        :returns: a future for the parsed message
+        :rtype: :class:`concurrent.futures.Future`
+        """
+        if self._executor is None:
+            kwargs = {}
+            if sys.version_info >= (3, 7):
+                # a fresh interpreter, as forking would share the open
+                # database connections and the event loop with the workers.
+                # Python 3.6 always uses the default start method.
+                kwargs['mp_context'] = multiprocessing.get_context('spawn')
+            self._executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.workers, **kwargs)
+            logging.debug('started %d crypto workers', self.workers)
+        future = self._executor.submit(_parse, path, session_keys,
+                                       verification_cache.path)
+        self._futures = {f for f in self._futures if not f.done()}
+        self._futures.add(future)
+        return future
+
+    def shutdown(self):
+        """stop all workers, dropping the messages not being parsed yet"""
+        if self._executor is not None:
+            for future in self._futures:
+                future.cancel()
+            self._futures = set()
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+pool = CryptoPool()
+"""the pool used by the interface"""
@@ -12,7 +12,6 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.application import MIMEApplication
 import email.charset as charset
-import gpg
 
 from .attachment import Attachment
 from .. import __version__
@@ -20,6 +19,9 @@ from .. import helper
 from .. import crypto
 from ..settings.const import settings
 from ..errors import GPGProblem, GPGCode
+from ..utils.lazy import lazy_import
+
+gpg = lazy_import('gpg')
 
 charset.add_charset('utf-8', charset.QP, charset.QP, 'utf-8')
 
@@ -0,0 +1,218 @@
+# This file is released under the GNU GPL, version 3 or a later revision.
+# For further details see the COPYING file
+import concurrent.futures
+import hashlib
+import json
+import logging
+import mailbox
+import os
+import threading
+
+from .utils import is_subdir_of
+from ..account import add_to_maildir
+from ..helper import get_xdg_env
+
+
+def _is_mbox(path):
+    with open(path, 'rb') as f:
+        return f.read(5) == b'From '
+
+
+def _is_maildir(path):
+    return all(os.path.isdir(os.path.join(path, d)) for d in ('cur', 'new'))
+
+
+def _maildir_flags(path):
+    """returns the flags in the name of a maildir file"""
+    _, sep, flags = os.path.basename(path).rpartition(':2,')
+    return flags if sep else ''
+
+
+class MailImport:
+    """
+    Adds the mails in maildirs, mbox files, directories or single files to
+    the notmuch index.
+
+    Mails below the notmuch root are indexed where they are, all others are
+    copied into the maildir `folder` first. A pool of threads reads and
+    copies them while the index is written in large batches (see
+    :meth:`~alot.db.manager.DBManager.add_messages`).
+
+    An interrupted import is resumed by running it again with the same
+    sources and folder: mails that are indexed already are skipped, and a
+    journal remembers where the mails copied so far went, so that they are
+    not copied again.
+    """
+
+    WORKERS = 4
+    """number of threads that read and copy mails"""
+
+    BATCH_SIZE = 500
+    """number of mails written to the index in one transaction"""
+
+    def __init__(self, dbman, sources, folder, tags=None, journal=None):
+        """
+        :param dbman: the database manager to index the mails with
+        :type dbman: :class:`~alot.db.manager.DBManager`
+        :param sources: paths of maildirs, directories, mbox files or mails
+        :type sources: list of str
+        :param folder: maildir below the notmuch root to copy mails into,
+                       created when needed
+        :type folder: str
+        :param tags: tags to add to the imported mails
+        :type tags: list of str
+        :param journal: file to remember copied mails in, `None` picks one
+                        below $XDG_CACHE_HOME/alot/import
+        :type journal: str
+        """
+        self.dbman = dbman
+        self.sources = [os.path.abspath(s) for s in sources]
+        self.folder = os.path.abspath(folder)
+        self.tags = tags or []
+        if journal is None:
+            digest = hashlib.sha1(json.dumps(
+                [self.folder] + sorted(self.sources)).encode('utf-8'))
+            journal = os.path.join(
+                get_xdg_env('XDG_CACHE_HOME', os.path.expanduser('~/.cache')),
+                'alot', 'import', digest.hexdigest()[:16])
+        self.journal = journal
+        self.total = 0
+        """number of mails found in the sources"""
+        self.done = 0
+        """number of mails handled so far"""
+        self.added = 0
+        """number of mails that were not in the index before"""
+        self.skipped = 0
+        """number of mails that could not be read or copied"""
+        self.on_progress = None
+        """called with the import after each batch, from a worker thread"""
+        self.cancelled = False
+        self._lock = threading.Lock()
+        self._maildir = None
+        self._mboxes = {}
+        self._copied = {}  # source -> path of its copy
+        self._journal = None
+
+    def collect(self):
+        """
+        returns the mails found in the sources, as paths of files or pairs
+        of an mbox path and a key in it.
+
+        Hidden files and directories are left out, except for the folders
+        of Maildir++ roots (like `.Sent`), which are maildirs themselves.
+        """
+        items = []
+        for source in self.sources:
+            if os.path.isdir(source):
+                for root, dirs, files in os.walk(source):
+                    # tmp/ holds mails of a maildir that are not complete yet
+                    dirs[:] = sorted(
+                        d for d in dirs if d != 'tmp' and (
+                            not d.startswith('.') or
+                            _is_maildir(os.path.join(root, d))))
+                    items.extend(os.path.join(root, name)
+                                 for name in sorted(files)
+                                 if not name.startswith('.'))
+            elif _is_mbox(source):
+                mbox = mailbox.mbox(source, create=False)
+                self._mboxes[source] = mbox
+                items.extend((source, key) for key in mbox.iterkeys())
+            else:
+                items.append(source)
+        return items
+
+    def _load_journal(self):
+        try:
+            with open(self.journal) as f:
+                for line in f:
+                    try:
+                        source, path = json.loads(line)
+                    except ValueError:
+                        # a line cut short by the interruption
+                        continue
+                    self._copied[source] = path
+        except FileNotFoundError:
+            pass
+
+    def _copy(self, item):
+        """
+        returns the path of a copy of mail `item` in :attr:`folder`, making
+        one unless there is one already
+        """
+        if isinstance(item, str):
+            source = item
+        else:
+            source = '%s#%d' % item
+        path = self._copied.get(source)
+        if path is not None and os.path.exists(path):
+            return path
+        with self._lock:
+            if self._maildir is None:
+                self._maildir = mailbox.Maildir(self.folder, create=True)
+        if isinstance(item, str):
+            with open(item, 'rb') as f:
+                path = add_to_maildir(self._maildir, f, _maildir_flags(item))
+        else:
+            with self._lock:
+                data = self._mboxes[item[0]].get_bytes(item[1])
+            path = add_to_maildir(self._maildir, data)
+        with self._lock:
+            self._copied[source] = path
+            self._journal.write(json.dumps([source, path]) + '\n')
+            self._journal.flush()
+        return path
+
+    def _prepare(self, item):
+        """returns the path to index mail `item` from, `None` to skip it"""
+        if isinstance(item, str) and is_subdir_of(item, self.dbman.path):
+            return item
+        try:
+            return self._copy(item)
+        except (OSError, mailbox.Error) as e:
+            logging.warning('could not import %s: %s', item, e)
+            return None
+
+    def _paths(self, pool, items):
+        for start in range(0, len(items), self.BATCH_SIZE):
+            if self.cancelled:
+                return
+            batch = items[start:start + self.BATCH_SIZE]
+            for path in pool.map(self._prepare, batch):
+                if path is None:
+                    self.skipped += 1
+                else:
+                    yield path
+
+    def _progress(self, handled):
+        self.done = handled + self.skipped
+        if self.on_progress is not None:
+            self.on_progress(self)
+
+    def run(self):
+        """
+        import the mails. This blocks until all are indexed or the import
+        got cancelled, call it from a worker thread.
+
+        :returns: number of mails added to the index
+        :rtype: int
+        :raises: :class:`~alot.db.errors.DatabaseError`, :class:`OSError`
+        """
+        items = self.collect()
+        self.total = len(items)
+        logging.info('importing %d mails', self.total)
+        self._load_journal()
+        os.makedirs(os.path.dirname(self.journal), exist_ok=True)
+        with open(self.journal, 'a') as self._journal, \
+                concurrent.futures.ThreadPoolExecutor(self.WORKERS) as pool:
+            self.added = self.dbman.add_messages(
+                self._paths(pool, items), self.tags,
+                batchsize=self.BATCH_SIZE, progress=self._progress)
+        if not self.cancelled:
+            # mails skipped after the last batch are not reported by then
+            self._progress(self.total - self.skipped)
+            os.remove(self.journal)
+        return self.added
+
+    def cancel(self):
+        """stop importing after the current batch"""
+        self.cancelled = True
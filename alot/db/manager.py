@@ -2,10 +2,12 @@
 # Copyright © Dylan Baker
 # This file is released under the GNU GPL, version 3 or a later revision.
 # For further details see the COPYING file
+import bisect
 from collections import deque
+import itertools
 import logging
 
-from notmuch import Database, NotmuchError, XapianError
+from notmuch import Database, FileNotEmailError, NotmuchError, XapianError
 import notmuch
 
 from .errors import DatabaseError
@@ -42,12 +44,19 @@ class DBManager:
         self.ro = ro
         self.path = path
         self.writequeue = deque([])
+        self.imports = []
+        """bulk imports in progress (:class:`~alot.db.importer.MailImport`)"""
         self.processes = []
+        self._tags = None  # sorted list of all tags
+        self._tags_revision = None  # index revision self._tags belongs to
 
     def flush(self):
         """
         write out all queued write-commands in order, each one in a separate
-        :meth:`atomic <notmuch.Database.begin_atomic>` transaction.
+        :meth:`atomic <notmuch.Database.begin_atomic>` transaction. All of
+        them are written through a single writable database handle, so that
+        the write lock is only taken once per flush. Callbacks run once the
+        handle is closed again.
 
         If this fails the current action is rolled back, stays in the write
         queue and an exception is raised.
@@ -59,10 +68,22 @@ class DBManager:
         """
         if self.ro:
             raise DatabaseROError()
-        if self.writequeue:
-            # read notmuch's config regarding imap flag synchronization
-            sync = settings.get_notmuch_setting('maildir', 'synchronize_flags')
+        if not self.writequeue:
+            return
+        # read notmuch's config regarding imap flag synchronization
+        sync = settings.get_notmuch_setting('maildir', 'synchronize_flags')
 
+        # acquire a writeable db handler
+        try:
+            mode = Database.MODE.READ_WRITE
+            db = Database(path=self.path, mode=mode)
+        except NotmuchError:
+            logging.debug('index temporarily locked')
+            raise DatabaseLockedError()
+        logging.debug('got write lock')
+
+        callbacks = []
+        try:
             # go through writequeue entries
             while self.writequeue:
                 current_item = self.writequeue.popleft()
@@ -75,13 +96,11 @@ class DBManager:
                     cmd, afterwards = current_item[:2]
                     logging.debug('cmd created')
 
-                    # acquire a writeable db handler
-                    try:
-                        mode = Database.MODE.READ_WRITE
-                        db = Database(path=self.path, mode=mode)
-                    except NotmuchError:
-                        raise DatabaseLockedError()
-                    logging.debug('got write lock')
+                    # the tag cache can be updated in place if it is
+                    # current up to this write
+                    revision = db.get_revision()
+                    added_tags = None
+                    forget_tags = False
 
                     # make this a transaction
                     db.begin_atomic()
@@ -99,6 +118,8 @@ class DBManager:
                         logging.debug('added tags ')
                         msg.thaw()
                         logging.debug('thaw')
+                        # synchronized maildir flags may have added more tags
+                        added_tags = list(msg.get_tags())
 
                     elif cmd == 'remove':
                         path = current_item[2]
@@ -124,33 +145,42 @@ class DBManager:
                             for tag in tags:
                                 strategy(tag, sync_maildir_flags=sync)
                             msg.thaw()
+                        if cmd == 'tag':
+                            added_tags = tags
+                        else:
+                            # tags may have disappeared from the index
+                            forget_tags = True
 
-                    logging.debug('ended atomic')
                     # end transaction and reinsert queue item on error
                     if db.end_atomic() != notmuch.STATUS.SUCCESS:
                         raise DatabaseError('end_atomic failed')
                     logging.debug('ended atomic')
 
-                    # close db
-                    db.close()
-                    logging.debug('closed db')
+                    if forget_tags:
+                        self._tags = None
+                    elif added_tags is not None and \
+                            revision == self._tags_revision:
+                        self._add_known_tags(added_tags, db.get_revision())
 
-                    # call post-callback
                     if callable(afterwards):
-                        logging.debug(str(afterwards))
-                        afterwards()
-                        logging.debug('called callback')
+                        callbacks.append(afterwards)
 
                 # re-insert item to the queue upon Xapian/NotmuchErrors
                 except (XapianError, NotmuchError) as e:
                     logging.exception(e)
                     self.writequeue.appendleft(current_item)
                     raise DatabaseError(str(e))
-                except DatabaseLockedError as e:
-                    logging.debug('index temporarily locked')
-                    self.writequeue.appendleft(current_item)
-                    raise e
-                logging.debug('flush finished')
+        finally:
+            # close db
+            db.close()
+            logging.debug('closed db')
+
+            # call post-callbacks of the items written out
+            for afterwards in callbacks:
+                logging.debug(str(afterwards))
+                afterwards()
+                logging.debug('called callback')
+        logging.debug('flush finished')
 
     def tag(self, querystring, tags, afterwards=None, remove_rest=False):
         """
@@ -240,11 +270,36 @@ class DBManager:
 
     def get_all_tags(self):
         """
-        returns all tagsstrings used in the database
+        returns all tagsstrings used in the database, in sorted order.
+
+        The list is cached and only enumerated again once the index
+        revision changed by other means than tagging through this manager.
+        It must not be modified.
+
         :rtype: list of str
         """
         db = Database(path=self.path)
-        return [t for t in db.get_all_tags()]
+        revision = db.get_revision()
+        if self._tags is None or revision != self._tags_revision:
+            self._tags = sorted(db.get_all_tags())
+            self._tags_revision = revision
+        return self._tags
+
+    def _add_known_tags(self, tags, revision):
+        """
+        update the cached list of all tags after `tags` got added by a write
+        that brought the index to `revision`
+        """
+        if revision == self._tags_revision:
+            return  # no message matched, so no tags were added
+        # build a new list: earlier results of get_all_tags stay unchanged
+        known = list(self._tags)
+        for tag in tags:
+            i = bisect.bisect_left(known, tag)
+            if i == len(known) or known[i] != tag:
+                known.insert(i, tag)
+        self._tags = known
+        self._tags_revision = revision
 
     def get_named_queries(self):
         """
@@ -254,6 +309,33 @@ class DBManager:
         db = Database(path=self.path)
         return {k[6:]: v for k, v in db.get_configs('query.')}
 
+    def get_revision(self):
+        """
+        returns the committed revision of the index and its UUID.
+        Revisions increase whenever messages are added or (re)tagged and
+        can be compared only if the UUID did not change.
+
+        :rtype: (int, str)
+        """
+        db = Database(path=self.path)
+        return db.get_revision()
+
+    def get_changed_thread_ids(self, since, until):
+        """
+        returns the ids of all threads that contain messages which were
+        modified after revision `since` up to (and including) revision `until`.
+        This uses notmuch's `lastmod:` prefix and ignores excluded tags.
+
+        :param since: last revision known to the caller
+        :type since: int
+        :param until: current revision
+        :type until: int
+        :rtype: set of str
+        """
+        db = Database(path=self.path)
+        query = db.create_query('lastmod:%d..%d' % (since + 1, until))
+        return {t.get_thread_id() for t in query.search_threads()}
+
     def get_threads(self, querystring, sort='newest_first', exclude_tags=None):
         """
         asynchronously look up thread ids matching `querystring`.
@@ -319,6 +401,76 @@ class DBManager:
         else:
             self.writequeue.append(('add', afterwards, path, tags))
 
+    def add_messages(self, paths, tags=None, batchsize=1000, progress=None):
+        """
+        Adds many files to the notmuch index right away, bypassing the write
+        queue. They are added through one writable database handle, in
+        batches of `batchsize` files that each make up one atomic
+        transaction. Files that are indexed already are skipped, so an
+        interrupted run can simply be repeated.
+
+        This takes a while for many files, better call it from a worker
+        thread. Meanwhile, :meth:`flush` finds the index locked.
+
+        :param paths: paths of the files, all below the notmuch root
+        :type paths: iterable of str
+        :param tags: tagstrings to add to the new messages
+        :type tags: list of str
+        :param batchsize: number of files to add in one transaction
+        :type batchsize: int
+        :param progress: called with the number of files handled so far
+                         after each batch
+        :type progress: callable
+        :returns: number of files added to the index
+        :rtype: int
+        :exception: :exc:`~errors.DatabaseROError` if db is opened read-only
+        :exception: :exc:`~errors.DatabaseLockedError` if db is locked
+        :exception: :exc:`~errors.DatabaseError` if a batch failed, it is
+                    rolled back then
+        """
+        if self.ro:
+            raise DatabaseROError()
+        tags = tags or []
+        sync = settings.get_notmuch_setting('maildir', 'synchronize_flags')
+        try:
+            db = Database(path=self.path, mode=Database.MODE.READ_WRITE)
+        except NotmuchError:
+            raise DatabaseLockedError()
+
+        paths = iter(paths)
+        added = handled = 0
+        try:
+            while True:
+                batch = list(itertools.islice(paths, batchsize))
+                if not batch:
+                    break
+                db.begin_atomic()
+                for path in batch:
+                    if db.find_message_by_filename(path) is not None:
+                        continue
+                    try:
+                        msg, _ = db.add_message(path, sync_maildir_flags=sync)
+                    except FileNotEmailError:
+                        logging.warning('not a mail, skipped: %s', path)
+                        continue
+                    msg.freeze()
+                    for tag in tags:
+                        msg.add_tag(tag, sync_maildir_flags=sync)
+                    msg.thaw()
+                    added += 1
+                if db.end_atomic() != notmuch.STATUS.SUCCESS:
+                    raise DatabaseError('end_atomic failed')
+                handled += len(batch)
+                logging.debug('indexed %d files', handled)
+                if progress is not None:
+                    progress(handled)
+        except (XapianError, NotmuchError) as e:
+            logging.exception(e)
+            raise DatabaseError(str(e))
+        finally:
+            db.close()
+        return added
+
     def remove_message(self, message, afterwards=None):
         """
         Remove a message from the notmuch index
@@ -5,6 +5,7 @@ import email
 import email.charset as charset
 import email.policy
 import functools
+import logging
 from datetime import datetime
 
 from notmuch import NullPointerError
@@ -26,6 +27,13 @@ class Message:
     It it uses a :class:`~alot.db.DBManager` for cached manipulation
     and lazy lookups.
     """
+
+    POOL_TIMEOUT = 3
+    """
+    seconds :meth:`get_email` waits for a worker that parses the message,
+    before parsing it itself
+    """
+
     def __init__(self, dbman, msg, thread=None):
         """
         :param dbman: db manager that is used for further lookups
@@ -45,6 +53,7 @@ class Message:
             self._datetime = None
         self._filename = msg.get_filename()
         self._email = None  # will be read upon first use
+        self._email_future = None  # set while being parsed by a worker
         self._attachments = None  # will be read upon first use
         self._mime_part = None  # will be read upon first use
         self._mime_tree = None  # will be read upon first use
@@ -100,6 +109,15 @@ class Message:
         path = self.get_filename()
         warning = "Subject: Caution!\n"\
                   "Message file is no longer accessible:\n%s" % path
+        if not self._email and self._email_future is not None:
+            future, self._email_future = self._email_future, None
+            try:
+                self._email = future.result(timeout=self.POOL_TIMEOUT)
+            except Exception as e:
+                # the worker failed, got cancelled or takes too long: parse
+                # it right here
+                future.cancel()
+                logging.debug('could not parse %s in a worker: %r', path, e)
         if not self._email:
             try:
                 with open(path, 'rb') as f:
@@ -110,6 +128,33 @@ class Message:
                     warning, policy=email.policy.SMTP)
         return self._email
 
+    def uses_crypto(self):
+        """
+        returns `True` if notmuch found this message to be signed or
+        encrypted, so that reading it involves gpg
+        """
+        return not self._tags.isdisjoint(('signed', 'encrypted'))
+
+    def parse_in(self, pool):
+        """
+        start reading this message in a
+        :class:`~alot.db.cryptopool.CryptoPool`. :meth:`get_email` will then
+        wait for the pool instead of parsing the message itself, for up to
+        :attr:`POOL_TIMEOUT` seconds.
+
+        :param pool: the pool to parse in
+        :type pool: :class:`~alot.db.cryptopool.CryptoPool`
+        :returns: a future for the parsed message, or `None` if this message
+                  has been parsed already
+        :rtype: :class:`concurrent.futures.Future`
+        """
+        if self._email:
+            return None
+        if self._email_future is None:
+            self._email_future = pool.submit(self._filename,
+                                             self._session_keys)
+        return self._email_future
+
     def get_date(self):
         """returns Date header value as :class:`~datetime.datetime`"""
         return self._datetime
@@ -241,18 +286,18 @@ class Message:
         if not self._attachments:
             self._attachments = []
             for part in self.get_message_parts():
+                attachment = Attachment(part)
                 ct = part.get_content_type()
                 # replace underspecified mime description by a better guess
                 if ct in ['octet/stream', 'application/octet-stream']:
-                    content = part.get_payload(decode=True)
-                    ct = helper.guess_mimetype(content)
+                    ct = attachment.get_content_type()
                     if (self._attachments and
                             self._attachments[-1].get_content_type() ==
                             'application/pgp-encrypted'):
                         self._attachments.pop()
 
                 if self._is_attachment(part, ct):
-                    self._attachments.append(Attachment(part))
+                    self._attachments.append(attachment)
         return self._attachments
 
     @staticmethod
@@ -311,5 +356,5 @@ class Message:
         contenttype = mime_part.get_content_type()
         filename = mime_part.get_filename() or '(no filename)'
         charset = mime_part.get_content_charset() or ''
-        size = helper.humanize_size(len(mime_part.as_string()))
+        size = helper.humanize_size(utils.get_decoded_size(mime_part))
         return ' '.join((contenttype, filename, charset, size))
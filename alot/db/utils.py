@@ -12,19 +12,24 @@ from email.errors import MessageError
 import tempfile
 import re
 import logging
-import mailcap
 import io
 import base64
+import binascii
 import quopri
+from collections import namedtuple
 
 from .. import crypto
 from .. import helper
-from ..errors import GPGProblem
+from ..errors import GPGCode, GPGProblem
 from ..settings.const import settings
 from ..helper import string_sanitize
 from ..helper import string_decode
 from ..helper import parse_mailcap_nametemplate
 from ..helper import split_commandstring
+from .verification import cache as verification_cache
+from ..utils.lazy import lazy_import
+
+mailcap = lazy_import('mailcap')
 
 charset.add_charset('utf-8', charset.QP, charset.QP, 'utf-8')
 
@@ -35,6 +40,10 @@ _APP_PGP_SIG = 'application/pgp-signature'
 _APP_PGP_ENC = 'application/pgp-encrypted'
 
 
+_CachedSignature = namedtuple('_CachedSignature', ['fpr'])
+"""stands in for a signature whose check was answered from the cache"""
+
+
 def add_signature_headers(mail, sigs, error_msg):
     '''Add pseudo headers to the mail indicating whether the signature
     verification was successful.
@@ -54,9 +63,9 @@ def add_signature_headers(mail, sigs, error_msg):
         error_msg = error_msg or 'no signature found'
     elif not error_msg:
         try:
-            key = crypto.get_key(sigs[0].fpr)
+            key = crypto.get_key(sigs[0].fpr, cached=True)
             for uid in key.uids:
-                if crypto.check_uid_validity(key, uid.email):
+                if crypto.check_uid_validity(key, uid.email, cached=True):
                     sig_from = uid.uid
                     uid_trusted = True
                     break
@@ -160,9 +169,8 @@ def _handle_signatures(original_bytes, original, message, params):
         if len(signed_chunk) < len(b'\r\n'):
             raise MessageError('signed chunk has an invalid length')
 
-        sigs = crypto.verify_detached(
-            signed_chunk[len(b'\r\n'):],
-            signature_part.get_payload(decode=True))
+        sigs = _verify_detached(signed_chunk[len(b'\r\n'):],
+                                signature_part.get_payload(decode=True))
 
         add_signature_headers(original, sigs, None)
 
@@ -170,6 +178,66 @@ def _handle_signatures(original_bytes, original, message, params):
         add_signature_headers(original, [], str(error))
 
 
+def _expiry(sigs):
+    """
+    the earliest time at which one of `sigs` or a key that made them expires,
+    or `None` if none of them does
+    """
+    times = [s.exp_timestamp for s in sigs if s.exp_timestamp]
+    for sig in sigs:
+        try:
+            key = crypto.get_key(sig.fpr, cached=True)
+        except GPGProblem:
+            continue
+        # the primary key and the subkey that signed
+        keys = [k for k in key.subkeys[1:] if k.fpr == sig.fpr]
+        times.extend(k.expires for k in key.subkeys[:1] + keys if k.expires)
+    return min(times, default=None)
+
+
+def _verify_detached(signed, signature):
+    """
+    :func:`alot.crypto.verify_detached`, answered from the verification
+    cache if the same content has been checked before
+    """
+    digest = verification_cache.digest(b'detached', signed, signature)
+    result = verification_cache.get(digest)
+    if result is None:
+        try:
+            sigs = crypto.verify_detached(signed, signature)
+        except GPGProblem as e:
+            # only bad signatures are a property of the content, other errors
+            # may go away (e.g. once the key is imported)
+            if e.code == GPGCode.BAD_SIGNATURE:
+                verification_cache.put(digest, {'error': str(e)})
+            raise
+        verification_cache.put(digest, {'fprs': [s.fpr for s in sigs]},
+                               _expiry(sigs))
+        return sigs
+    if 'error' in result:
+        raise GPGProblem(result['error'], code=GPGCode.BAD_SIGNATURE)
+    return [_CachedSignature(fpr) for fpr in result['fprs']]
+
+
+def _decrypt_verify(payload, session_keys):
+    """
+    :func:`alot.crypto.decrypt_verify`, skipping the verification of
+    signatures of the combined method if the same ciphertext has been
+    checked before. The plaintext itself is never cached.
+    """
+    digest = verification_cache.digest(
+        b'decrypt', payload, *(k.encode('utf-8') for k in session_keys or []))
+    result = verification_cache.get(digest)
+    if result is not None:
+        _, plaintext = crypto.decrypt_verify(payload, session_keys,
+                                             verify=False)
+        return [_CachedSignature(fpr) for fpr in result['fprs']], plaintext
+    sigs, plaintext = crypto.decrypt_verify(payload, session_keys)
+    verification_cache.put(digest, {'fprs': [s.fpr for s in sigs]},
+                           _expiry(sigs))
+    return sigs, plaintext
+
+
 def _handle_encrypted(original, message, session_keys=None):
     """Handle encrypted messages helper.
 
@@ -204,7 +272,7 @@ def _handle_encrypted(original, message, session_keys=None):
         # This should be safe because PGP uses US-ASCII characters only
         payload = message.get_payload(1).get_payload().encode('ascii')
         try:
-            sigs, d = crypto.decrypt_verify(payload, session_keys)
+            sigs, d = _decrypt_verify(payload, session_keys)
         except GPGProblem as e:
             # signature verification failures end up here too if the combined
             # method is used, currently this prevents the interpretation of the
@@ -305,12 +373,133 @@ def decrypted_message_from_bytes(bytestring, session_keys=None):
     :param bytes bytestring: an email message as raw bytes
     :param session_keys: a list OpenPGP session keys
     """
-    return _decrypted_message_from_message(
+    mail = _decrypted_message_from_message(
         bytestring,
         email.message_from_bytes(bytestring,
                                  _class=email.message.EmailMessage,
                                  policy=email.policy.SMTP),
         session_keys)
+    # remember the sizes of all parts while they are at hand
+    get_decoded_size(mail)
+    return mail
+
+
+def _estimate_decoded_size(payload, cte):
+    """
+    estimates the number of bytes `payload` decodes to, given its content
+    transfer encoding, without decoding it
+    """
+    if not payload:
+        return 0
+    if isinstance(payload, bytes):
+        return len(payload)
+    if cte == 'base64':
+        # 4 characters encode 3 bytes, minus the padding at the end
+        chars = len(payload) - payload.count('\n') - payload.count('\r') - \
+            payload.count(' ') - payload.count('\t')
+        padding = payload.rstrip()[-2:].count('=')
+        return max(chars // 4 * 3 - padding, 0)
+    if cte == 'quoted-printable':
+        # each =XX escape encodes one byte, each soft line break (=\n) none
+        return len(payload) - 2 * payload.count('=') - \
+            payload.count('=\r\n')
+    if cte in ('x-uuencode', 'uuencode', 'x-uue'):
+        return len(payload) // 4 * 3
+    return len(payload)
+
+
+def get_decoded_size(part):
+    """
+    returns the size in bytes of the content of `part` after decoding its
+    content transfer encoding. It is estimated from the encoded payload,
+    which is neither decoded nor serialised for this. Multipart containers
+    count the size of their parts.
+
+    The size is remembered on the part, :func:`decrypted_message_from_bytes`
+    determines it for all parts of a newly read message.
+
+    :param part: the mime part
+    :type part: :class:`email.message.Message`
+    :rtype: int
+    """
+    size = getattr(part, '_alot_decoded_size', None)
+    if size is None:
+        if part.is_multipart():
+            size = sum(get_decoded_size(p) for p in part.get_payload())
+        else:
+            cte = str(part.get('Content-Transfer-Encoding', '')).lower()
+            size = _estimate_decoded_size(part.get_payload(), cte.strip())
+        part._alot_decoded_size = size
+    return size
+
+
+DECODE_CHUNK_SIZE = 64 * 1024
+"""number of encoded characters :func:`iter_decoded_payload` decodes at once"""
+
+_NOT_BASE64 = re.compile(r'[^A-Za-z0-9+/]')
+
+
+def _payload_bytes(text):
+    # as email.message.Message.get_payload turns payloads into bytes
+    try:
+        return text.encode('ascii', 'surrogateescape')
+    except UnicodeError:
+        return text.encode('raw-unicode-escape')
+
+
+def _iter_base64(payload, chunksize):
+    rest = ''
+    for start in range(0, len(payload), chunksize):
+        chars = rest + _NOT_BASE64.sub('', payload[start:start + chunksize])
+        end = len(chars) // 4 * 4
+        rest = chars[end:]
+        if end:
+            yield binascii.a2b_base64(chars[:end])
+    # be lenient about missing padding, a single character left is garbage
+    if len(rest) > 1:
+        yield binascii.a2b_base64(rest + '=' * (4 - len(rest)))
+
+
+def _iter_quoted_printable(payload, chunksize):
+    start = 0
+    while start < len(payload):
+        # only cut after line breaks, so that escapes and soft line breaks
+        # stay in one piece
+        end = payload.find('\n', start + chunksize)
+        end = len(payload) if end < 0 else end + 1
+        yield binascii.a2b_qp(_payload_bytes(payload[start:end]))
+        start = end
+
+
+def iter_decoded_payload(part, chunksize=DECODE_CHUNK_SIZE):
+    """
+    yields the content of the non-multipart `part` with its content transfer
+    encoding removed, in pieces. Base64 and quoted-printable payloads are
+    decoded `chunksize` characters at a time, so that the decoded content
+    never needs to be held in memory as a whole. The pieces add up to what
+    `part.get_payload(decode=True)` returns.
+
+    :param part: the part to decode
+    :type part: :class:`email.message.Message`
+    :param chunksize: number of encoded characters to decode at once
+    :type chunksize: int
+    :rtype: iterator of bytes
+    """
+    if isinstance(part, helper.FilePart):
+        with open(part.path, 'rb') as f:
+            yield from iter(lambda: f.read(chunksize), b'')
+        return
+    payload = part.get_payload()
+    cte = str(part.get('Content-Transfer-Encoding', '')).lower().strip()
+    if not isinstance(payload, str) or \
+            cte not in ('base64', 'quoted-printable'):
+        data = part.get_payload(decode=True)
+        if data:
+            yield data
+    elif cte == 'base64':
+        yield from _iter_base64(payload, chunksize)
+    else:
+        yield from _iter_quoted_printable(payload, chunksize)
 
 
 def extract_headers(mail, headers=None):
@@ -342,7 +531,6 @@ def render_part(part, field_key='copiousoutput'):
     the mailcap entry for this part's ctype.
     """
     ctype = part.get_content_type()
-    raw_payload = remove_cte(part)
     rendered_payload = None
     # get mime handler
     _, entry = settings.mailcap_find_match(ctype, key=field_key)
@@ -359,10 +547,12 @@ def render_part(part, field_key='copiousoutput'):
             with tempfile.NamedTemporaryFile(
                     delete=False, prefix=prefix, suffix=suffix) \
                     as tmpfile:
-                tmpfile.write(raw_payload)
+                _write_without_cte(part, tmpfile)
                 tempfile_name = tmpfile.name
         else:
-            stdin = raw_payload
+            stdin = tempfile.TemporaryFile()
+            _write_without_cte(part, stdin)
+            stdin.seek(0)
 
         # read parameter, create handler command
         parms = tuple('='.join(p) for p in part.get_params(failobj=[]))
@@ -381,10 +571,25 @@ def render_part(part, field_key='copiousoutput'):
         # remove tempfile
         if tempfile_name:
             os.unlink(tempfile_name)
+        if stdin is not None:
+            stdin.close()
 
     return rendered_payload
 
 
+def _write_without_cte(part, fhandle):
+    """
+    writes the payload of `part` as :func:`remove_cte` returns it to
+    `fhandle`, decoding base64 and quoted-printable payloads piecewise
+    """
+    cte = str(part.get('content-transfer-encoding', '7bit')).lower().strip()
+    if cte in ('base64', 'quoted-printable'):
+        for chunk in iter_decoded_payload(part):
+            fhandle.write(chunk)
+    else:
+        fhandle.write(remove_cte(part))
+
+
 def remove_cte(part, as_string=False):
     """Interpret MIME-part according to it's Content-Transfer-Encodings.
 
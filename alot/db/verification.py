@@ -0,0 +1,177 @@
+# This file is released under the GNU GPL, version 3 or a later revision.
+# For further details see the COPYING file
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from .. import crypto
+
+
+class VerificationCache:
+    """
+    Remembers the outcome of OpenPGP signature checks, so that displaying a
+    message again does not need to run GnuPG on it.
+
+    Results are stored under a digest of everything the check depends on,
+    e.g. the signed content and the signature. Only the fingerprints of the
+    signing keys or the error message are kept, never any decrypted content.
+    Each result is tagged with the state of the keyring it was computed with
+    (see :meth:`alot.crypto.KeyringIndex.stamp`) and is ignored once the
+    keyring changed, as a key may have been imported, revoked or (dis)trusted
+    since. Results can also carry the time at which a signature or key
+    involved expires, after which they are ignored as well.
+
+    Results are kept in memory and, after :meth:`open` was called, in a
+    sqlite database so that they survive restarts.
+    """
+
+    def __init__(self, path=None):
+        """
+        :param path: sqlite database to store results in, `None` only keeps
+                     them in memory
+        :type path: str
+        """
+        self._lock = threading.Lock()
+        self._results = {}  # digest -> (keyring stamp, expiry, result)
+        self._db = None
+        self._keyring = None
+        self.path = None
+        """the database results are stored in, if any"""
+        if path is not None:
+            self.open(path)
+
+    def open(self, path):
+        """
+        keep results in the sqlite database at `path`. If it cannot be
+        opened, results are only kept in memory.
+
+        :param path: path of the database file
+        :type path: str
+        """
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            db = sqlite3.connect(path, check_same_thread=False)
+            db.execute('CREATE TABLE IF NOT EXISTS results ('
+                       'digest BLOB PRIMARY KEY, stamp TEXT, result TEXT, '
+                       'expires REAL)')
+            columns = [c[1] for c in db.execute('PRAGMA table_info(results)')]
+            if 'expires' not in columns:
+                # results of older versions may be past an expiry they did
+                # not record
+                db.execute('DELETE FROM results')
+                db.execute('ALTER TABLE results ADD COLUMN expires REAL')
+            db.commit()
+        except (OSError, sqlite3.Error) as e:
+            logging.warning('could not open verification cache %s: %s',
+                            path, e)
+            return
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+            self._db = db
+            self.path = path
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+                self.path = None
+
+    @staticmethod
+    def digest(*parts):
+        """
+        returns the key to store the result of a check of `parts` under
+
+        :param parts: everything the outcome of the check depends on
+        :type parts: bytes
+        :rtype: bytes
+        """
+        h = hashlib.sha256()
+        for part in parts:
+            h.update(len(part).to_bytes(8, 'big'))
+            h.update(part)
+        return h.digest()
+
+    def _stamp(self):
+        stamp = crypto.keyring.stamp()
+        if self._keyring is None or self._keyring[0] != stamp:
+            self._keyring = (stamp, hashlib.sha1(
+                repr(stamp).encode('utf-8')).hexdigest())
+        return self._keyring[1]
+
+    def get(self, digest):
+        """
+        returns the result stored under `digest` or `None` if there is none
+        for the current state of the keyring or it expired
+
+        :param digest: as returned by :meth:`digest`
+        :type digest: bytes
+        :rtype: dict or None
+        """
+        stamp = self._stamp()
+        with self._lock:
+            entry = self._results.get(digest)
+            if entry is None and self._db is not None:
+                try:
+                    row = self._db.execute(
+                        'SELECT stamp, expires, result FROM results '
+                        'WHERE digest = ?', (digest,)).fetchone()
+                except sqlite3.Error as e:
+                    logging.warning('could not read verification cache: %s',
+                                    e)
+                    row = None
+                if row is not None:
+                    entry = (row[0], row[1], json.loads(row[2]))
+                    self._results[digest] = entry
+        if entry is None or entry[0] != stamp:
+            return None
+        if entry[1] is not None and entry[1] <= time.time():
+            return None
+        return entry[2]
+
+    def put(self, digest, result, expires=None):
+        """
+        store the `result` of a check
+
+        :param digest: as returned by :meth:`digest`
+        :type digest: bytes
+        :param result: the outcome of the check, must be serializable as JSON
+        :type result: dict
+        :param expires: time (in seconds since the epoch) after which the
+                        result is no longer valid, e.g. because a signature
+                        or key expires, `None` if it does not expire
+        :type expires: float
+        """
+        stamp = self._stamp()
+        with self._lock:
+            self._results[digest] = (stamp, expires, result)
+            if self._db is None:
+                return
+            try:
+                self._db.execute(
+                    'INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)',
+                    (digest, stamp, json.dumps(result), expires))
+                self._db.commit()
+            except sqlite3.Error as e:
+                logging.warning('could not write verification cache: %s', e)
+
+    def clear(self):
+        """forget all results"""
+        with self._lock:
+            self._results = {}
+            if self._db is not None:
+                try:
+                    self._db.execute('DELETE FROM results')
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    logging.warning('could not clear verification cache: %s',
+                                    e)
+
+
+cache = VerificationCache()
+"""the cache used when parsing messages"""
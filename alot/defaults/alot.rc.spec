@@ -120,6 +120,10 @@ notify_timeout = integer(default=2)
 # display status-bar at the bottom of the screen?
 show_statusbar = boolean(default=True)
 
+# maximal number of times per second the screen is redrawn after the interface changed.
+# Changes in between are drawn together. Set to 0 to redraw once per iteration of the event loop.
+redraw_max_fps = integer(default=0)
+
 # Format of the status-bar in bufferlist mode.
 # This is a pair of strings to be left and right aligned in the status-bar that may contain variables:
 #
@@ -150,8 +154,10 @@ search_statusbar = mixed_list(string, string, default=list('[{buffer_no}: search
 # * `{thread_tags}`: displays all tags present in the current thread.
 # * `{intersection_tags}`: displays tags common to all messages in the current thread.
 # * `{mimetype}`: content type of the mime part displayed in the focused message.
+# * `{crypto_progress}`: number of signed or encrypted messages processed by the
+#   :ref:`crypto workers <crypto-workers>` so far, empty once all are done.
 
-thread_statusbar = mixed_list(string, string, default=list('[{buffer_no}: thread] {subject}','[{mimetype}] {input_queue} total messages: {total_messages}'))
+thread_statusbar = mixed_list(string, string, default=list('[{buffer_no}: thread] {subject}','[{mimetype}] {crypto_progress}{input_queue} total messages: {total_messages}'))
 
 # Format of the status-bar in taglist mode.
 # This is a pair of strings to be left and right aligned in the status-bar.
@@ -174,6 +180,15 @@ namedqueries_statusbar = mixed_list(string, string, default=list('[{buffer_no}:
 # * `{displaypart}`: which body part alternative is currently in view (can be 'plaintext,'src', or 'html')
 envelope_statusbar = mixed_list(string, string, default=list('[{buffer_no}: envelope ({displaypart})]','{input_queue} total messages: {total_messages}'))
 
+# Format of the status-bar in outbox mode.
+# This is a pair of strings to be left and right aligned in the status-bar.
+# Apart from the global variables listed at :ref:`bufferlist_statusbar <bufferlist-statusbar>`
+# these strings may contain variables:
+#
+# * `{queued_count}`: number of mails waiting to be sent
+# * `{failed_count}`: number of those that could not be sent so far
+outbox_statusbar = mixed_list(string, string, default=list('[{buffer_no}: outbox]','{queued_count} queued, {failed_count} failed'))
+
 # timestamp format in `strftime format syntax <http://docs.python.org/library/datetime.html#strftime-strptime-behavior>`_
 timestamp_format = string(default=None)
 
@@ -193,6 +208,28 @@ search_threads_sort_order = option('oldest_first', 'newest_first', 'message_id',
 # when set to 0, no limit is set (can be very slow in searches that yield thousands of results)
 search_threads_rebuild_limit = integer(default=0)
 
+# number of threads that are read from the index and rendered in the background, ahead of the focussed line in search buffers.
+# This happens while alot is idle and makes scrolling through long result lists smoother. Set to 0 to disable.
+search_threads_prefetch_limit = integer(default=50)
+
+# number of rendered threads kept above and below the focussed line in search buffers.
+# Lines further away are dropped and rendered again when scrolled back to, which bounds memory use
+# when scrolling through large result lists. Set to 0 to keep all rendered threads.
+search_threads_window = integer(default=500)
+
+# number of processes that decrypt and verify the signed or encrypted messages of a thread
+# in parallel when it is opened. Set to 0 to handle each message only when it is displayed.
+crypto_workers = integer(min=0, default=4)
+
+# Put sent mails into an outbox and send them in the background instead of waiting for them
+# to be sent. The outbox is a maildir in $XDG_CACHE_HOME/alot/outbox, so mails that are not
+# sent yet survive restarts. Mails that could not be sent are retried later, waiting longer
+# after each failure. Use the :ref:`outbox <cmd.global.outbox>` command to see the queue.
+outbox = boolean(default=False)
+
+# number of mails of the same account the outbox sends at the same time
+outbox_concurrency = integer(min=1, default=1)
+
 # in case more than one account has an address book:
 # Set this to True to make tab completion for recipients during compose only
 # look in the abook of the account matching the sender address
@@ -209,6 +246,11 @@ user_agent = string(default='alot/{version}')
 # Suffix of the prompt used when waiting for user input
 prompt_suffix = string(default=':')
 
+# number of seconds to wait for the results of tab completion in prompts before
+# giving up. Completion runs in the background, so the prompt stays responsive
+# meanwhile. Set to 0 to wait indefinitely.
+completion_timeout = float(default=10.0)
+
 # String prepended to line when quoting
 quote_prefix = string(default='> ')
 
@@ -340,6 +382,16 @@ thread_focus_linewise = boolean(default=True)
         # sendmail command. This is the shell command used to send out mails via the sendmail protocol
         sendmail_command = string(default='sendmail -t')
 
+        # URL of a local SMTP or LMTP server to hand outgoing mails to instead of piping them to the
+        # :ref:`sendmail_command <sendmail-command>`: `smtp://host[:port]` or `lmtp://host[:port]`, or
+        # `smtp:///path/to/socket` or `lmtp:///path/to/socket` for a unix domain socket.
+        # Connections to it are kept open and reused for subsequent mails. Neither TLS nor
+        # authentication are supported, so this is meant for a mail server running on the same machine.
+        submission_url = submission_url(default=None)
+
+        # maximal number of connections to the :ref:`submission_url <submission-url>` server kept open at once
+        submission_connections = integer(min=1, default=2)
+
         # where to store outgoing mails, e.g. `maildir:///home/you/mail/Sent` or `maildir://~/mail/Sent`.
         # You can use mbox, maildir, mh, babyl and mmdf in the protocol part of the URL.
         #
@@ -428,7 +480,7 @@ thread_focus_linewise = boolean(default=True)
         # address book for this account
         [[[abook]]]
             # type identifier for address book
-            type = option('shellcommand', 'abook', default=None)
+            type = option('shellcommand', 'abook', 'notmuch', default=None)
 
             # make case-insensitive lookups
             ignorecase = boolean(default=True)
@@ -450,3 +502,18 @@ thread_focus_linewise = boolean(default=True)
             # as parameter. Otherwise, the command is fired without additional parameters
             # and the result list is filtered according to the search string.
             shellcommand_external_filtering = boolean(default=True)
+
+            # (shellcommand addressbooks)
+            # number of seconds for which the output of `command` is re-used for lookups
+            # before the command gets called again. Set to 0 to call it for every lookup.
+            shellcommand_cache_ttl = integer(default=60)
+
+            # (notmuch addressbooks)
+            # notmuch query selecting the messages whose From, To and Cc headers
+            # the contacts are collected from
+            notmuch_query = string(default='*')
+
+            # (notmuch addressbooks)
+            # file to keep the collected contacts in between sessions.
+            # Defaults to a file in $XDG_CACHE_HOME/alot/contacts/
+            notmuch_contacts_file = string(default=None)
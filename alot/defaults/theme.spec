@@ -26,6 +26,11 @@
     line_focus = attrtriple
     line_even = attrtriple
     line_odd = attrtriple
+[outbox]
+    # the buffer list attributes are used for those that are not set
+    line_focus = attrtriple(default=None)
+    line_even = attrtriple(default=None)
+    line_odd = attrtriple(default=None)
 [search]
     [[threadline]]
         normal = attrtriple
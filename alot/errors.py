@@ -31,3 +31,8 @@ class CompletionError(Exception):
 
 class ConversionError(Exception):
     pass
+
+
+class AttachmentChanged(Exception):
+    """an attached file was changed, moved or removed after attaching it"""
+    pass
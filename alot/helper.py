@@ -6,21 +6,31 @@
 from datetime import timedelta
 from datetime import datetime
 from collections import deque
+import base64
 import logging
 import mimetypes
 import os
 import re
 import shlex
 import subprocess
+import sys
+import tempfile
+import threading
+import uuid
 import email
-from email.mime.audio import MIMEAudio
+import email.generator
+import email.parser
+import email.policy
 from email.mime.base import MIMEBase
-from email.mime.image import MIMEImage
 from email.mime.text import MIMEText
 import asyncio
 
 import urwid
-import magic
+
+from .errors import AttachmentChanged
+from .utils.lazy import lazy_import
+
+magic = lazy_import('magic')
 
 
 def split_commandline(s):
@@ -256,14 +266,20 @@ def call_cmd(cmdlist, stdin=None):
     :param cmdlist: shellcommand to call, already splitted into a list accepted
                     by :meth:`subprocess.Popen`
     :type cmdlist: list of str
-    :param stdin: string to pipe to the process
-    :type stdin: str, bytes, or None
+    :param stdin: string to pipe to the process, or a binary file to read
+                  its input from
+    :type stdin: str, bytes, file or None
     :return: triple of stdout, stderr, return value of the shell command
     :rtype: str, str, int
     """
     termenc = urwid.util.detected_encoding
     if isinstance(stdin, str):
         stdin = stdin.encode(termenc)
+    if stdin is None or isinstance(stdin, bytes):
+        proc_stdin = subprocess.PIPE if stdin is not None else None
+    else:
+        # let the process read the file itself
+        proc_stdin, stdin = stdin, None
     try:
 
         logging.debug("Calling %s" % cmdlist)
@@ -271,7 +287,7 @@ def call_cmd(cmdlist, stdin=None):
             cmdlist,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
-            stdin=subprocess.PIPE if stdin is not None else None)
+            stdin=proc_stdin)
     except OSError as e:
         out = b''
         err = e.strerror
@@ -297,8 +313,9 @@ async def call_cmd_async(cmdlist, stdin=None, env=None):
     error value will be set to the str() value of the exception.
 
     :type cmdlist: list of str
-    :param stdin: string to pipe to the process
-    :type stdin: str
+    :param stdin: string to pipe to the process, or a binary file to read
+                  its input from
+    :type stdin: str or file
     :return: Tuple of stdout, stderr, returncode
     :rtype: tuple[str, str, int]
     """
@@ -310,22 +327,94 @@ async def call_cmd_async(cmdlist, stdin=None, env=None):
         environment.update(env)
     logging.debug('ENV = %s', environment)
     logging.debug('CMD = %s', cmdlist)
+    if isinstance(stdin, str):
+        proc_stdin = asyncio.subprocess.PIPE if stdin else None
+        stdin = stdin.encode(termenc) if stdin else None
+    else:
+        # let the process read the file itself
+        proc_stdin, stdin = stdin, None
     try:
         proc = await asyncio.create_subprocess_exec(
             *cmdlist,
             env=environment,
             stdout=asyncio.subprocess.PIPE,
             stderr=asyncio.subprocess.PIPE,
-            stdin=asyncio.subprocess.PIPE if stdin else None)
+            stdin=proc_stdin)
     except OSError as e:
         return ('', str(e), 1)
-    out, err = await proc.communicate(stdin.encode(termenc) if stdin else None)
+    out, err = await proc.communicate(stdin)
     return (out.decode(termenc), err.decode(termenc), proc.returncode)
 
 
+MAGIC_SAMPLE_SIZE = 16 * 1024
+"""number of leading bytes of a blob that file magic looks at"""
+
+_magic_handles = threading.local()
+
+
+def _magic_detector(kind):
+    """
+    returns the function that detects the mime-type (if `kind` is 'type') or
+    encoding (if it is 'encoding') of a blob. The libmagic handle behind it is
+    loaded once per thread, as loading the magic database is expensive and
+    handles must not be shared between threads.
+    """
+    detector = getattr(_magic_handles, kind, None)
+    if detector is None:
+        # this is a bit of a hack to support different versions of python
+        # magic. Hopefully at some point this will no longer be necessary
+        #
+        # the version with open() is the bindings shipped with the file
+        # source from http://darwinsys.com/file/ - this is what is used by
+        # the python-magic package on Debian/Ubuntu. However, it is not
+        # available on pypi/via pip.
+        #
+        # the version with from_buffer() is available at
+        # https://github.com/ahupp/python-magic and directly installable via
+        # pip.
+        #
+        # for more detail see https://github.com/pazz/alot/pull/588
+        if hasattr(magic, 'open'):
+            m = magic.open(magic.MAGIC_MIME_TYPE if kind == 'type'
+                           else magic.MAGIC_MIME_ENCODING)
+            m.load()
+            detector = m.buffer
+        elif hasattr(magic, 'from_buffer'):
+            detector = magic.Magic(mime=kind == 'type',
+                                   mime_encoding=kind == 'encoding'
+                                   ).from_buffer
+        else:
+            raise Exception('Unknown magic API')
+        setattr(_magic_handles, kind, detector)
+    return detector
+
+
+def _magic_sample(blob):
+    """
+    returns the first :data:`MAGIC_SAMPLE_SIZE` bytes of `blob`, cut before a
+    possibly incomplete UTF-8 sequence
+    """
+    if len(blob) <= MAGIC_SAMPLE_SIZE:
+        return blob
+    end = MAGIC_SAMPLE_SIZE
+    while end > MAGIC_SAMPLE_SIZE - 4 and blob[end] & 0xC0 == 0x80:
+        end -= 1
+    return blob[:end]
+
+
+def _is_ascii(blob):
+    """like bytes.isascii, which needs Python 3.7"""
+    try:
+        blob.decode('ascii')
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
 def guess_mimetype(blob):
     """
     uses file magic to determine the mime-type of the given data blob.
+    Only the first :data:`MAGIC_SAMPLE_SIZE` bytes are looked at.
 
     :param blob: file content as read by file.read()
     :type blob: data
@@ -333,26 +422,8 @@ def guess_mimetype(blob):
     :rtype: str
     """
     mimetype = 'application/octet-stream'
-    # this is a bit of a hack to support different versions of python magic.
-    # Hopefully at some point this will no longer be necessary
-    #
-    # the version with open() is the bindings shipped with the file source from
-    # http://darwinsys.com/file/ - this is what is used by the python-magic
-    # package on Debian/Ubuntu. However, it is not available on pypi/via pip.
-    #
-    # the version with from_buffer() is available at
-    # https://github.com/ahupp/python-magic and directly installable via pip.
-    #
-    # for more detail see https://github.com/pazz/alot/pull/588
-    if hasattr(magic, 'open'):
-        m = magic.open(magic.MAGIC_MIME_TYPE)
-        m.load()
-        magictype = m.buffer(blob)
-    elif hasattr(magic, 'from_buffer'):
-        # cf. issue #841
-        magictype = magic.from_buffer(blob, mime=True) or magictype
-    else:
-        raise Exception('Unknown magic API')
+    # cf. issue #841
+    magictype = _magic_detector('type')(_magic_sample(blob)) or mimetype
 
     # libmagic does not always return proper mimetype strings, cf. issue #459
     if re.match(r'\w+\/\w+', magictype):
@@ -360,35 +431,24 @@ def guess_mimetype(blob):
     return mimetype
 
 
-def guess_encoding(blob):
+def guess_encoding(blob, sample=True):
     """
     uses file magic to determine the encoding of the given data blob.
 
     :param blob: file content as read by file.read()
     :type blob: data
+    :param sample: only look at the first :data:`MAGIC_SAMPLE_SIZE` bytes,
+                   unless they are ASCII but the rest of `blob` is not
+    :type sample: bool
     :returns: encoding
     :rtype: str
     """
-    # this is a bit of a hack to support different versions of python magic.
-    # Hopefully at some point this will no longer be necessary
-    #
-    # the version with open() is the bindings shipped with the file source from
-    # http://darwinsys.com/file/ - this is what is used by the python-magic
-    # package on Debian/Ubuntu.  However it is not available on pypi/via pip.
-    #
-    # the version with from_buffer() is available at
-    # https://github.com/ahupp/python-magic and directly installable via pip.
-    #
-    # for more detail see https://github.com/pazz/alot/pull/588
-    if hasattr(magic, 'open'):
-        m = magic.open(magic.MAGIC_MIME_ENCODING)
-        m.load()
-        return m.buffer(blob)
-    elif hasattr(magic, 'from_buffer'):
-        m = magic.Magic(mime_encoding=True)
-        return m.from_buffer(blob)
-    else:
-        raise Exception('Unknown magic API')
+    detect = _magic_detector('encoding')
+    if sample and len(blob) > MAGIC_SAMPLE_SIZE:
+        encoding = detect(_magic_sample(blob))
+        if encoding != 'us-ascii' or _is_ascii(blob):
+            return encoding
+    return detect(blob)
 
 
 def try_decode(blob):
@@ -399,7 +459,13 @@ def try_decode(blob):
     :rtype: str
     """
     assert isinstance(blob, bytes), 'cannot decode a str or non-bytes object'
-    return blob.decode(guess_encoding(blob))
+    try:
+        return blob.decode(guess_encoding(blob))
+    except UnicodeDecodeError:
+        # the encoding guessed from the start of blob does not fit its end
+        if len(blob) <= MAGIC_SAMPLE_SIZE:
+            raise
+        return blob.decode(guess_encoding(blob, sample=False))
 
 
 def libmagic_version_at_least(version):
@@ -430,11 +496,197 @@ def libmagic_version_at_least(version):
     return magic_wrapper.magic_version >= version
 
 
-# TODO: make this work on blobs, not paths
+class FilePart(MIMEBase):
+    """
+    a base64 encoded MIME part whose content stays in a file until it is
+    needed. :class:`SpooledMail` encodes it chunkwise straight from the file,
+    other users get the encoded payload from :meth:`get_payload` as usual.
+
+    Reading the content raises :class:`~alot.errors.AttachmentChanged` if the
+    file was changed, moved or removed since the part was created, so that
+    the mail never contains something else than what was attached.
+    """
+
+    CHUNK_SIZE = 57 * 1024
+    """bytes read at once, 57 bytes make up one line of base64"""
+
+    def __init__(self, path, maintype, subtype, **params):
+        """
+        :param path: the file holding the content of this part
+        :type path: str
+        :param maintype: main content type, e.g. 'application'
+        :type maintype: str
+        :param subtype: content subtype, e.g. 'pdf'
+        :type subtype: str
+        """
+        MIMEBase.__init__(self, maintype, subtype, **params)
+        self.path = path
+        self._stat = self._identify(os.stat(path))
+        self['Content-Transfer-Encoding'] = 'base64'
+        # generators skip parts without payload, the real one is returned by
+        # get_payload
+        self._payload = ''
+
+    @staticmethod
+    def _identify(stat):
+        return stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def _open(self):
+        """
+        opens the file, if it is still the one that was attached
+        """
+        try:
+            f = open(self.path, 'rb')
+        except OSError as e:
+            raise AttachmentChanged(
+                'attachment {} is gone: {}'.format(self.path, e.strerror))
+        if self._identify(os.fstat(f.fileno())) != self._stat:
+            f.close()
+            raise AttachmentChanged(
+                'attachment {} changed since it was attached'.format(
+                    self.path))
+        return f
+
+    def get_size(self):
+        """returns the size of the (unencoded) content in bytes"""
+        return self._stat[2]
+
+    def iter_encoded_lines(self):
+        """
+        yields the lines of the base64 encoded content, followed by an empty
+        line unless the content is empty (as
+        :func:`email.encoders.encode_base64` encodes it)
+        """
+        empty = True
+        with self._open() as f:
+            while True:
+                chunk = f.read(self.CHUNK_SIZE)
+                if not chunk:
+                    break
+                empty = False
+                yield from base64.encodebytes(chunk).decode('ascii').split()
+        if not empty:
+            yield ''
+
+    def get_payload(self, i=None, decode=False):
+        if i is not None:
+            raise TypeError('Expected list, got %s' % type(self._payload))
+        if decode:
+            with self._open() as f:
+                return f.read()
+        return '\n'.join(self.iter_encoded_lines())
+
+
+def _streams(msg):
+    """whether `msg` is or contains a :class:`FilePart`"""
+    if isinstance(msg, FilePart):
+        return True
+    return msg.is_multipart() and any(_streams(p) for p in msg.get_payload())
+
+
+def _spool(fp, msg, policy):
+    """
+    writes `msg` to the binary file `fp` as a
+    :class:`~email.generator.BytesGenerator` with `policy` would. Parts that
+    are or contain :class:`FileParts <FilePart>` are written line by line,
+    instead of being assembled in memory first.
+    """
+    if not _streams(msg):
+        email.generator.BytesGenerator(fp, mangle_from_=False,
+                                       policy=policy).flatten(msg)
+        return
+    nl = policy.linesep.encode('ascii')
+    if msg.is_multipart() and not msg.get_boundary():
+        # the body is written right after the headers, so the boundary has
+        # to be known before
+        msg.set_boundary('=' * 15 + uuid.uuid4().hex)
+    for name, value in msg.items():
+        fp.write(policy.fold_binary(name, value))
+    fp.write(nl)
+    if isinstance(msg, FilePart):
+        lines = msg.iter_encoded_lines()
+        fp.write(next(lines, '').encode('ascii'))
+        for line in lines:
+            fp.write(nl + line.encode('ascii'))
+        return
+    boundary = msg.get_boundary().encode('ascii')
+    if msg.preamble is not None:
+        fp.write(_encode_lines(msg.preamble, nl) + nl)
+    fp.write(b'--' + boundary + nl)
+    for i, part in enumerate(msg.get_payload()):
+        if i:
+            fp.write(nl + b'--' + boundary + nl)
+        _spool(fp, part, policy)
+    fp.write(nl + b'--' + boundary + b'--' + nl)
+    if msg.epilogue is not None:
+        fp.write(_encode_lines(msg.epilogue, nl))
+
+
+def _encode_lines(text, nl):
+    return nl.join(line.encode('utf-8', 'surrogateescape')
+                   for line in text.splitlines())
+
+
+class SpooledMail:
+    """
+    a mail serialized for sending and storing, kept in a temporary file
+    that is only held in memory while it is small. Attachments wrapped in
+    :class:`FileParts <FilePart>` are encoded into it straight from disk.
+    """
+
+    MAX_MEMORY = 1024 * 1024
+    """size in bytes above which the mail is moved to disk"""
+
+    def __init__(self, mail):
+        """
+        :param mail: the mail to serialize
+        :type mail: :class:`email.message.Message`
+        """
+        self.headers = email.message.Message()
+        """the top-level headers of the mail"""
+        for key, value in mail.items():
+            self.headers[key] = value
+        self._file = tempfile.SpooledTemporaryFile(max_size=self.MAX_MEMORY)
+        _spool(self._file, mail,
+               email.policy.SMTP.clone(max_line_length=sys.maxsize))
+
+    @classmethod
+    def load(cls, path):
+        """
+        returns the mail stored in the file at `path` as :class:`SpooledMail`,
+        without reading all of it into memory
+
+        :param path: the file holding the mail
+        :type path: str
+        """
+        mail = cls.__new__(cls)
+        mail._file = open(path, 'rb')
+        mail.headers = email.parser.BytesHeaderParser().parse(mail._file)
+        return mail
+
+    def open(self):
+        """
+        returns the binary file holding the mail, positioned at its start
+        """
+        self._file.seek(0)
+        return self._file
+
+    def as_bytes(self):
+        return self.open().read()
+
+    def __str__(self):
+        return self.as_bytes().decode('utf-8', 'surrogateescape')
+
+    def close(self):
+        self._file.close()
+
+
 def mimewrap(path, filename=None, ctype=None):
     """Take the contents of the given path and wrap them into an email MIME
     part according to the content type.  The content type is auto detected from
-    the actual file contents and the file name if it is not given.
+    the actual file contents and the file name if it is not given. Only text
+    files are read into memory, other content is left in the file (see
+    :class:`FilePart`).
 
     :param path: the path to the file contents
     :type path: str
@@ -446,10 +698,9 @@ def mimewrap(path, filename=None, ctype=None):
     :rtype: subclasses of email.mime.base.MIMEBase
     """
 
-    with open(path, 'rb') as f:
-        content = f.read()
     if not ctype:
-        ctype = guess_mimetype(content)
+        with open(path, 'rb') as f:
+            ctype = guess_mimetype(f.read(MAGIC_SAMPLE_SIZE))
         # libmagic < 5.12 incorrectly detects excel/powerpoint files as
         # 'application/msword' (see #179 and #186 in libmagic bugtracker)
         # This is a workaround, based on file extension, useful as long
@@ -462,18 +713,13 @@ def mimewrap(path, filename=None, ctype=None):
 
     maintype, subtype = ctype.split('/', 1)
     if maintype == 'text':
+        with open(path, 'rb') as f:
+            content = f.read()
         part = MIMEText(content.decode(guess_encoding(content), 'replace'),
                         _subtype=subtype,
                         _charset='utf-8')
-    elif maintype == 'image':
-        part = MIMEImage(content, _subtype=subtype)
-    elif maintype == 'audio':
-        part = MIMEAudio(content, _subtype=subtype)
     else:
-        part = MIMEBase(maintype, subtype)
-        part.set_payload(content)
-        # Encode the payload using Base64
-        email.encoders.encode_base64(part)
+        part = FilePart(path, maintype, subtype)
     # Set the filename parameter
     if not filename:
         filename = os.path.basename(path)
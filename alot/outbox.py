@@ -0,0 +1,298 @@
+# This file is released under the GNU GPL, version 3 or a later revision.
+# For further details see the COPYING file
+import asyncio
+import email.parser
+import json
+import logging
+import mailbox
+import os
+import time
+
+from .helper import SpooledMail
+
+
+class OutboxEntry:
+    """a mail waiting in the :class:`Outbox`"""
+
+    def __init__(self, key, account, tags=None, replied=None, passed=None):
+        """
+        :param key: key of the mail in the outbox maildir
+        :type key: str
+        :param account: address of the account to send the mail with
+        :type account: str
+        :param tags: tags to add to the mail once it is sent
+        :type tags: list of str
+        :param replied: id of the message the mail replies to
+        :type replied: str
+        :param passed: id of the message the mail passes on
+        :type passed: str
+        """
+        self.key = key
+        self.account = account
+        self.tags = tags or []
+        self.replied = replied
+        self.passed = passed
+        self.headers = None
+        """the headers of the mail (:class:`email.message.Message`)"""
+        self.attempts = 0
+        """number of failed attempts to send the mail"""
+        self.error = None
+        """the reason the last attempt failed"""
+        self.next_attempt = 0
+        """time (as in :func:`time.time`) of the next attempt"""
+        self.sending = False
+
+    def to_dict(self):
+        return {'account': self.account, 'tags': self.tags,
+                'replied': self.replied, 'passed': self.passed,
+                'attempts': self.attempts, 'error': self.error}
+
+    @classmethod
+    def from_dict(cls, key, data):
+        entry = cls(key, data['account'], data['tags'], data['replied'],
+                    data['passed'])
+        entry.attempts = data['attempts']
+        entry.error = data['error']
+        return entry
+
+
+class Outbox:
+    """
+    Queue of mails to be sent, which are delivered in the background.
+
+    Queued mails are kept in a maildir, together with what is needed to
+    finish sending them (the account to use, tags to add and the messages
+    they reply to or pass on), so that they survive restarts.
+
+    Once :meth:`start` was called, a task on the event loop hands the mails
+    to a `deliver` coroutine, at most :attr:`concurrency` of them per account
+    at the same time. Failed attempts are repeated, with the delay doubling
+    from :attr:`RETRY_DELAY` up to :attr:`MAX_RETRY_DELAY` seconds.
+    """
+
+    RETRY_DELAY = 30
+    """seconds to wait before sending a mail again after the first failure"""
+
+    MAX_RETRY_DELAY = 3600
+    """upper bound for the delay between attempts to send a mail"""
+
+    SHUTDOWN_TIMEOUT = 30
+    """seconds :meth:`shutdown` waits for the mails being sent"""
+
+    def __init__(self, path=None, concurrency=1):
+        """
+        :param path: maildir to keep the queued mails in, see :meth:`open`
+        :type path: str
+        :param concurrency: number of mails sent at once per account
+        :type concurrency: int
+        """
+        self.path = None
+        """the maildir queued mails are kept in, if any"""
+        self.concurrency = concurrency
+        self.entries = []
+        """the queued mails, as :class:`OutboxEntry`"""
+        self.on_change = None
+        """called without arguments whenever the queue changed"""
+        self.on_failure = None
+        """called with the :class:`OutboxEntry` after an attempt to send it
+        failed"""
+        self._maildir = None
+        self._deliver = None
+        self._task = None
+        self._wakeup = None
+        self._sending = {}  # account -> number of mails being sent
+        self._sends = set()  # tasks sending a mail
+        if path is not None:
+            self.open(path)
+
+    def open(self, path):
+        """
+        keep queued mails in the maildir at `path` and load the ones queued
+        there before
+
+        :param path: path of the maildir, created if it does not exist
+        :type path: str
+        """
+        self._maildir = mailbox.Maildir(path, create=True)
+        self.path = path
+        os.makedirs(self._metadir, exist_ok=True)
+        self.entries = []
+        for key in sorted(self._maildir.iterkeys()):
+            headers = self._read_headers(key)
+            try:
+                with open(self._metafile(key)) as f:
+                    entry = OutboxEntry.from_dict(key, json.load(f))
+            except (OSError, ValueError, KeyError, TypeError):
+                # the metadata did not make it to disk: send it the way it is
+                entry = OutboxEntry(key, headers.get('Resent-From') or
+                                    headers.get('From', ''))
+            entry.headers = headers
+            self.entries.append(entry)
+        logging.debug('%d mails in outbox %s', len(self.entries), path)
+
+    @property
+    def _metadir(self):
+        return os.path.join(self.path, 'meta')
+
+    def _metafile(self, key):
+        return os.path.join(self._metadir, key + '.json')
+
+    def _file(self, key):
+        return os.path.join(self.path, self._maildir._lookup(key))
+
+    def _read_headers(self, key):
+        with open(self._file(key), 'rb') as f:
+            return email.parser.BytesHeaderParser().parse(f)
+
+    def _save(self, entry):
+        tmp = self._metafile(entry.key) + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(entry.to_dict(), f)
+        os.replace(tmp, self._metafile(entry.key))
+
+    def get_mail(self, entry):
+        """
+        returns the queued mail
+
+        :rtype: :class:`~alot.helper.SpooledMail`
+        """
+        return SpooledMail.load(self._file(entry.key))
+
+    def add(self, mail, account, tags=None, replied=None, passed=None):
+        """
+        queue a mail for sending
+
+        :param mail: the mail to send
+        :type mail: :class:`email.message.Message`, str or
+                    :class:`~alot.helper.SpooledMail`
+        :param account: address of the account to send the mail with
+        :type account: str
+        :param tags: tags to add to the mail once it is sent
+        :type tags: list of str
+        :param replied: id of the message the mail replies to
+        :type replied: str
+        :param passed: id of the message the mail passes on
+        :type passed: str
+        :rtype: :class:`OutboxEntry`
+        """
+        if isinstance(mail, SpooledMail):
+            key = self._maildir.add(mail.open())
+        else:
+            key = self._maildir.add(mail)
+        entry = OutboxEntry(key, account, tags, replied, passed)
+        self._save(entry)
+        entry.headers = self._read_headers(key)
+        self.entries.append(entry)
+        self._changed()
+        return entry
+
+    def remove(self, entry):
+        """drop a mail from the queue"""
+        self.entries.remove(entry)
+        self._maildir.discard(entry.key)
+        try:
+            os.remove(self._metafile(entry.key))
+        except FileNotFoundError:
+            pass
+        self._changed()
+
+    def retry(self, entry):
+        """send a mail without waiting for its next attempt"""
+        entry.next_attempt = 0
+        self._changed()
+
+    def _changed(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+        if self.on_change is not None:
+            self.on_change()
+
+    def start(self, deliver):
+        """
+        start sending the queued mails in the background
+
+        :param deliver: coroutine function that sends the mail of the
+                        :class:`OutboxEntry` it is called with. If it raises
+                        an exception, the mail is sent again later.
+        :type deliver: callable
+        """
+        self._deliver = deliver
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.get_event_loop().create_task(self._run())
+
+    def stop(self):
+        """
+        stop sending mails in the background. Mails that are being sent
+        already are not interrupted, see :meth:`shutdown`.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+            self._wakeup = None
+
+    async def shutdown(self):
+        """
+        stop sending mails, and wait up to :attr:`SHUTDOWN_TIMEOUT` seconds
+        for the ones being sent, so that they are not sent again on the next
+        start
+
+        :returns: number of mails that are still being sent
+        :rtype: int
+        """
+        self.stop()
+        if self._sends:
+            await asyncio.wait(self._sends, timeout=self.SHUTDOWN_TIMEOUT)
+        if self._sends:
+            logging.warning('stopped while sending %d mails, they may be '
+                            'sent again on the next start', len(self._sends))
+        return len(self._sends)
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            now = time.time()
+            due = [e for e in self.entries
+                   if not e.sending and e.next_attempt <= now]
+            for entry in due:
+                if self._sending.get(entry.account, 0) < self.concurrency:
+                    self._sending[entry.account] = \
+                        self._sending.get(entry.account, 0) + 1
+                    entry.sending = True
+                    task = asyncio.ensure_future(self._send(entry))
+                    self._sends.add(task)
+                    task.add_done_callback(self._sends.discard)
+            waiting = [e.next_attempt - now for e in self.entries
+                       if not e.sending and e.next_attempt > now]
+            try:
+                await asyncio.wait_for(self._wakeup.wait(),
+                                       min(waiting) if waiting else None)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _send(self, entry):
+        self._changed()
+        try:
+            await self._deliver(entry)
+        except Exception as e:
+            entry.attempts += 1
+            entry.error = str(e)
+            entry.next_attempt = time.time() + min(
+                self.RETRY_DELAY * 2 ** (entry.attempts - 1),
+                self.MAX_RETRY_DELAY)
+            logging.warning('could not send %s, retrying in %d seconds: %s',
+                            entry.key, entry.next_attempt - time.time(), e)
+            if entry in self.entries:
+                self._save(entry)
+                if self.on_failure is not None:
+                    self.on_failure(entry)
+        else:
+            if entry in self.entries:
+                self.remove(entry)
+        finally:
+            entry.sending = False
+            self._sending[entry.account] -= 1
+            self._changed()
+
+
+outbox = Outbox()
+"""the outbox :class:`~alot.commands.envelope.SendCommand` queues mails in"""
@@ -0,0 +1,186 @@
+# This file is released under the GNU GPL, version 3 or a later revision.
+# For further details see the COPYING file
+"""
+A scheduler for low-priority work that runs while the interface is idle.
+
+Jobs are iterables (usually generators) that do their work in small steps.
+The scheduler advances the job with the highest priority step by step until
+the job's time budget for one slice is used up and then yields to the event
+loop, so that pending user input is handled first. No job runs while the
+user is typing: after each key press the scheduler waits `idle_delay`
+seconds before it resumes.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+
+class Job:
+    """a unit of deferred work, as returned by :meth:`IdleScheduler.schedule`
+    """
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+
+    def __init__(self, steps, priority, name, budget):
+        self.steps = iter(steps)
+        self.priority = priority
+        self.name = name
+        self.budget = budget
+        self.state = Job.QUEUED
+        self.runtime = 0.0
+        """seconds spent running this job so far"""
+        self.slices = 0
+        """number of times this job got to run"""
+
+    @property
+    def finished(self):
+        return self.state in (Job.DONE, Job.FAILED, Job.CANCELLED)
+
+    def cancel(self):
+        """stop running this job; the step that is currently run completes"""
+        if self.finished:
+            return
+        running = self.state == Job.RUNNING
+        self.state = Job.CANCELLED
+        if not running:
+            self._close()
+
+    def _close(self):
+        close = getattr(self.steps, 'close', None)
+        if close is not None:
+            close()
+
+    def __str__(self):
+        return '%-9s %-30s priority %3d  budget %5.1fms  ran %7.1fms/%d' % (
+            self.state, self.name, self.priority, self.budget * 1000,
+            self.runtime * 1000, self.slices)
+
+
+class IdleScheduler:
+    """
+    runs :class:`Jobs <Job>` on the asyncio event loop while the user
+    interface is idle. Lower `priority` values run first, jobs of the same
+    priority take turns.
+    """
+
+    def __init__(self, idle_delay=0.1):
+        """
+        :param idle_delay: seconds to wait after user input before running
+                           jobs again
+        :type idle_delay: float
+        """
+        self.idle_delay = idle_delay
+        self._queue = []  # heap of (priority, sequence number, job)
+        self._counter = itertools.count()
+        self._task = None
+        self._loop = None  # the loop self._task runs on
+        self._last_input = None
+        self.running = None
+        """the job currently running (or `None`)"""
+
+    def schedule(self, steps, priority=0, name=None, budget=0.01):
+        """
+        queue work to be done while the interface is idle.
+
+        :param steps: iterable whose iteration does the actual work, e.g. a
+                      generator that yields after each piece of work
+        :type steps: Iterable
+        :param priority: jobs with lower values run first
+        :type priority: int
+        :param name: description of the job to show in debug views
+        :type name: str
+        :param budget: seconds the job may run before yielding to the loop
+        :type budget: float
+        :rtype: :class:`Job`
+        """
+        job = Job(steps, priority, name or repr(steps), budget)
+        heapq.heappush(self._queue, (priority, next(self._counter), job))
+        self._wake()
+        return job
+
+    @property
+    def loop(self):
+        """
+        the event loop jobs run on, or `None` if it is not running. Other
+        threads can schedule jobs through its `call_soon_threadsafe`.
+        """
+        if self._loop is not None and self._loop.is_running():
+            return self._loop
+        return None
+
+    def input_received(self):
+        """tell the scheduler that the user is interacting with the UI"""
+        self._last_input = time.monotonic()
+
+    def jobs(self):
+        """returns the running job (if any) and all queued ones, in order"""
+        queued = [job for _, _, job in sorted(self._queue)
+                  if job.state == Job.QUEUED and job is not self.running]
+        if self.running is not None:
+            return [self.running] + queued
+        return queued
+
+    def _wake(self):
+        loop = asyncio.get_event_loop()
+        if not loop.is_running():
+            return
+        if (self._task is not None and not self._task.done() and
+                self._loop is loop):
+            return
+        self._loop = loop
+        self._task = loop.create_task(self._run())
+
+    def _wait(self):
+        """returns the seconds to wait until the interface counts as idle"""
+        if self._last_input is None:
+            return 0
+        return self._last_input + self.idle_delay - time.monotonic()
+
+    async def _run(self):
+        while self._queue:
+            wait = self._wait()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            _, _, job = heapq.heappop(self._queue)
+            if job.finished:
+                continue
+            self._run_slice(job)
+            if not job.finished:
+                heapq.heappush(self._queue,
+                               (job.priority, next(self._counter), job))
+            await asyncio.sleep(0)
+
+    def _run_slice(self, job):
+        self.running = job
+        job.state = Job.RUNNING
+        job.slices += 1
+        start = time.monotonic()
+        deadline = start + job.budget
+        try:
+            while job.state == Job.RUNNING:
+                next(job.steps)
+                if time.monotonic() >= deadline:
+                    break
+        except StopIteration:
+            job.state = Job.DONE
+        except Exception:
+            logging.exception('background job %s failed', job.name)
+            job.state = Job.FAILED
+        finally:
+            job.runtime += time.monotonic() - start
+            self.running = None
+        if job.state == Job.RUNNING:
+            job.state = Job.QUEUED
+        elif job.state == Job.CANCELLED:
+            job._close()
+
+
+scheduler = IdleScheduler()
+"""the scheduler used by the interface"""
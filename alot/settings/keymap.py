@@ -0,0 +1,87 @@
+# This file is released under the GNU GPL, version 3 or a later revision.
+# For further details see the COPYING file
+
+
+class _Node:
+    __slots__ = ('cmdline', 'children')
+
+    def __init__(self):
+        self.cmdline = None
+        self.children = {}
+
+
+class KeyMap:
+    """
+    Key sequences bound in one mode, compiled into a prefix tree.
+
+    Key sequences are strings of space separated urwid key names, like
+    ``'g g'`` or ``'ctrl f'``, and are split into words to build the tree.
+    Looking up a sequence thus takes one dictionary lookup per word, no
+    matter how many bindings are defined.
+    """
+    def __init__(self, bindings):
+        """
+        :param bindings: command lines by key sequence
+        :type bindings: dict (str -> str)
+        """
+        self._bindings = dict(bindings)
+        self._root = _Node()
+        for keyseq, cmdline in self._bindings.items():
+            node = self._root
+            for word in keyseq.split(' '):
+                node = node.children.setdefault(word, _Node())
+            node.cmdline = cmdline
+
+    def _find(self, keyseq):
+        node = self._root
+        for word in keyseq.split(' '):
+            node = node.children.get(word)
+            if node is None:
+                break
+        return node
+
+    def get(self, keyseq):
+        """returns the command line bound to `keyseq` or `None`"""
+        return self._bindings.get(keyseq)
+
+    def match(self, keyseq):
+        """
+        look up a (partially) typed key sequence.
+
+        :param keyseq: space separated keys
+        :type keyseq: str
+        :returns: the command line bound to `keyseq` (or `None`) and whether
+                  longer sequences starting with `keyseq` are bound
+        :rtype: (str, bool)
+        """
+        node = self._find(keyseq)
+        if node is None:
+            return None, False
+        return node.cmdline, bool(node.children)
+
+    def candidates(self, prefix=None):
+        """
+        returns all bound key sequences that start with `prefix` followed by
+        further keys, and `prefix` itself if it is bound.
+        If `prefix` is `None`, all bound sequences are returned.
+
+        :rtype: list of str
+        """
+        if prefix is None:
+            return list(self._bindings)
+        node = self._find(prefix)
+        if node is None:
+            return []
+        result = []
+        stack = [(prefix, child, word)
+                 for word, child in node.children.items()]
+        while stack:
+            head, node, word = stack.pop()
+            keyseq = head + ' ' + word
+            if node.cmdline is not None:
+                result.append(keyseq)
+            stack.extend((keyseq, child, w)
+                         for w, child in node.children.items())
+        if self.get(prefix) is not None:
+            result.append(prefix)
+        return result
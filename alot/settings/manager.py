@@ -1,27 +1,32 @@
 # Copyright (C) 2011-2012  Patrick Totzke <patricktotzke@gmail.com>
 # This file is released under the GNU GPL, version 3 or a later revision.
 # For further details see the COPYING file
+import asyncio
 import importlib.util
 import itertools
 import logging
-import mailcap
 import os
 import re
 import email
 from configobj import ConfigObj, Section
 
-from ..account import SendmailAccount
+from ..account import SendmailAccount, SMTPAccount
 from ..addressbook.abook import AbookAddressBook
 from ..addressbook.external import ExternalAddressbook
+from ..addressbook.mailindex import NotmuchAddressBook
 from ..helper import pretty_datetime, string_decode, get_xdg_env
 from ..utils import configobj as checks
+from ..utils.lazy import lazy_import
 
 from .errors import ConfigError, NoMatchingAccount
+from .keymap import KeyMap
 from .utils import read_config
 from .utils import resolve_att
 from .theme import Theme
 
 
+mailcap = lazy_import('mailcap')
+
 DEFAULTSPATH = os.path.join(os.path.dirname(__file__), '..', 'defaults')
 DATA_DIRS = get_xdg_env('XDG_DATA_DIRS',
                         '/usr/local/share:/usr/share').split(':')
@@ -31,7 +36,7 @@ class SettingsManager:
     """Organizes user settings"""
     def __init__(self):
         self.hooks = None
-        self._mailcaps = mailcap.getcaps()
+        self._mailcaps = None
         self._notmuchconfig = None
         self._theme = None
         self._accounts = None
@@ -39,6 +44,12 @@ class SettingsManager:
         self._notmuchconfig = None
         self._config = ConfigObj()
         self._bindings = None
+        self._keymaps = {}
+        self.cache = None
+        """
+        :class:`~alot.settings.utils.ConfigCache` to keep validated config
+        files in, if any
+        """
 
     def reload(self):
         """Reload notmuch and alot config files"""
@@ -52,14 +63,37 @@ class SettingsManager:
         :type path: str
         """
         spec = os.path.join(DEFAULTSPATH, 'notmuch.rc.spec')
-        self._notmuchconfig = read_config(path, spec)
+        self._notmuchconfig = read_config(path, spec, cache=self.cache)
+        if self.cache is not None:
+            self.cache.save()
 
     def _update_bindings(self, newbindings):
         assert isinstance(newbindings, Section)
 
-        self._bindings = ConfigObj(os.path.join(DEFAULTSPATH,
-                                                'default.bindings'))
+        self._bindings = read_config(os.path.join(DEFAULTSPATH,
+                                                  'default.bindings'),
+                                     cache=self.cache)
         self._bindings.merge(newbindings)
+        self._compile_keymaps()
+
+    def _compile_keymaps(self):
+        """compile the bindings of every mode into :class:`KeyMap`s"""
+        self._keymaps = {}
+        # modes without a section of their own only use the global bindings
+        for mode in [None] + self._bindings.sections:
+            globalmaps, modemaps = self.get_keybindings(mode)
+            globalmaps.update(modemaps)
+            self._keymaps[mode] = KeyMap(globalmaps)
+
+    def get_keymap(self, mode):
+        """
+        returns the compiled keybindings of mode `mode`
+
+        :param mode: mode identifier
+        :type mode: str
+        :rtype: :class:`~alot.settings.keymap.KeyMap`
+        """
+        return self._keymaps.get(mode) or self._keymaps[None]
 
     def read_config(self, path):
         """
@@ -69,11 +103,12 @@ class SettingsManager:
         """
         spec = os.path.join(DEFAULTSPATH, 'alot.rc.spec')
         newconfig = read_config(path, spec, report_extra=True, checks={
-                'mail_container': checks.mail_container,
+                'submission_url': checks.submission_url,
                 'force_list': checks.force_list,
                 'align': checks.align_mode,
-                'attrtriple': checks.attr_triple,
-                'gpg_key_hint': checks.gpg_key})
+                'attrtriple': checks.attr_triple}, late_checks={
+                'mail_container': checks.mail_container,
+                'gpg_key_hint': checks.gpg_key}, cache=self.cache)
         self._config.merge(newconfig)
         self._config.walk(self._expand_config_values)
 
@@ -109,7 +144,7 @@ class SettingsManager:
                     logging.warning('Theme `%s` does not exist.', theme_path)
                 else:
                     try:
-                        self._theme = Theme(theme_path)
+                        self._theme = Theme(theme_path, cache=self.cache)
                     except ConfigError as e:
                         raise ConfigError('Theme file `%s` failed '
                                           'validation:\n%s' % (theme_path, e))
@@ -122,10 +157,18 @@ class SettingsManager:
         # if still no theme is set, resort to default
         if self._theme is None:
             theme_path = os.path.join(DEFAULTSPATH, 'default.theme')
-            self._theme = Theme(theme_path)
+            self._theme = Theme(theme_path, cache=self.cache)
 
+        replaced = self._accounts or []
         self._accounts = self._parse_accounts(self._config)
         self._accountmap = self._account_table(self._accounts)
+        # say goodbye to the servers the replaced accounts are connected to
+        loop = asyncio.get_event_loop()
+        if loop.is_running():
+            for account in replaced:
+                loop.create_task(account.close())
+        if self.cache is not None:
+            self.cache.save()
 
     @staticmethod
     def _expand_config_values(section, key):
@@ -199,8 +242,10 @@ class SettingsManager:
                     regexp = abook['regexp']
                     if cmd is not None and regexp is not None:
                         ef = abook['shellcommand_external_filtering']
+                        ttl = abook['shellcommand_cache_ttl']
                         args['abook'] = ExternalAddressbook(
-                            cmd, regexp, external_filtering=ef)
+                            cmd, regexp, external_filtering=ef,
+                            cache_ttl=ttl)
                     else:
                         msg = 'underspecified abook of type \'shellcommand\':'
                         msg += '\ncommand: %s\nregexp:%s' % (cmd, regexp)
@@ -209,12 +254,21 @@ class SettingsManager:
                     contacts_path = abook['abook_contacts_file']
                     args['abook'] = AbookAddressBook(
                         contacts_path, ignorecase=abook['ignorecase'])
+                elif abook['type'] == 'notmuch':
+                    args['abook'] = NotmuchAddressBook(
+                        abook['notmuch_query'],
+                        cachefile=abook['notmuch_contacts_file'],
+                        ignorecase=abook['ignorecase'])
                 else:
                     del args['abook']
 
-                cmd = args['sendmail_command']
-                del args['sendmail_command']
-                newacc = SendmailAccount(cmd, **args)
+                cmd = args.pop('sendmail_command')
+                url = args.pop('submission_url')
+                connections = args.pop('submission_connections')
+                if url is not None:
+                    newacc = SMTPAccount(url, connections=connections, **args)
+                else:
+                    newacc = SendmailAccount(cmd, **args)
                 accounts.append(newacc)
         return accounts
 
@@ -382,17 +436,7 @@ class SettingsManager:
         return None
 
     def get_mapped_input_keysequences(self, mode='global', prefix=''):
-        # get all bindings in this mode
-        globalmaps, modemaps = self.get_keybindings(mode)
-        candidates = list(globalmaps.keys()) + list(modemaps.keys())
-        if prefix is not None:
-            prefixes = prefix + ' '
-            cand = [c for c in candidates if c.startswith(prefixes)]
-            if prefix in candidates:
-                candidates = cand + [prefix]
-            else:
-                candidates = cand
-        return candidates
+        return self.get_keymap(mode).candidates(prefix)
 
     def get_keybindings(self, mode):
         """look up keybindings from `MODE-maps` sections
@@ -438,23 +482,7 @@ class SettingsManager:
         :returns: a command line to be applied upon keypress
         :rtype: str
         """
-        cmdline = None
-        bindings = self._bindings
-        if key in bindings.scalars:
-            cmdline = bindings[key]
-        if mode in bindings.sections:
-            if key in bindings[mode].scalars:
-                value = bindings[mode][key]
-                if value:
-                    cmdline = value
-                else:
-                    # to be sure it isn't mapped globally
-                    cmdline = None
-        # Workaround for ConfigObj misbehaviour. cf issue #500
-        # this ensures that we get at least strings only as commandlines
-        if isinstance(cmdline, list):
-            cmdline = ','.join(cmdline)
-        return cmdline
+        return self.get_keymap(mode).get(key)
 
     def get_accounts(self):
         """
@@ -508,8 +536,10 @@ class SettingsManager:
     def mailcap_find_match(self, *args, **kwargs):
         """
         Propagates :func:`mailcap.find_match` but caches the mailcap (first
-        argument)
+        argument). The mailcap files are only read on the first call.
         """
+        if self._mailcaps is None:
+            self._mailcaps = mailcap.getcaps()
         return mailcap.findmatch(self._mailcaps, *args, **kwargs)
 
     def represent_datetime(self, d):
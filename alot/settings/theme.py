@@ -13,10 +13,12 @@ DUMMYDEFAULT = ('default',) * 6
 
 class Theme:
     """Colour theme"""
-    def __init__(self, path):
+    def __init__(self, path, cache=None):
         """
         :param path: path to theme file
         :type path: str
+        :param cache: cache for the validated theme file
+        :type cache: :class:`~alot.settings.utils.ConfigCache`
         :raises: :class:`~alot.settings.errors.ConfigError`
         """
         self._spec = os.path.join(DEFAULTSPATH, 'theme.spec')
@@ -24,8 +26,15 @@ class Theme:
                                    checks={'align': checks.align_mode,
                                            'widthtuple': checks.width_tuple,
                                            'force_list': checks.force_list,
-                                           'attrtriple': checks.attr_triple})
+                                           'attrtriple': checks.attr_triple},
+                                   cache=cache)
         self._colours = [1, 16, 256]
+        # themes written before the outbox existed show it like the buffer
+        # list
+        outbox = self._config['outbox']
+        for name in outbox:
+            if outbox[name] is None:
+                outbox[name] = self._config['bufferlist'][name]
         # make sure every entry in 'order' lists have their own subsections
         threadline = self._config['search']['threadline']
         for sec in self._config['search']:
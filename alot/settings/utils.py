@@ -1,18 +1,154 @@
 # Copyright (C) 2011-2012  Patrick Totzke <patricktotzke@gmail.com>
 # This file is released under the GNU GPL, version 3 or a later revision.
 # For further details see the COPYING file
+import functools
+import hashlib
 import logging
+import os
+import pickle
 
-from configobj import (ConfigObj, ConfigObjError, flatten_errors,
+from configobj import (ConfigObj, ConfigObjError, Section, flatten_errors,
                        get_extra_values)
-from validate import Validator
+from validate import ValidateError, Validator
 from urwid import AttrSpec
 
+from .. import __version__
 from .errors import ConfigError
 
 
+class ConfigCache:
+    """
+    Validated config objects kept on disk, so that config files that did not
+    change need not be parsed and validated again on the next start.
+
+    All cached objects are stored in one file, together with the
+    modification time, size and SHA-1 hash of the config and spec file each
+    was read from. An object is only used while all of these still match,
+    and the whole cache is dropped when alot is updated. Settings with late
+    checks (see :func:`read_config`) are cached as they are written in the
+    file.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: file to keep the cache in
+        :type path: str
+        """
+        self.path = path
+        self._entries = None
+        self._changed = False
+
+    @staticmethod
+    def _stamp(path):
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            digest = hashlib.sha1(f.read()).hexdigest()
+        return stat.st_mtime_ns, stat.st_size, digest
+
+    def _key(self, configpath, specpath):
+        return tuple((path, self._stamp(path))
+                     for path in (configpath, specpath) if path)
+
+    def _load(self):
+        self._entries = {}
+        try:
+            with open(self.path, 'rb') as f:
+                version, entries = pickle.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logging.info('ignoring config cache %s: %s', self.path, e)
+            return
+        if version == __version__:
+            self._entries = entries
+
+    def get(self, configpath, specpath=None):
+        """
+        returns the config object read from `configpath` and validated
+        against `specpath`, if it is cached and both files are unchanged
+
+        :rtype: `configobj.ConfigObj` or None
+        """
+        if self._entries is None:
+            self._load()
+        entry = self._entries.get((configpath, specpath))
+        if entry is None:
+            return None
+        key, data = entry
+        try:
+            if key != self._key(configpath, specpath):
+                return None
+            return pickle.loads(data)
+        except Exception as e:
+            logging.debug('cached %s not usable: %s', configpath, e)
+            return None
+
+    def put(self, configpath, specpath, config):
+        """remember a config object read from `configpath`"""
+        if self._entries is None:
+            self._load()
+        try:
+            entry = (self._key(configpath, specpath), pickle.dumps(config))
+        except Exception as e:
+            logging.warning('cannot cache %s: %s', configpath, e)
+            return
+        self._entries[(configpath, specpath)] = entry
+        self._changed = True
+
+    def save(self):
+        """write the cache to disk if anything was added to it"""
+        if not self._changed:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = self.path + '.tmp'
+            with open(tmp, 'wb') as f:
+                pickle.dump((__version__, self._entries), f)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logging.warning('could not write config cache %s: %s',
+                            self.path, e)
+        else:
+            self._changed = False
+
+
+class _LateCheck:
+    """
+    the value of a setting, as read from the config file, whose check is
+    only applied after validation
+    """
+
+    def __init__(self, name, value, *args, **kwargs):
+        self.name = name
+        self.value = value
+        self.args = args
+        self.kwargs = kwargs
+
+    def apply(self, checks):
+        return checks[self.name](self.value, *self.args, **self.kwargs)
+
+
+def _apply_late_checks(section, checks, section_list=()):
+    """
+    replaces the :class:`_LateCheck` values in `section` by the results of
+    their checks, and returns error messages for those that failed
+    """
+    errors = []
+    for key, value in section.items():
+        if isinstance(value, Section):
+            errors += _apply_late_checks(value, checks,
+                                         section_list + (key,))
+        elif isinstance(value, _LateCheck):
+            try:
+                section[key] = value.apply(checks)
+            except ValidateError as e:
+                msg = 'key "%s" in section "%s" failed validation: %s'
+                errors.append(msg % (key, ', '.join(section_list), e))
+    return errors
+
+
 def read_config(configpath=None, specpath=None, checks=None,
-                report_extra=False):
+                report_extra=False, cache=None, late_checks=None):
     """
     get a (validated) config object for given config file path.
 
@@ -25,10 +161,41 @@ def read_config(configpath=None, specpath=None, checks=None,
     :type checks: dict str->callable,
     :param report_extra: log if a setting is not present in the spec file
     :type report_extra: boolean
+    :param cache: cache to look the validated config up in and to add it to
+    :type cache: :class:`ConfigCache`
+    :param late_checks: custom checks that are applied after validation, and
+        whose results are not cached. This is for checks that depend on more
+        than the config file, like the keyring, or that return objects which
+        cannot be stored, like mailboxes.
+    :type late_checks: dict str->callable
     :raises: :class:`~alot.settings.errors.ConfigError`
     :rtype: `configobj.ConfigObj`
     """
     checks = checks or {}
+    late_checks = late_checks or {}
+    if not isinstance(configpath, str):
+        cache = None
+    config = None
+    if cache is not None:
+        config = cache.get(configpath, specpath)
+    if config is None:
+        config = _read_config(configpath, specpath, checks, late_checks)
+        if cache is not None:
+            cache.put(configpath, specpath, config)
+    if report_extra and specpath:
+        _report_extra_values(config, configpath)
+    if late_checks:
+        errors = _apply_late_checks(config, late_checks)
+        if errors:
+            raise ConfigError('\n'.join(errors) + '\n')
+    return config
+
+
+def _read_config(configpath, specpath, checks, late_checks):
+    """
+    parses and validates a config file, leaving the values with late checks
+    as :class:`_LateCheck` objects
+    """
 
     try:
         config = ConfigObj(infile=configpath, configspec=specpath,
@@ -48,6 +215,9 @@ def read_config(configpath=None, specpath=None, checks=None,
     if specpath:
         validator = Validator()
         validator.functions.update(checks)
+        validator.functions.update(
+            (name, functools.partial(_LateCheck, name))
+            for name in late_checks)
         try:
             results = config.validate(validator, preserve_errors=True)
         except ConfigObjError as e:
@@ -67,21 +237,24 @@ def read_config(configpath=None, specpath=None, checks=None,
                     msg = 'section "%s" is missing' % '.'.join(section_list)
                 error_msg += msg + '\n'
             raise ConfigError(error_msg)
-
-        extra_values = get_extra_values(config) if report_extra else None
-        if extra_values:
-            msg = ['Unknown values were found in `%s`. Please check for '
-                   'typos if a specified setting does not seem to work:'
-                   % configpath]
-            for sections, val in extra_values:
-                if sections:
-                    msg.append('%s: %s' % ('->'.join(sections), val))
-                else:
-                    msg.append(str(val))
-            logging.info('\n'.join(msg))
     return config
 
 
+def _report_extra_values(config, configpath):
+    """log the settings in `config` that are not in its spec"""
+    extra_values = get_extra_values(config)
+    if extra_values:
+        msg = ['Unknown values were found in `%s`. Please check for '
+               'typos if a specified setting does not seem to work:'
+               % configpath]
+        for sections, val in extra_values:
+            if sections:
+                msg.append('%s: %s' % ('->'.join(sections), val))
+            else:
+                msg.append(str(val))
+        logging.info('\n'.join(msg))
+
+
 def resolve_att(a, fallback):
     """ replace '' and 'default' by fallback values """
     if a is None:
@@ -0,0 +1,325 @@
+# This file is released under the GNU GPL, version 3 or a later revision.
+# For further details see the COPYING file
+"""
+A small asynchronous SMTP/LMTP client for handing mails to a local submission
+server over persistent, pooled connections.
+"""
+import asyncio
+import logging
+import socket
+import time
+from urllib.parse import urlparse
+
+
+class SMTPError(Exception):
+    """a server rejected a command or could not be talked to"""
+
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.code = code
+
+
+class _ConnectionLost(SMTPError):
+    pass
+
+
+class SMTPConnection:
+    """
+    one connection to an SMTP or LMTP server. Mails are handed over with
+    :meth:`send`, which pipelines the commands of a transaction if the server
+    supports it (:rfc:`2920`).
+    """
+
+    TIMEOUT = 60
+    """seconds to wait for a reply of the server"""
+
+    CHUNK_SIZE = 64 * 1024
+    """bytes of the mail written at once"""
+
+    def __init__(self, reader, writer, lmtp=False):
+        self._reader = reader
+        self._writer = writer
+        self.lmtp = lmtp
+        self.extensions = {}
+        """extensions the server announced, by upper case keyword"""
+        self.last_used = time.monotonic()
+        self.replies = 0
+        """number of replies read during the current transaction"""
+        self.closed = False
+
+    @classmethod
+    async def open(cls, url):
+        """
+        connect to the server at `url` and greet it
+
+        :param url: `smtp://host[:port]` or `lmtp://host[:port]`, or
+                    `smtp:///path` or `lmtp:///path` for a unix socket
+        :type url: str
+        :rtype: :class:`SMTPConnection`
+        :raises: :class:`SMTPError`
+        """
+        parsed = urlparse(url)
+        lmtp = parsed.scheme == 'lmtp'
+        try:
+            if parsed.hostname:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(
+                        parsed.hostname, parsed.port or (24 if lmtp else 25)),
+                    cls.TIMEOUT)
+            else:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_unix_connection(parsed.path), cls.TIMEOUT)
+        except (OSError, asyncio.TimeoutError) as e:
+            raise SMTPError('could not connect to %s: %s' % (url, e))
+        conn = cls(reader, writer, lmtp=lmtp)
+        try:
+            await conn._expect(220)
+            await conn._hello()
+        except SMTPError:
+            conn.close()
+            raise
+        return conn
+
+    async def _read_reply(self):
+        """returns code and text of the next reply of the server"""
+        lines = []
+        while True:
+            try:
+                line = await asyncio.wait_for(self._reader.readline(),
+                                              self.TIMEOUT)
+            except (OSError, asyncio.TimeoutError) as e:
+                raise _ConnectionLost('connection lost: %s' % e)
+            if not line.endswith(b'\n'):
+                raise _ConnectionLost('connection closed by server')
+            line = line.decode('utf-8', 'replace').rstrip('\r\n')
+            lines.append(line[4:])
+            if line[3:4] != '-':
+                break
+        self.replies += 1
+        try:
+            code = int(line[:3])
+        except ValueError:
+            raise SMTPError('malformed reply: %s' % line)
+        if code == 421:
+            raise _ConnectionLost(' '.join(lines), code)
+        return code, '\n'.join(lines)
+
+    async def _expect(self, *codes):
+        code, text = await self._read_reply()
+        if code not in codes:
+            raise SMTPError('%d %s' % (code, text), code)
+        return text
+
+    async def _write(self, data):
+        try:
+            self._writer.write(data)
+            await asyncio.wait_for(self._writer.drain(), self.TIMEOUT)
+        except (OSError, asyncio.TimeoutError) as e:
+            raise _ConnectionLost('connection lost: %s' % e)
+
+    async def _command(self, line, *codes):
+        await self._write(line.encode('utf-8') + b'\r\n')
+        return await self._expect(*codes)
+
+    async def _hello(self):
+        verb = 'LHLO' if self.lmtp else 'EHLO'
+        text = await self._command('%s %s' % (verb, socket.getfqdn()), 250)
+        for line in text.split('\n')[1:]:
+            keyword, _, params = line.partition(' ')
+            self.extensions[keyword.upper()] = params
+
+    async def send(self, sender, recipients, data, hidden=()):
+        """
+        hand over a mail
+
+        :param sender: envelope sender address
+        :type sender: str
+        :param recipients: envelope recipient addresses
+        :type recipients: list of str
+        :param data: the mail
+        :type data: binary file
+        :param hidden: names of headers to leave out, e.g. 'Bcc'
+        :type hidden: list of str
+        :raises: :class:`SMTPError` if the server did not accept the mail
+                 for all recipients
+        """
+        self.last_used = time.monotonic()
+        self.replies = 0
+        params = ''
+        if '8BITMIME' in self.extensions:
+            params += ' BODY=8BITMIME'
+        if any(ord(c) > 127 for a in [sender] + recipients for c in a):
+            if 'SMTPUTF8' not in self.extensions:
+                raise SMTPError('server does not accept non-ascii addresses')
+            params += ' SMTPUTF8'
+        commands = ['MAIL FROM:<%s>%s' % (sender, params)]
+        commands += ['RCPT TO:<%s>' % r for r in recipients]
+        commands.append('DATA')
+        expected = [250] * (len(commands) - 1) + [354]
+
+        if 'PIPELINING' in self.extensions:
+            await self._write(b''.join(c.encode('utf-8') + b'\r\n'
+                                       for c in commands))
+            replies = [await self._read_reply() for _ in commands]
+        else:
+            replies = []
+            for c, code in zip(commands, expected):
+                await self._write(c.encode('utf-8') + b'\r\n')
+                replies.append(await self._read_reply())
+                if replies[-1][0] != code:
+                    break
+        rejected = ['%d %s' % reply for reply, code in zip(replies, expected)
+                    if reply[0] != code]
+        if rejected:
+            if len(replies) == len(commands) and replies[-1][0] == 354:
+                # the server waits for the content nevertheless. Hang up
+                # instead, so that it drops the incomplete transaction.
+                self.close()
+            else:
+                await self._command('RSET', 250)
+            raise SMTPError('\n'.join(rejected), replies[-1][0])
+
+        await self._write_data(data, {h.lower().encode() for h in hidden})
+        # LMTP servers reply for each recipient
+        failed = []
+        for _ in recipients if self.lmtp else [None]:
+            code, text = await self._read_reply()
+            if code != 250:
+                failed.append('%d %s' % (code, text))
+        self.last_used = time.monotonic()
+        if failed:
+            raise SMTPError('\n'.join(failed))
+
+    async def _write_data(self, data, hidden):
+        """send `data` line by line, dot-stuffed and with CRLF line ends"""
+        chunk = []
+        size = 0
+        in_header = True
+        skipping = False
+        for line in data:
+            line = line.rstrip(b'\r\n') + b'\r\n'
+            if in_header:
+                if line == b'\r\n':
+                    in_header = False
+                elif line[:1] not in b' \t':
+                    name = line.split(b':', 1)[0].strip().lower()
+                    skipping = name in hidden
+                if skipping:
+                    continue
+            if line.startswith(b'.'):
+                line = b'.' + line
+            chunk.append(line)
+            size += len(line)
+            if size >= self.CHUNK_SIZE:
+                await self._write(b''.join(chunk))
+                chunk, size = [], 0
+        chunk.append(b'.\r\n')
+        await self._write(b''.join(chunk))
+
+    async def reset(self):
+        """check that the connection is still alive, resetting its state"""
+        await self._command('RSET', 250)
+
+    async def quit(self):
+        """say goodbye and close the connection"""
+        try:
+            await self._command('QUIT', 221)
+        except SMTPError:
+            pass
+        self.close()
+
+    def close(self):
+        self._writer.close()
+        self.closed = True
+
+
+class SMTPPool:
+    """
+    keeps connections to an SMTP or LMTP server open for reuse. At most
+    `size` connections are open at once, idle ones are closed after
+    `idle_timeout` seconds.
+    """
+
+    def __init__(self, url, size=2, idle_timeout=120):
+        """
+        :param url: server to connect to, see :meth:`SMTPConnection.open`
+        :type url: str
+        :param size: maximal number of connections
+        :type size: int
+        :param idle_timeout: seconds after which idle connections are closed
+        :type idle_timeout: float
+        """
+        self.url = url
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self._idle = []
+        self._slots = None
+        self.closed = False
+
+    async def send(self, sender, recipients, data, hidden=()):
+        """
+        hand over a mail (see :meth:`SMTPConnection.send`) on an idle or, if
+        there is none, a new connection. If a reused connection turns out to
+        be closed before the server replied to anything, the mail is sent
+        again on a new one.
+
+        :param data: the mail
+        :type data: seekable binary file
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.size)
+        async with self._slots:
+            conn = self._pop_idle()
+            if conn is not None:
+                try:
+                    await conn.send(sender, recipients, data, hidden)
+                except _ConnectionLost as e:
+                    conn.close()
+                    if conn.replies:
+                        raise SMTPError(str(e), e.code)
+                    logging.debug('reconnecting to %s: %s', self.url, e)
+                    data.seek(0)
+                    conn = None
+                except SMTPError:
+                    self._release(conn)
+                    raise
+            if conn is None:
+                conn = await SMTPConnection.open(self.url)
+                try:
+                    await conn.send(sender, recipients, data, hidden)
+                except _ConnectionLost as e:
+                    conn.close()
+                    raise SMTPError(str(e), e.code)
+                except SMTPError:
+                    self._release(conn)
+                    raise
+            self._release(conn)
+
+    def _release(self, conn):
+        # connections stay usable after failed transactions, unless they
+        # had to be closed to abort them
+        if conn.closed:
+            return
+        if self.closed:
+            asyncio.ensure_future(conn.quit())
+        else:
+            self._idle.append(conn)
+
+    def _pop_idle(self):
+        now = time.monotonic()
+        while self._idle:
+            conn = self._idle.pop()
+            if now - conn.last_used < self.idle_timeout:
+                return conn
+            asyncio.ensure_future(conn.quit())
+        return None
+
+    async def close(self):
+        """
+        close all idle connections, and the ones in use once their mails are
+        sent
+        """
+        self.closed = True
+        idle, self._idle = self._idle, []
+        if idle:
+            await asyncio.gather(*(conn.quit() for conn in idle))
@@ -7,6 +7,7 @@ import signal
 import codecs
 import contextlib
 import asyncio
+import datetime
 import traceback
 
 import urwid
@@ -14,6 +15,9 @@ import urwid
 from .settings.const import settings
 from .buffers import BufferlistBuffer
 from .buffers import SearchBuffer
+from .buffers import OutboxBuffer
+from .db.cryptopool import pool as cryptopool
+from .db.verification import cache as verification_cache
 from .commands import globals
 from .commands import commandfactory
 from .commands import CommandCanceled, SequenceCanceled
@@ -21,6 +25,9 @@ from .commands import CommandParseError
 from .helper import split_commandline
 from .helper import string_decode
 from .helper import get_xdg_env
+from .helper import pretty_datetime
+from .outbox import outbox
+from .scheduler import scheduler
 from .widgets.globals import CompleteEdit
 from .widgets.globals import ChoiceWidget
 
@@ -44,6 +51,9 @@ class UI:
     responsible for opening, closing and focussing buffers.
     """
 
+    CLOSE_TIMEOUT = 5
+    """seconds to wait for mail servers to close connections on exit"""
+
     def __init__(self, dbman, initialcmdline):
         """
         :param dbman: :class:`~alot.db.DBManager`
@@ -87,6 +97,14 @@ class UI:
         # alarm handle for callback that clears input queue (to cancel alarm)
         self._alarm = None
 
+        # handle of the scheduled redraw, see :meth:`update`
+        self._redraw_handle = None
+        self._redraw_screen = False
+        self._last_redraw = 0
+        # inputs and widgets of the last statusbar and footer
+        self._statusbar = (None, None)
+        self._footer = None
+
         # force urwid to pass key events as unicode, independent of LANG
         urwid.set_encoding('utf-8')
 
@@ -113,6 +131,26 @@ class UI:
         self.recipienthistory = self._load_history_from_file(
             self._recipients_hist_file, size=size)
 
+        # remember signature checks across sessions
+        verification_cache.open(os.path.join(
+            get_xdg_env('XDG_CACHE_HOME', os.path.expanduser('~/.cache')),
+            'alot', 'verification'))
+        cryptopool.workers = settings.get('crypto_workers')
+
+        # mails queued by the send command, kept across sessions
+        outbox_path = os.path.join(
+            get_xdg_env('XDG_CACHE_HOME', os.path.expanduser('~/.cache')),
+            'alot', 'outbox')
+        outbox.concurrency = settings.get('outbox_concurrency')
+        outbox.on_change = self._outbox_changed
+        outbox.on_failure = self._outbox_failed
+        # keep sending what is left even if the outbox was switched off
+        if settings.get('outbox') or os.path.isdir(outbox_path):
+            try:
+                outbox.open(outbox_path)
+            except OSError as e:
+                logging.error('could not open outbox %s: %s', outbox_path, e)
+
         # set up main loop
         self.mainloop = urwid.MainLoop(
             self.root_widget,
@@ -139,6 +177,9 @@ class UI:
         # clear the screen before the initial frame
         self.mainloop.screen.clear()
 
+        if outbox.path is not None:
+            outbox.start(self._send_queued)
+
         logging.debug('fire first command')
         loop.create_task(self.apply_commandline(initialcmdline))
 
@@ -172,9 +213,11 @@ class UI:
         # the first time..
         if not keys:
             return
+        # defer background jobs while the user is typing
+        scheduler.input_received()
         # let widgets handle input if key is virtual window resize keypress
         # or we are in "passall" mode
-        elif 'window resize' in keys or self._passall:
+        if 'window resize' in keys or self._passall:
             return keys
         # end "lockdown" mode if the right key was pressed
         elif self._locked and keys[0] == self._unlock_key:
@@ -212,23 +255,19 @@ class UI:
                 key = key[0] + ' %i' % key[1]
             self.input_queue.append(key)
             keyseq = ' '.join(self.input_queue)
-            candidates = settings.get_mapped_input_keysequences(self.mode,
-                                                                prefix=keyseq)
-            if keyseq in candidates:
+            cmdline, longer = settings.get_keymap(self.mode).match(keyseq)
+            if cmdline:
                 # case: current input queue is a mapped keysequence
-                # get binding and interpret it if non-null
-                cmdline = settings.get_keybinding(self.mode, keyseq)
-                if cmdline:
-                    if len(candidates) > 1:
-                        timeout = float(settings.get('input_timeout'))
-                        if self._alarm is not None:
-                            self.mainloop.remove_alarm(self._alarm)
-                        self._alarm = self.mainloop.set_alarm_in(
-                            timeout, fire, cmdline)
-                    else:
-                        return fire(self.mainloop, cmdline)
-
-            elif not candidates:
+                if longer:
+                    timeout = float(settings.get('input_timeout'))
+                    if self._alarm is not None:
+                        self.mainloop.remove_alarm(self._alarm)
+                    self._alarm = self.mainloop.set_alarm_in(
+                        timeout, fire, cmdline)
+                else:
+                    return fire(self.mainloop, cmdline)
+
+            elif not longer:
                 # case: no sequence with prefix keyseq is mapped
                 # just clear the input queue
                 clear()
@@ -343,9 +382,11 @@ class UI:
 
         # set up widgets
         leftpart = urwid.Text(prefix, align='left')
+        timeout = settings.get('completion_timeout') or None
         editpart = CompleteEdit(completer, on_exit=select_or_cancel,
                                 edit_text=text, history=history,
-                                on_error=cerror)
+                                on_error=cerror, on_update=self.update,
+                                timeout=timeout)
 
         for _ in range(tab):  # hit some tabs
             editpart.keypress((0,), 'tab')
@@ -505,6 +546,22 @@ class UI:
         """
         return [x for x in self.buffers if isinstance(x, t)]
 
+    def _outbox_changed(self):
+        for buf in self.get_buffers_of_type(OutboxBuffer):
+            buf.rebuild()
+        self.update()
+
+    def _outbox_failed(self, entry):
+        retry = datetime.datetime.fromtimestamp(entry.next_attempt)
+        self.notify('could not send "{}": {} (retrying at {})'.format(
+            entry.headers.get('Subject', ''), entry.error.split('\n')[0],
+            pretty_datetime(retry)), priority='error')
+
+    async def _send_queued(self, entry):
+        # the envelope commands are only loaded once a mail is to be sent
+        from .commands.envelope import send_queued
+        await send_queued(self, entry)
+
     def clear_notify(self, messages):
         """
         Clears notification popups. Call this to ged rid of messages that don't
@@ -644,14 +701,42 @@ class UI:
         return msgs[0]
 
     def update(self, redraw=True):
-        """redraw interface"""
+        """
+        redraw interface
+
+        The body is updated right away, but rebuilding the footer and drawing
+        the screen is deferred to the next iteration of the event loop (and
+        limited to `redraw_max_fps` redraws per second), so that many updates
+        in a row result in a single redraw.
+        """
         # get the main urwid.Frame widget
         mainframe = self.root_widget.original_widget
 
         # body
-        if self.current_buffer:
+        if self.current_buffer and mainframe.body is not self.current_buffer:
             mainframe.set_body(self.current_buffer)
 
+        self._redraw_screen = self._redraw_screen or redraw
+        if self._redraw_handle is not None:
+            return
+        loop = asyncio.get_event_loop()
+        if not loop.is_running():
+            self._redraw()
+            return
+        max_fps = settings.get('redraw_max_fps')
+        delay = 0
+        if max_fps:
+            delay = self._last_redraw + 1 / max_fps - loop.time()
+        if delay > 0:
+            self._redraw_handle = loop.call_later(delay, self._redraw)
+        else:
+            self._redraw_handle = loop.call_soon(self._redraw)
+
+    def _redraw(self):
+        """rebuild the footer and draw the screen if requested"""
+        self._redraw_handle = None
+        mainframe = self.root_widget.original_widget
+
         # footer
         lines = []
         if self._notificationbar:  # .get_text()[0] != ' ':
@@ -659,16 +744,23 @@ class UI:
         if self._show_statusbar:
             lines.append(self.build_statusbar())
 
-        if lines:
-            mainframe.set_footer(urwid.Pile(lines))
-        else:
-            mainframe.set_footer(None)
+        if lines != self._footer:
+            self._footer = lines
+            if lines:
+                mainframe.set_footer(urwid.Pile(lines))
+            else:
+                mainframe.set_footer(None)
         # force a screen redraw
-        if self.mainloop.screen.started and redraw:
+        if self.mainloop.screen.started and self._redraw_screen:
             self.mainloop.draw_screen()
+            self._last_redraw = asyncio.get_event_loop().time()
+        self._redraw_screen = False
 
     def build_statusbar(self):
-        """construct and return statusbar widget"""
+        """
+        construct and return statusbar widget.
+        The widget is re-used as long as its content stays the same.
+        """
         info = {}
         cb = self.current_buffer
         btype = None
@@ -690,16 +782,26 @@ class UI:
             righttxt = string_decode(righttxt, 'UTF-8')
             righttxt = righttxt.format(**info)
 
-        footerleft = urwid.Text(lefttxt, align='left')
         pending_writes = len(self.dbman.writequeue)
         if pending_writes > 0:
             righttxt = ('|' * pending_writes) + ' ' + righttxt
-        footerright = urwid.Text(righttxt, align='right')
-        columns = urwid.Columns([
-            footerleft,
-            ('pack', footerright)])
+        for job in self.dbman.imports:
+            righttxt = 'importing {}/{} '.format(job.done,
+                                                 job.total) + righttxt
+        queued = len(outbox.entries)
+        if queued > 0 and btype != 'outbox':
+            righttxt = '[{} queued] '.format(queued) + righttxt
         footer_att = settings.get_theming_attribute('global', 'footer')
-        return urwid.AttrMap(columns, footer_att)
+
+        inputs = (lefttxt, righttxt, footer_att)
+        if self._statusbar[0] != inputs:
+            footerleft = urwid.Text(lefttxt, align='left')
+            footerright = urwid.Text(righttxt, align='right')
+            columns = urwid.Columns([
+                footerleft,
+                ('pack', footerright)])
+            self._statusbar = (inputs, urwid.AttrMap(columns, footer_att))
+        return self._statusbar[1]
 
     async def apply_command(self, cmd):
         """
@@ -745,9 +847,26 @@ class UI:
             asyncio.ensure_future(self.apply_command(globals.ExitCommand()))
         elif signum == signal.SIGUSR1:
             if isinstance(self.current_buffer, SearchBuffer):
-                self.current_buffer.rebuild()
+                self.current_buffer.refresh()
                 self.update()
 
+    async def finish_sending(self):
+        """
+        stop sending queued mails, after waiting for those that are being
+        sent, and close the connections to mail servers
+        """
+        if any(e.sending for e in outbox.entries):
+            clearme = self.notify('waiting for mails being sent…',
+                                  timeout=-1)
+            await outbox.shutdown()
+            self.clear_notify([clearme])
+        else:
+            outbox.stop()
+        closing = [asyncio.ensure_future(a.close())
+                   for a in settings.get_accounts() or []]
+        if closing:
+            await asyncio.wait(closing, timeout=self.CLOSE_TIMEOUT)
+
     def cleanup(self):
         """Do the final clean up before shutting down."""
         size = settings.get('history_size')
@@ -757,6 +876,10 @@ class UI:
                                    size=size)
         self._save_history_to_file(self.recipienthistory,
                                    self._recipients_hist_file, size=size)
+        cryptopool.shutdown()
+        outbox.stop()
+        for job in self.dbman.imports:
+            job.cancel()
 
     @staticmethod
     def _load_history_from_file(path, size=-1):
@@ -110,6 +110,22 @@ def mail_container(value):
     raise VdtTypeError(value)
 
 
+def submission_url(value):
+    """
+    Check that the value is the URL of an SMTP or LMTP server, e.g.
+    `smtp://localhost:587` or, for a unix domain socket,
+    `lmtp:///run/dovecot/lmtp`.
+    """
+    url = urlparse(value)
+    if url.scheme not in ('smtp', 'lmtp') or not (url.hostname or url.path):
+        raise VdtTypeError(value)
+    try:
+        url.port
+    except ValueError:
+        raise VdtTypeError(value)
+    return value
+
+
 def force_list(value, min=None, max=None):
     r"""
     Check that a value is a list, coercing strings into
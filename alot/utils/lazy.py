@@ -0,0 +1,30 @@
+# This file is released under the GNU GPL, version 3 or a later revision.
+# For further details see the COPYING file
+import importlib.util
+import sys
+
+
+def lazy_import(name):
+    """
+    returns the module `name` without executing it yet. It is loaded on the
+    first access to one of its attributes, so that modules that are slow to
+    import (like gpg) do not delay startup unless they are actually used.
+
+    :param name: absolute name of the module
+    :type name: str
+    :rtype: module
+    :raises: ImportError if there is no such module
+    """
+    try:
+        return sys.modules[name]
+    except KeyError:
+        pass
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError('No module named %r' % name, name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
@@ -5,6 +5,12 @@
 import logging
 import urwid
 
+from .scheduler import scheduler
+
+
+_PENDING = object()
+"""placeholder for lines whose item has been read but not yet wrapped"""
+
 
 class IterableWalker(urwid.ListWalker):
 
@@ -14,26 +20,70 @@ class IterableWalker(urwid.ListWalker):
     concrete type. This allows for lazy operations of very large sequences of
     data, such as a sequences of threads with certain notmuch tags.
 
+    Consumed lines are indexed by object identity and, if a `key` function is
+    given, by the key of their item. This makes membership tests, lookups by
+    key and removals constant time operations: removed lines leave a tombstone
+    that is skipped when walking and the list is compacted once the tombstones
+    make up more than half of it.
+
+    Items can also be read from the iterable without wrapping them into
+    container widgets (see :meth:`read_all` and :meth:`find`). Their lines are
+    only created once they are walked over, so jumping far ahead does not
+    require to build all the widgets in between.
+
+    If `window` is set, only lines up to that many positions before or after
+    the focus are kept: lines further away are evicted back to their items
+    and get re-created when they are walked over again. This bounds the
+    number of widgets held when scrolling through very long sequences.
+
+    If `prefetch` is set, lines up to that many positions ahead of the focus
+    are built by a job of the :class:`~alot.scheduler.IdleScheduler` while
+    the interface is idle, so that scrolling towards the end does not stall
+    on reading from the iterable.
+
     :param iterable: An iterator of objects to walk over
     :type iterable: Iterable[T]
     :param containerclass: An urwid widget to wrap each object in
     :type containerclass: urwid.Widget
     :param reverse: Reverse the order of the iterable
     :type reverse: bool
+    :param key: function that returns the key to index an item by
+    :type key: callable or None
+    :param prefetch: number of lines to read ahead of the focus
+    :type prefetch: int
+    :param window: number of lines to keep around the focus (0 keeps all)
+    :type window: int
     :param **kwargs: Forwarded to container class.
     """
 
-    def __init__(self, iterable, containerclass, reverse=False, **kwargs):
+    _COMPACT_MIN_TOMBSTONES = 64
+    """minimal number of tombstones before the lines get compacted"""
+
+    PREFETCH_PRIORITY = 10
+    """scheduler priority of the job that reads ahead"""
+
+    def __init__(self, iterable, containerclass, reverse=False, key=None,
+                 prefetch=0, window=0, **kwargs):
         self.iterable = iterable
         self.kwargs = kwargs
         self.containerclass = containerclass
+        self.keyfunc = key
+        self.items = []
         self.lines = []
         self.focus = 0
         self.empty = False
         self.direction = -1 if reverse else 1
+        self._positions = {}  # id(line) -> position
+        self._keys = {}  # key(item) -> position
+        self._tombstones = 0
+        self._built = set()  # positions of lines that have been created
+        self.window = window
+        self.prefetch = prefetch
+        self._prefetch_job = None
 
-    def __contains__(self, name):
-        return self.lines.__contains__(name)
+    def __contains__(self, obj):
+        pos = self._positions.get(id(obj))
+        return pos is not None and self.lines[pos] is obj
 
     def get_focus(self):
         return self._get_at_pos(self.focus)
@@ -43,27 +93,175 @@ class IterableWalker(urwid.ListWalker):
         self._modified()
 
     def get_next(self, start_from):
-        return self._get_at_pos(start_from + self.direction)
+        return self._get_at_pos(self._skip(start_from + self.direction,
+                                           self.direction))
 
     def get_prev(self, start_from):
-        return self._get_at_pos(start_from - self.direction)
+        return self._get_at_pos(self._skip(start_from - self.direction,
+                                           -self.direction))
+
+    def get_position(self, key):
+        """
+        returns the position of the read item indexed by `key` or `None`
+        if no such item has been read yet.
+        """
+        return self._keys.get(key)
+
+    def find(self, key, limit=0):
+        """
+        returns the position of the item indexed by `key`, reading up to
+        `limit` (or all, if `limit` is 0) further items from the iterable if it
+        has not been read yet. Lines for the skipped items are not created.
+
+        :param key: the key to look up
+        :param limit: maximal number of items to read
+        :type limit: int
+        :rtype: int or None
+        """
+        n = limit
+        while key not in self._keys and (not limit or n > 0):
+            if not self._read_item():
+                break
+            n -= 1
+        return self._keys.get(key)
+
+    def read_all(self):
+        """read all remaining items without creating their lines"""
+        while self._read_item():
+            pass
+
+    def get_last_position(self):
+        """returns the position of the last read item (or `None`)"""
+        return self._skip(len(self.lines) - 1, -1, consume=False)
 
     def remove(self, obj):
-        next_focus = self.focus % len(self.lines)
-        if self.focus == len(self.lines) - 1 and self.empty:
-            next_focus = self.focus - 1
+        pos = self._positions.pop(id(obj))
+        if self.keyfunc is not None:
+            self._keys.pop(self.keyfunc(self.items[pos]), None)
+        self.items[pos] = None
+        self.lines[pos] = None
+        self._built.discard(pos)
+        self._tombstones += 1
+
+        if pos == self.focus:
+            next_focus = self._skip(pos, 1, consume=False)
+            if next_focus is None and self._get_next_item() is not None:
+                next_focus = len(self.lines) - 1
+            if next_focus is None:
+                # nothing to move on to: focus the preceding line instead
+                next_focus = self._skip(pos, -1, consume=False)
+            if next_focus is not None:
+                self.focus = next_focus
+
+        if (self._tombstones >= self._COMPACT_MIN_TOMBSTONES and
+                self._tombstones * 2 > len(self.lines)):
+            self._compact()
+        self._modified()
+
+    def reset(self, iterable, items, lines):
+        """
+        replace the underlying iterable and the already read items.
+
+        This allows to update the walker in place, e.g. to re-use widgets
+        that are still valid after the iterable got re-created.
+
+        :param iterable: iterator that continues after `items`
+        :type iterable: Iterable[T]
+        :param items: objects already read from the iterable
+        :type items: list of T
+        :param lines: container widgets for `items` or `None` for those that
+                      should be created on demand
+        :type lines: list of urwid.Widget or None
+        """
+        self.cancel_prefetch()
+        self.iterable = iterable
+        self.items = items
+        self.lines = [_PENDING if line is None else line for line in lines]
+        self.empty = False
+        self.focus = min(self.focus, max(len(lines) - 1, 0))
+        self._reindex()
+        self._modified()
+
+    def cancel_prefetch(self):
+        """stop reading ahead in the background"""
+        if self._prefetch_job is not None:
+            self._prefetch_job.cancel()
+            self._prefetch_job = None
+
+    def _wants_prefetch(self):
+        return (not self.empty and
+                len(self.lines) - self.focus <= self.prefetch)
 
-        self.lines.remove(obj)
-        if self.lines:
-            self.set_focus(next_focus)
+    def _schedule_prefetch(self):
+        if self._prefetch_job is not None or not self._wants_prefetch():
+            return
+        self._prefetch_job = scheduler.schedule(
+            self._prefetch(), priority=self.PREFETCH_PRIORITY,
+            name='prefetch %s' % self.containerclass.__name__)
+
+    def _prefetch(self):
+        """consume lines ahead of the focus, one at a time"""
+        try:
+            while self._wants_prefetch():
+                yield self._get_next_item()
+        except Exception:
+            logging.exception('error while prefetching lines')
+        self._prefetch_job = None
         self._modified()
 
+    def _skip(self, pos, step, consume=True):
+        """
+        returns the first position from `pos` on (walking in direction `step`)
+        that is not a tombstone. Positions past the consumed lines are
+        returned as they are if `consume` is set, and `None` otherwise.
+        """
+        while 0 <= pos < len(self.lines):
+            if self.lines[pos] is not None:
+                return pos
+            pos += step
+        if consume and pos >= len(self.lines):
+            return pos
+        return None
+
+    def _compact(self):
+        """drop all tombstones and renumber the remaining lines"""
+        focus = self._skip(self.focus, -1, consume=False)
+        focusline = self.lines[focus] if focus is not None else None
+        self.items = [i for i, l in zip(self.items, self.lines)
+                      if l is not None]
+        self.lines = [line for line in self.lines if line is not None]
+        self._reindex()
+        if focusline is not None:
+            self.focus = self._positions[id(focusline)]
+        else:
+            self.focus = 0
+
+    def _reindex(self):
+        self._tombstones = 0
+        self._positions = {}
+        self._keys = {}
+        self._built = set()
+        for pos, (item, line) in enumerate(zip(self.items, self.lines)):
+            if line is None:
+                continue
+            if line is not _PENDING:
+                self._positions[id(line)] = pos
+                self._built.add(pos)
+            if self.keyfunc is not None:
+                self._keys[self.keyfunc(item)] = pos
+
     def _get_at_pos(self, pos):
-        if pos < 0:  # pos too low
+        if self.prefetch:
+            self._schedule_prefetch()
+        if pos is None or pos < 0:  # pos too low
             return (None, None)
         elif pos > len(self.lines):  # pos too high
             return (None, None)
         elif len(self.lines) > pos:  # pos already cached
+            if self.lines[pos] is None:  # removed line
+                return (None, None)
+            if self.lines[pos] is _PENDING:  # item read but not wrapped yet
+                self._build(pos)
             return (self.lines[pos], pos)
         else:  # pos not cached yet, look at next item from iterator
             if self.empty:  # iterator is empty
@@ -75,20 +273,65 @@ class IterableWalker(urwid.ListWalker):
                 else:
                     return (None, None)
 
-    def _get_next_item(self):
+    def _read_item(self):
+        """
+        read the next item from the iterable without creating its line.
+        Returns `False` if the iterable is exhausted.
+        """
         if self.empty:
-            return None
+            return False
         try:
             # the next line blocks until it can read from the pipe or
             # EOFError is raised. No races here.
             next_obj = next(self.iterable)
-            next_widget = self.containerclass(next_obj, **self.kwargs)
-            self.lines.append(next_widget)
         except StopIteration:
             logging.debug('EMPTY PIPE')
-            next_widget = None
             self.empty = True
-        return next_widget
+            return False
+        if self.keyfunc is not None:
+            self._keys[self.keyfunc(next_obj)] = len(self.items)
+        self.items.append(next_obj)
+        self.lines.append(_PENDING)
+        return True
+
+    def _build(self, pos):
+        widget = self.containerclass(self.items[pos], **self.kwargs)
+        self._positions[id(widget)] = pos
+        self.lines[pos] = widget
+        self._built.add(pos)
+        # evict in batches so that building a line stays cheap on average
+        if self.window and len(self._built) > 4 * self._window_size():
+            self._evict(keep=pos)
+        return widget
+
+    def _window_size(self):
+        return max(self.window, self.prefetch)
+
+    def _evict(self, keep):
+        """
+        turn lines outside of the window around the focus back into pending
+        items, except for the one at position `keep`.
+        """
+        size = self._window_size()
+        for pos in [p for p in self._built
+                    if abs(p - self.focus) > size and p != keep]:
+            del self._positions[id(self.lines[pos])]
+            self.lines[pos] = _PENDING
+            self._built.discard(pos)
+
+    def _get_next_item(self):
+        if not self._read_item():
+            return None
+        return self._build(len(self.lines) - 1)
+
+    def get_items(self):
+        """returns all read items whose lines have not been removed"""
+        return [i for i, l in zip(self.items, self.lines) if l is not None]
 
     def get_lines(self):
-        return self.lines
+        """
+        returns all consumed lines that have not been removed. This does not
+        include lines for items that have been read but not walked over yet.
+        """
+        return [line for line in self.lines
+                if line is not None and line is not _PENDING]
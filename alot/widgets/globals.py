@@ -5,6 +5,8 @@
 """
 This contains alot-specific :class:`urwid.Widget` used in more than one mode.
 """
+import asyncio
+import logging
 import re
 import operator
 import urwid
@@ -90,7 +92,9 @@ class CompleteEdit(urwid.Edit):
         :enter: calls 'on_exit' callback with current value
         :esc/ctrl g: calls 'on_exit' with value `None`, which can be
                      interpreted as cancellation
-        :tab: calls the completer and tabs forward in the result list
+        :tab: calls the completer and tabs forward in the result list.
+              Completion runs as an asyncio task if the event loop is
+              running; typing on cancels it and its results are discarded.
         :shift tab: tabs backward in the result list
         :up/down: move in the local input history
         :ctrl f/b: moves curser one character to the right/left
@@ -109,6 +113,8 @@ class CompleteEdit(urwid.Edit):
                  on_error=None,
                  edit_text='',
                  history=None,
+                 on_update=None,
+                 timeout=None,
                  **kwargs):
         """
         :param completer: completer to use
@@ -122,10 +128,20 @@ class CompleteEdit(urwid.Edit):
         :type edit_text: str
         :param history: initial command history
         :type history: list or str
+        :param on_update: called to redraw the screen after completion
+                          results arrived asynchronously
+        :type on_update: callable
+        :param timeout: seconds to wait for completion results
+                        (`None` waits indefinitely)
+        :type timeout: float
         """
         self.completer = completer
         self.on_exit = on_exit
         self.on_error = on_error
+        self.on_update = on_update
+        self.timeout = timeout
+        self._completion = None  # task that computes completions
+        self._tabs = 0  # position to tab to once completions are computed
         self.history = list(history)  # we temporarily add stuff here
         self.historypos = None
         self.focus_in_clist = 0
@@ -137,31 +153,32 @@ class CompleteEdit(urwid.Edit):
         urwid.Edit.__init__(self, edit_text=edit_text, **kwargs)
 
     def keypress(self, size, key):
+        if key not in ['tab', 'shift tab']:
+            self.cancel_completion()
         # if we tabcomplete
         if key in ['tab', 'shift tab'] and self.completer:
+            step = 1 if key == 'tab' else -1
             # if not already in completion mode
             if self.completions is None:
-                self.completions = [(self.edit_text, self.edit_pos)]
-                try:
-                    self.completions += self.completer.complete(self.edit_text,
-                                                                self.edit_pos)
-                    self.focus_in_clist = 1
-                except CompletionError as e:
-                    if self.on_error is not None:
-                        self.on_error(e)
-
-            else:  # otherwise tab through results
-                if key == 'tab':
-                    self.focus_in_clist += 1
+                if self._completion is not None:
+                    # still waiting: remember where to tab to
+                    self._tabs += step
+                elif asyncio.get_event_loop().is_running():
+                    self._tabs = 1
+                    self._completion = asyncio.ensure_future(
+                        self._complete(self.edit_text, self.edit_pos))
                 else:
-                    self.focus_in_clist -= 1
-            if len(self.completions) > 1:
-                ctext, cpos = self.completions[self.focus_in_clist %
-                                               len(self.completions)]
-                self.set_edit_text(ctext)
-                self.set_edit_pos(cpos)
-            else:
-                self.completions = None
+                    try:
+                        results = self.completer.complete(self.edit_text,
+                                                          self.edit_pos)
+                    except CompletionError as e:
+                        results = []
+                        if self.on_error is not None:
+                            self.on_error(e)
+                    self._set_completions(results, 1)
+            else:  # otherwise tab through results
+                self.focus_in_clist += step
+                self._show_completion()
         elif key in ['up', 'down']:
             if self.history:
                 if self.historypos is None:
@@ -215,6 +232,54 @@ class CompleteEdit(urwid.Edit):
             self.completions = None
             return result
 
+    def cancel_completion(self):
+        """stop computing completions that have not arrived yet"""
+        if self._completion is not None:
+            self._completion.cancel()
+            self._completion = None
+
+    async def _complete(self, text, pos):
+        try:
+            results = await asyncio.wait_for(
+                self.completer.complete_async(text, pos), self.timeout)
+        except asyncio.TimeoutError:
+            results = []
+            if self.on_error is not None:
+                self.on_error(CompletionError(
+                    'no results after %s seconds' % self.timeout))
+        except CompletionError as e:
+            results = []
+            if self.on_error is not None:
+                self.on_error(e)
+        except asyncio.CancelledError:
+            # before Python 3.8, this is an Exception too
+            raise
+        except Exception:
+            logging.exception('completing %r failed', text)
+            results = []
+        # a cancelled completion does not get here, so this one is current
+        self._completion = None
+        if (self.edit_text, self.edit_pos) != (text, pos):
+            logging.debug('discarding completions for %r', text)
+            return
+        self._set_completions(results, self._tabs)
+        if self.on_update is not None:
+            self.on_update()
+
+    def _set_completions(self, results, focus):
+        self.completions = [(self.edit_text, self.edit_pos)] + results
+        self.focus_in_clist = focus
+        self._show_completion()
+
+    def _show_completion(self):
+        if len(self.completions) > 1:
+            ctext, cpos = self.completions[self.focus_in_clist %
+                                           len(self.completions)]
+            self.set_edit_text(ctext)
+            self.set_edit_pos(cpos)
+        else:
+            self.completions = None
+
     def move_to_next_word(self, forward=True):
         if forward:
             match_iterator = re.finditer(r'(\b\W+|$)', self.edit_text,
@@ -0,0 +1,47 @@
+# This file is released under the GNU GPL, version 3 or a later revision.
+# For further details see the COPYING file
+
+"""
+Widgets specific to outbox mode
+"""
+import datetime
+
+import urwid
+
+from ..helper import pretty_datetime
+
+
+class OutboxlineWidget(urwid.Columns):
+    """one mail waiting in the :class:`~alot.outbox.Outbox`"""
+
+    def __init__(self, entry):
+        self.entry = entry
+
+        if entry.sending:
+            state = 'sending'
+        elif entry.attempts:
+            state = '{} failed, retry {}'.format(
+                entry.attempts,
+                pretty_datetime(datetime.datetime.fromtimestamp(
+                    entry.next_attempt)))
+        else:
+            state = 'queued'
+        headers = entry.headers
+        to = headers.get('Resent-To') or headers.get('To', '')
+        subject = headers.get('Subject', '')
+        columns = [('weight', 1, urwid.Text(state, wrap='clip')),
+                   ('weight', 1, urwid.Text(to, wrap='clip')),
+                   ('weight', 2, urwid.Text(subject, wrap='clip'))]
+        if entry.error:
+            columns.append(('weight', 2, urwid.Text(entry.error.split('\n')[0],
+                                                    wrap='clip')))
+        urwid.Columns.__init__(self, columns, dividechars=1)
+
+    def selectable(self):
+        return True
+
+    def keypress(self, size, key):
+        return key
+
+    def get_entry(self):
+        return self.entry
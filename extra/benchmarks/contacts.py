@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# This file is released under the GNU GPL, version 3 or a later revision.
+# For further details see the COPYING file
+"""
+Microbenchmark for address book lookups.
+
+Builds a :class:`alot.addressbook.index.ContactIndex` over synthetic
+contacts and reports the time it takes to build and to answer some queries
+of increasing length, as typed during recipient completion.
+
+    python3 extra/benchmarks/contacts.py --contacts 100000
+"""
+import argparse
+import random
+import string
+import time
+import timeit
+
+from alot.addressbook.index import ContactIndex
+
+QUERIES = ['j', 'jo', 'joh', 'john', 'john.s', 'example', 'zzzq']
+
+
+def make_contacts(count, seed=0):
+    rnd = random.Random(seed)
+    first = ['john', 'jane', 'anna', 'hans', 'maria', 'peter', 'lucas',
+             'sophie', 'ahmed', 'mei', 'olga', 'pierre', 'emma', 'noah']
+
+    def word(n):
+        return ''.join(rnd.choice(string.ascii_lowercase) for _ in range(n))
+
+    contacts = []
+    for _ in range(count):
+        given = rnd.choice(first)
+        family = word(rnd.randint(4, 10))
+        domain = rnd.choice(['example.com', 'example.org', word(6) + '.net'])
+        contacts.append(('%s %s' % (given.title(), family.title()),
+                         '%s.%s@%s' % (given, family, domain)))
+    return contacts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--contacts', type=int, default=100000)
+    parser.add_argument('--number', type=int, default=20)
+    parser.add_argument('--limit', type=int, default=100,
+                        help='number of results completion asks for')
+    args = parser.parse_args()
+
+    contacts = make_contacts(args.contacts)
+    start = time.perf_counter()
+    index = ContactIndex(contacts)
+    print('built index over %d contacts in %.2fs' % (
+        len(index), time.perf_counter() - start))
+    print('%-10s %15s %11s' % ('', 'all results', 'limited'))
+    for query in QUERIES:
+        times = []
+        for limit in (None, args.limit):
+            times.append(min(timeit.repeat(
+                lambda: index.lookup(query, limit), repeat=3,
+                number=args.number)) / args.number)
+        print('%-10r %7d %8.2f ms %8.2f ms' % (
+            query, len(index.lookup(query)), times[0] * 1000,
+            times[1] * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# This file is released under the GNU GPL, version 3 or a later revision.
+# For further details see the COPYING file
+"""
+Microbenchmark for key dispatch.
+
+Measures the time it takes to look up typed key sequences the way
+:meth:`alot.ui.UI._input_filter` does, once with the default bindings and
+once with a config that adds many more bindings to the search mode.
+
+    python3 extra/benchmarks/keybindings.py --bindings 500
+"""
+import argparse
+import logging
+import os
+import tempfile
+import timeit
+
+from alot.settings.manager import SettingsManager
+
+KEYSEQUENCES = ['j', 'k', 'g', 'g g', 'ctrl d', 'x', ' ', 'mouse press 4']
+
+
+def make_settings(extra):
+    lines = ['[bindings]', '  [[search]]']
+    for i in range(extra):
+        lines.append("    'z %d' = search tag:t%d" % (i, i))
+    with tempfile.NamedTemporaryFile(mode='w', delete=False) as f:
+        f.write('\n'.join(lines) + '\n')
+    try:
+        manager = SettingsManager()
+        manager.read_config(f.name)
+    finally:
+        os.unlink(f.name)
+    return manager
+
+
+def dispatch(manager):
+    for keyseq in KEYSEQUENCES:
+        manager.get_keymap('search').match(keyseq)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--bindings', type=int, default=500,
+                        help='number of additional bindings')
+    parser.add_argument('--number', type=int, default=20000)
+    args = parser.parse_args()
+    # don't complain about the missing hooks file
+    logging.disable(logging.ERROR)
+
+    for extra in (0, args.bindings):
+        manager = make_settings(extra)
+        seconds = min(timeit.repeat(lambda: dispatch(manager), repeat=5,
+                                    number=args.number))
+        per_key = seconds / (args.number * len(KEYSEQUENCES)) * 1e6
+        print('%5d extra bindings: %.2f us per key' % (extra, per_key))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# This file is released under the GNU GPL, version 3 or a later revision.
+# For further details see the COPYING file
+"""
+Memory benchmark for windowed search result lists.
+
+Scrolls through a result list of synthetic threads line by line, the way
+a search buffer walks its :class:`alot.walker.IterableWalker`, and reports
+the number of widgets kept alive and the traced memory afterwards, once with
+all lines kept and once per given window size. No notmuch index is needed:
+threadlines are imitated by columns of text widgets.
+
+Tracing allocations slows widget construction down considerably, so
+expect a run over 100k threads to take several minutes.
+
+    python3 extra/benchmarks/search_window.py --threads 100000
+"""
+import argparse
+import gc
+import tracemalloc
+
+import urwid
+
+from alot.walker import IterableWalker
+
+
+class FakeThreadline(urwid.AttrMap):
+    """a threadline sized widget for the thread id `tid`"""
+
+    def __init__(self, tid):
+        self.tid = tid
+        columns = urwid.Columns([
+            ('fixed', 10, urwid.Text('2 days ago')),
+            ('fixed', 7, urwid.Text('(1/12)')),
+            ('weight', 1, urwid.Text('Some Author, Another Author')),
+            ('weight', 2, urwid.Text('Re: the subject of thread %s' % tid)),
+            ('pack', urwid.Text('inbox unread')),
+        ])
+        urwid.AttrMap.__init__(self, columns, 'normal', 'focus')
+
+
+def scroll(threads, window):
+    tids = ('%016x' % i for i in range(threads))
+    walker = IterableWalker(tids, FakeThreadline, window=window)
+    gc.collect()
+    tracemalloc.start()
+    _, pos = walker.get_focus()
+    while pos is not None:
+        walker.set_focus(pos)
+        _, pos = walker.get_next(pos)
+    # jump back to the top
+    walker.set_focus(0)
+    walker.get_focus()
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return len(walker.get_lines()), current, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--threads', type=int, default=100000)
+    parser.add_argument('--window', type=int, action='append',
+                        help='window sizes to compare (default: 500)')
+    args = parser.parse_args()
+
+    print('%8s %10s %12s %12s' % ('window', 'widgets', 'current MiB',
+                                  'peak MiB'))
+    for window in [0] + (args.window or [500]):
+        lines, current, peak = scroll(args.threads, window)
+        print('%8d %10d %12.1f %12.1f' % (
+            window, lines, current / 2 ** 20, peak / 2 ** 20))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# This file is released under the GNU GPL, version 3 or a later revision.
+# For further details see the COPYING file
+"""
+Startup benchmark: time until alot shows its first search results.
+
+Builds a notmuch index over synthetic mails in a temporary directory (this
+needs the notmuch command line tool), then starts alot on it in a pseudo
+terminal a number of times and measures how long it takes until the subject
+of a thread appears on screen.
+
+    python3 extra/benchmarks/startup.py --mails 1000 --runs 10
+"""
+import argparse
+import fcntl
+import mailbox
+import os
+import pty
+import select
+import shutil
+import signal
+import statistics
+import struct
+import subprocess
+import sys
+import tempfile
+import termios
+import time
+
+MARKER = b'startup-benchmark'
+
+
+def make_index(path, count):
+    """writes `count` mails to a maildir below `path` and indexes them"""
+    mdir = mailbox.Maildir(os.path.join(path, 'mail'), create=True)
+    for i in range(count):
+        mdir.add('From: sender%d@example.com\n'
+                 'To: me@example.com\n'
+                 'Subject: %s %d\n'
+                 'Message-ID: <%d@startup.example.com>\n'
+                 'Date: Mon, 1 Jan 2018 12:00:00 +0000\n'
+                 '\n'
+                 'mail number %d\n' % (i % 50, MARKER.decode(), i, i, i))
+    nmconfig = os.path.join(path, 'notmuch-config')
+    with open(nmconfig, 'w') as f:
+        f.write('[database]\npath=%s\n'
+                '[user]\nname=Me\nprimary_email=me@example.com\n'
+                '[new]\ntags=inbox;\n' % os.path.join(path, 'mail'))
+    alotconfig = os.path.join(path, 'alot-config')
+    with open(alotconfig, 'w') as f:
+        f.write('initial_command = search tag:inbox\n')
+    subprocess.run(['notmuch', '--config', nmconfig, 'new', '--quiet'],
+                   check=True)
+    return nmconfig, alotconfig
+
+
+def time_to_first_frame(nmconfig, alotconfig, timeout=30):
+    """
+    starts alot in a pseudo terminal and returns the seconds it took until
+    the first search result was drawn
+    """
+    start = time.perf_counter()
+    pid, fd = pty.fork()
+    if pid == 0:
+        os.environ['TERM'] = 'xterm'
+        os.execv(sys.executable, [sys.executable, '-m', 'alot',
+                                  '-n', nmconfig, '-c', alotconfig])
+    fcntl.ioctl(fd, termios.TIOCSWINSZ, struct.pack('HHHH', 40, 120, 0, 0))
+    screen = b''
+    try:
+        while MARKER not in screen:
+            left = start + timeout - time.perf_counter()
+            if left <= 0 or not select.select([fd], [], [], left)[0]:
+                raise RuntimeError('alot did not show any results')
+            try:
+                screen += os.read(fd, 65536)
+            except OSError:
+                raise RuntimeError('alot exited: %r' % screen[-500:])
+        return time.perf_counter() - start
+    finally:
+        os.kill(pid, signal.SIGTERM)
+        os.waitpid(pid, 0)
+        os.close(fd)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--mails', type=int, default=1000)
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        nmconfig, alotconfig = make_index(tmpdir, args.mails)
+        # the first run warms up caches and writes bytecode
+        time_to_first_frame(nmconfig, alotconfig)
+        times = [time_to_first_frame(nmconfig, alotconfig)
+                 for _ in range(args.runs)]
+    finally:
+        shutil.rmtree(tmpdir)
+    print('time to first frame over %d runs: min %.0f ms, median %.0f ms' % (
+        args.runs, min(times) * 1000, statistics.median(times) * 1000))
+
+
+if __name__ == '__main__':
+    main()
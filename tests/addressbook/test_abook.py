@@ -36,3 +36,28 @@ class TestAbookAddressBook(unittest.TestCase):
         expected = [('me', 'me@example.com'), ('you', 'you@other.domain'),
                     ('you', 'you@example.com')]
         self.assertListEqual(actual, expected)
+
+    def test_contacts_are_reread_when_the_file_changes(self):
+        data = """
+        [format]
+        version = unknown
+        program = alot-test-suite
+        [1]
+        name = me
+        email = me@example.com
+        """
+        with tempfile.NamedTemporaryFile(mode='w+', delete=False) as tmp:
+            tmp.write(data)
+            path = tmp.name
+            self.addCleanup(os.unlink, path)
+        addressbook = abook.AbookAddressBook(path)
+        self.assertEqual(addressbook.lookup('me'), [('me', 'me@example.com')])
+        self.assertFalse(addressbook.contacts_changed())
+        with open(path, 'a') as f:
+            f.write('[2]\nname = meg\nemail = meg@example.com\n')
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        self.assertTrue(addressbook.contacts_changed())
+        self.assertEqual(addressbook.lookup('me'),
+                         [('me', 'me@example.com'),
+                          ('meg', 'meg@example.com')])
@@ -7,6 +7,8 @@ from unittest import mock
 
 from alot.addressbook import external
 
+from .. import utilities
+
 
 class TestExternalAddressbookGetContacts(unittest.TestCase):
 
@@ -70,3 +72,88 @@ class TestExternalAddressbookGetContacts(unittest.TestCase):
     def test_default_ignorecase(self):
         abook = external.ExternalAddressbook('foobar', '')
         self.assertIs(abook.reflags, re.IGNORECASE)
+
+
+class TestExternalAddressbookCaching(unittest.TestCase):
+
+    regex = '(?P<name>.*)\t(?P<email>.*)'
+    output = ('me\tme@example.com\nyou\tyou@other.domain', '', 0)
+
+    def _patch(self):
+        return mock.patch('alot.addressbook.external.call_cmd',
+                          mock.Mock(return_value=self.output))
+
+    def test_contacts_are_cached_for_ttl(self):
+        abook = external.ExternalAddressbook(
+            'foobar', self.regex, external_filtering=False, cache_ttl=60)
+        with self._patch() as call_cmd:
+            self.assertEqual(abook.lookup('me'), [('me', 'me@example.com')])
+            self.assertEqual(abook.lookup('you'),
+                             [('you', 'you@other.domain')])
+        call_cmd.assert_called_once_with(['foobar'])
+
+    def test_contacts_are_listed_again_after_ttl(self):
+        abook = external.ExternalAddressbook(
+            'foobar', self.regex, external_filtering=False, cache_ttl=60)
+        with self._patch() as call_cmd:
+            abook.lookup('me')
+            with mock.patch('alot.addressbook.external.time.monotonic',
+                            mock.Mock(return_value=10 ** 9)):
+                abook.lookup('me')
+        self.assertEqual(call_cmd.call_count, 2)
+
+    def test_filtered_lookups_are_cached_per_prefix(self):
+        abook = external.ExternalAddressbook('foobar', self.regex,
+                                             cache_ttl=60)
+        with self._patch() as call_cmd:
+            abook.lookup('me')
+            abook.lookup('me')
+            abook.lookup('you')
+        self.assertEqual(call_cmd.call_args_list,
+                         [mock.call(['foobar', 'me']),
+                          mock.call(['foobar', 'you'])])
+
+    def test_no_caching_without_ttl(self):
+        abook = external.ExternalAddressbook('foobar', self.regex)
+        with self._patch() as call_cmd:
+            abook.lookup('me')
+            abook.lookup('me')
+        self.assertEqual(call_cmd.call_count, 2)
+
+
+class TestExternalAddressbookLookupAsync(unittest.TestCase):
+
+    regex = '(?P<name>.*)\t(?P<email>.*)'
+    output = ('me\tme@example.com\nyou\tyou@other.domain', '', 0)
+
+    def _patch(self):
+        return mock.patch('alot.addressbook.external.call_cmd_async',
+                          mock.AsyncMock(return_value=self.output))
+
+    @utilities.async_test
+    async def test_command_is_called_with_prefix(self):
+        abook = external.ExternalAddressbook('foobar', self.regex)
+        with self._patch() as call_cmd_async:
+            actual = await abook.lookup_async('me')
+        call_cmd_async.assert_called_once_with(['foobar', 'me'])
+        self.assertEqual(actual, [('me', 'me@example.com'),
+                                  ('you', 'you@other.domain')])
+
+    @utilities.async_test
+    async def test_contacts_are_filtered_without_external_filtering(self):
+        abook = external.ExternalAddressbook(
+            'foobar', self.regex, external_filtering=False, cache_ttl=60)
+        with self._patch() as call_cmd_async:
+            first = await abook.lookup_async('you')
+            second = await abook.lookup_async('me')
+        call_cmd_async.assert_called_once_with(['foobar'])
+        self.assertEqual(first, [('you', 'you@other.domain')])
+        self.assertEqual(second, [('me', 'me@example.com')])
+
+    @utilities.async_test
+    async def test_raises_if_command_fails(self):
+        abook = external.ExternalAddressbook('foobar', self.regex)
+        with mock.patch('alot.addressbook.external.call_cmd_async',
+                        mock.AsyncMock(return_value=('', 'oops', 1))):
+            with self.assertRaises(external.AddressbookError):
+                await abook.lookup_async('me')
@@ -0,0 +1,69 @@
+# This file is released under the GNU GPL, version 3 or a later revision.
+# For further details see the COPYING file
+import unittest
+
+from alot.addressbook.index import ContactIndex
+
+
+class TestContactIndex(unittest.TestCase):
+
+    contacts = [
+        ('Anna Smith', 'anna@example.com'),
+        ('Johanna Doe', 'jd@example.org'),
+        ('Hans Meyer', 'hans.meyer@example.com'),
+        ('Smithers', 'waylon@example.net'),
+        (None, 'noname@example.com'),
+    ]
+
+    def setUp(self):
+        self.index = ContactIndex(self.contacts)
+
+    def test_matches_substrings_of_names_and_addresses(self):
+        self.assertCountEqual(self.index.lookup('anna'),
+                              [self.contacts[0], self.contacts[1]])
+        self.assertEqual(self.index.lookup('example.org'), [self.contacts[1]])
+
+    def test_short_queries(self):
+        self.assertEqual(self.index.lookup('jd'), [self.contacts[1]])
+        self.assertEqual(len(self.index.lookup('a')), 5)
+
+    def test_empty_query_returns_all_contacts(self):
+        self.assertEqual(self.index.lookup(''), self.contacts)
+
+    def test_no_match(self):
+        self.assertEqual(self.index.lookup('xyz'), [])
+        self.assertEqual(self.index.lookup('annax'), [])
+
+    def test_results_are_ranked(self):
+        # name prefix, word prefix and plain substring matches, in that order
+        self.assertEqual(self.index.lookup('smith'),
+                         [self.contacts[3], self.contacts[0]])
+        self.assertEqual(self.index.lookup('han'),
+                         [self.contacts[2], self.contacts[1]])
+        self.assertEqual(self.index.lookup('meyer'), [self.contacts[2]])
+
+    def test_respects_case_if_asked_to(self):
+        index = ContactIndex(self.contacts, ignorecase=False)
+        self.assertEqual(index.lookup('Smith'),
+                         [self.contacts[3], self.contacts[0]])
+        self.assertEqual(index.lookup('smith'), [])
+
+    def test_contacts_without_name(self):
+        self.assertEqual(self.index.lookup('noname'), [self.contacts[4]])
+
+    def test_limited_lookups_return_the_best_matches(self):
+        self.assertEqual(self.index.lookup('smith', limit=1),
+                         [self.contacts[3]])
+        self.assertEqual(self.index.lookup('example', limit=2),
+                         self.contacts[:2])
+        self.assertEqual(self.index.lookup('', limit=3), self.contacts[:3])
+
+    def test_matches_of_the_same_rank_keep_the_order_of_the_contacts(self):
+        index = ContactIndex([('Zoe Example', 'zoe@example.com'),
+                              ('Anne Example', 'anne@example.com'),
+                              ('Examplar', 'x@example.com')])
+        self.assertEqual(index.lookup('ex', limit=2),
+                         [index.contacts[2], index.contacts[0]])
+        self.assertEqual(index.lookup('examp'),
+                         [index.contacts[2], index.contacts[0],
+                          index.contacts[1]])
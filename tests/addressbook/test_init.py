@@ -2,6 +2,7 @@
 # This file is released under the GNU GPL, version 3 or a later revision.
 # For further details see the COPYING file
 import unittest
+from unittest import mock
 
 from alot import addressbook
 
@@ -72,3 +73,19 @@ class TestAddressBook(unittest.TestCase):
         actual = abook.lookup('[wor')
         expected = [contacts[0]]
         self.assertListEqual(actual, expected)
+
+    def test_contacts_are_listed_once(self):
+        abook = _AddressBook([('foo', 'x@example.com')])
+        with mock.patch.object(abook, 'get_contacts',
+                               wraps=abook.get_contacts) as get_contacts:
+            abook.lookup('foo')
+            abook.lookup('x@')
+        get_contacts.assert_called_once_with()
+
+    def test_contacts_are_listed_again_if_they_changed(self):
+        abook = _AddressBook([('foo', 'x@example.com')])
+        abook.lookup('foo')
+        abook._contacts = [('bar', 'y@example.com')]
+        with mock.patch.object(abook, 'contacts_changed',
+                               mock.Mock(return_value=True)):
+            self.assertEqual(abook.lookup('bar'), [('bar', 'y@example.com')])
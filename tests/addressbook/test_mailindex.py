@@ -0,0 +1,213 @@
+# This file is released under the GNU GPL, version 3 or a later revision.
+# For further details see the COPYING file
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from alot.addressbook import mailindex
+from alot.scheduler import scheduler
+
+from .. import utilities
+
+
+def _message(mid, date, sender, to='', cc=''):
+    headers = {'From': sender, 'To': to, 'Cc': cc}
+    msg = mock.Mock()
+    msg.get_message_id.return_value = mid
+    msg.get_date.return_value = date
+    msg.get_header.side_effect = headers.get
+    return msg
+
+
+class FakeDatabase:
+
+    """in-memory stand-in for a notmuch database: `messages` maps message ids
+    to (lastmod revision, message) pairs"""
+
+    def __init__(self, uuid='uuid-1'):
+        self.uuid = uuid
+        self.revision = 0
+        self.messages = {}
+        self.queries = []
+
+    def add(self, msg):
+        self.revision += 1
+        self.messages[msg.get_message_id()] = (self.revision, msg)
+
+    def get_revision(self):
+        return self.revision, self.uuid
+
+    def create_query(self, querystring):
+        self.queries.append(querystring)
+        since = 0
+        if 'lastmod:' in querystring:
+            since = int(querystring.split('lastmod:')[1].split('..')[0])
+        query = mock.Mock()
+        query.search_messages.return_value = iter(
+            [m for rev, m in self.messages.values() if rev >= since])
+        return query
+
+
+class TestNotmuchAddressBook(unittest.TestCase):
+
+    def setUp(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        self.cachefile = os.path.join(tmpdir, 'contacts')
+        self.db = FakeDatabase()
+        self.opened = 0
+        patcher = mock.patch('alot.addressbook.mailindex.Database',
+                             self._open)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch(
+            'alot.settings.const.settings.get_notmuch_setting',
+            mock.Mock(return_value='/index'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.paths = []
+        self.now = time.time()
+
+    def _open(self, path):
+        self.opened += 1
+        self.paths.append(path)
+        return self.db
+
+    def _abook(self, **kwargs):
+        return mailindex.NotmuchAddressBook(cachefile=self.cachefile,
+                                            **kwargs)
+
+    def test_opens_the_index_alot_uses(self):
+        self._abook().get_contacts()
+        self._abook(path='/other').get_contacts()
+        self.assertEqual(sorted(set(self.paths)), ['/index', '/other'])
+
+    def test_collects_addresses_from_all_address_headers(self):
+        self.db.add(_message('1', self.now, 'Me <me@example.com>',
+                             to='You <you@example.com>, x@example.com',
+                             cc='undisclosed-recipients:;'))
+        contacts = self._abook().get_contacts()
+        self.assertCountEqual(contacts, [('Me', 'me@example.com'),
+                                         ('You', 'you@example.com'),
+                                         ('', 'x@example.com')])
+
+    def test_frequent_contacts_come_first(self):
+        self.db.add(_message('1', self.now, 'a@example.com'))
+        self.db.add(_message('2', self.now, 'b@example.com'))
+        self.db.add(_message('3', self.now, 'b@example.com'))
+        contacts = self._abook().get_contacts()
+        self.assertEqual(contacts, [('', 'b@example.com'),
+                                    ('', 'a@example.com')])
+
+    def test_recent_contacts_come_first(self):
+        old = self.now - 365 * 86400
+        self.db.add(_message('1', old, 'a@example.com'))
+        self.db.add(_message('2', old, 'a@example.com'))
+        self.db.add(_message('3', self.now, 'b@example.com'))
+        contacts = self._abook().get_contacts()
+        self.assertEqual(contacts, [('', 'b@example.com'),
+                                    ('', 'a@example.com')])
+
+    def test_addresses_are_merged_case_insensitively(self):
+        self.db.add(_message('1', self.now - 10, 'Ann <Ann@Example.com>'))
+        self.db.add(_message('2', self.now, 'Ann B. <ann@example.com>'))
+        contacts = self._abook().get_contacts()
+        self.assertEqual(contacts, [('Ann B.', 'Ann@Example.com')])
+
+    def test_only_modified_messages_are_read_on_update(self):
+        self.db.add(_message('1', self.now, 'a@example.com'))
+        abook = self._abook()
+        abook.CHECK_INTERVAL = 0
+        abook.get_contacts()
+        self.db.add(_message('2', self.now, 'b@example.com'))
+        self.assertTrue(abook.contacts_changed())
+        self.assertEqual(self.db.queries, ['*', '(*) and lastmod:2..2'])
+        self.assertCountEqual(abook.get_contacts(),
+                              [('', 'a@example.com'), ('', 'b@example.com')])
+
+    def test_retagged_messages_are_not_counted_twice(self):
+        msg = _message('1', self.now, 'a@example.com')
+        self.db.add(msg)
+        abook = self._abook()
+        abook.get_contacts()
+        self.db.add(msg)
+        abook.update()
+        self.assertEqual(abook._table['a@example.com'][2], 1)
+
+    def test_unchanged_index_is_not_queried(self):
+        self.db.add(_message('1', self.now, 'a@example.com'))
+        abook = self._abook()
+        abook.get_contacts()
+        self.assertFalse(abook.contacts_changed())
+        self.assertEqual(self.db.queries, ['*'])
+
+    def test_index_is_checked_at_most_every_interval(self):
+        self.db.add(_message('1', self.now, 'a@example.com'))
+        abook = self._abook()
+        abook.get_contacts()
+        opened = self.opened
+        self.db.add(_message('2', self.now, 'b@example.com'))
+        for _ in range(3):
+            abook.lookup('a')
+        self.assertEqual(self.opened, opened)
+        abook._next_check = 0
+        abook.lookup('a')
+        self.assertEqual(self.opened, opened + 2)
+
+    @utilities.async_test
+    async def test_updates_for_worker_threads_run_in_the_background(self):
+        self.db.add(_message('1', self.now, 'a@example.com'))
+        abook = self._abook()
+        abook.update()
+        abook.get_contacts()
+        self.db.add(_message('2', self.now, 'b@example.com'))
+        abook.update = mock.Mock(side_effect=AssertionError('run inline'))
+        # let the scheduler know the loop
+        scheduler.schedule([], name='start')
+        await asyncio.sleep(0)
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(None, abook.contacts_changed)
+        for _ in range(100):
+            if abook.contacts_changed():
+                break
+            await asyncio.sleep(0.01)
+        self.assertCountEqual(abook.get_contacts(),
+                              [('', 'a@example.com'), ('', 'b@example.com')])
+        abook.update.assert_not_called()
+
+    def test_contacts_are_restored_from_the_cache_file(self):
+        self.db.add(_message('1', self.now, 'a@example.com'))
+        self._abook().get_contacts()
+        self.db.add(_message('2', self.now, 'b@example.com'))
+        contacts = self._abook().get_contacts()
+        self.assertCountEqual(contacts,
+                              [('', 'a@example.com'), ('', 'b@example.com')])
+        self.assertEqual(self.db.queries, ['*', '(*) and lastmod:2..2'])
+
+    def test_new_database_is_scanned_completely(self):
+        self.db.add(_message('1', self.now, 'a@example.com'))
+        self._abook().get_contacts()
+        self.db = FakeDatabase(uuid='uuid-2')
+        self.db.add(_message('2', self.now, 'b@example.com'))
+        contacts = self._abook().get_contacts()
+        self.assertEqual(contacts, [('', 'b@example.com')])
+        self.assertEqual(self.db.queries, ['*'])
+
+    def test_broken_cache_file_is_ignored(self):
+        with open(self.cachefile, 'w') as f:
+            f.write('garbage')
+        self.db.add(_message('1', self.now, 'a@example.com'))
+        self.assertEqual(self._abook().get_contacts(),
+                         [('', 'a@example.com')])
+
+    def test_lookup_uses_ranked_contacts(self):
+        self.db.add(_message('1', self.now, 'Bob <bob@example.com>'))
+        self.db.add(_message('2', self.now, 'Bobby <bobby@example.com>'))
+        self.db.add(_message('3', self.now, 'Bobby <bobby@example.com>'))
+        self.assertEqual(self._abook().lookup('bob'),
+                         [('Bobby', 'bobby@example.com'),
+                          ('Bob', 'bob@example.com')])
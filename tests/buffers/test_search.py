@@ -0,0 +1,137 @@
+# This file is released under the GNU GPL, version 3 or a later revision.
+# For further details see the COPYING file
+
+"""Tests for the alot.buffers.search module."""
+
+import unittest
+from unittest import mock
+
+from alot.buffers import search
+
+
+class _Threadline:
+    """Minimal stand-in for ThreadlineWidget that counts rebuilds."""
+
+    def __init__(self, tid, dbman):
+        self.tid = tid
+        self.rebuilds = 0
+
+    def rebuild(self):
+        self.rebuilds += 1
+
+    def selectable(self):
+        return True
+
+
+class TestSearchBufferRefresh(unittest.TestCase):
+
+    def setUp(self):
+        self.dbman = mock.Mock()
+        self.dbman.count_messages.return_value = 3
+        self.dbman.get_revision.return_value = (10, 'uuid')
+        self.dbman.get_threads.side_effect = lambda *_: iter(['a', 'b', 'c'])
+        ui = mock.Mock()
+        ui.dbman = self.dbman
+        patches = [
+            mock.patch('alot.buffers.search.ThreadlineWidget', _Threadline),
+            mock.patch.object(search.settings, 'get',
+                              mock.Mock(return_value=None)),
+            mock.patch.object(search.settings, 'get_notmuch_setting',
+                              mock.Mock(return_value=None)),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        self.buf = search.SearchBuffer(ui, 'tag:inbox',
+                                       sort_order='newest_first')
+        # build the lines for all results
+        walker = self.buf.threadlist
+        for pos in range(3):
+            walker.get_next(pos - 1)
+
+    def test_refresh_keeps_unchanged_widgets(self):
+        before = list(self.buf.threadlist.get_lines())
+        self.buf.refresh()
+        after = self.buf.threadlist.get_lines()
+        self.assertEqual([id(w) for w in before], [id(w) for w in after])
+        self.assertEqual([w.rebuilds for w in after], [0, 0, 0])
+        self.dbman.get_changed_thread_ids.assert_not_called()
+
+    def test_refresh_rebuilds_only_changed_widgets(self):
+        self.dbman.get_revision.return_value = (12, 'uuid')
+        self.dbman.get_changed_thread_ids.return_value = {'b'}
+        self.buf.refresh()
+        lines = self.buf.threadlist.get_lines()
+        self.assertEqual([w.rebuilds for w in lines], [0, 1, 0])
+        self.dbman.get_changed_thread_ids.assert_called_once_with(10, 12)
+
+    def test_refresh_rebuilds_all_if_index_was_replaced(self):
+        self.dbman.get_revision.return_value = (1, 'other-uuid')
+        self.buf.refresh()
+        lines = self.buf.threadlist.get_lines()
+        self.assertEqual([w.rebuilds for w in lines], [1, 1, 1])
+
+    def test_refresh_drops_and_adds_threads(self):
+        old = {w.tid: w for w in self.buf.threadlist.get_lines()}
+        self.dbman.get_threads.side_effect = lambda *_: iter(['d', 'a', 'c'])
+        self.buf.refresh()
+        lines = self.buf.threadlist.get_lines()
+        self.assertEqual([w.tid for w in lines], ['d', 'a', 'c'])
+        self.assertIs(lines[1], old['a'])
+        self.assertIs(lines[2], old['c'])
+
+    def test_refresh_keeps_focus_on_selected_thread(self):
+        self.buf.body.set_focus(2)
+        self.dbman.get_threads.side_effect = lambda *_: iter(['d', 'a', 'c'])
+        self.buf.refresh()
+        self.assertEqual(self.buf.get_selected_threadline().tid, 'c')
+
+
+class TestSearchBufferFocus(unittest.TestCase):
+
+    def setUp(self):
+        self.dbman = mock.Mock()
+        self.dbman.count_messages.return_value = 1000
+        self.dbman.get_revision.return_value = (10, 'uuid')
+        self.dbman.get_threads.side_effect = \
+            lambda *_: iter(str(i) for i in range(1000))
+        self.dbman.get_thread.side_effect = mock.Mock
+        ui = mock.Mock()
+        ui.dbman = self.dbman
+        self.built = []
+
+        def threadline(tid, dbman):
+            self.built.append(tid)
+            return _Threadline(tid, dbman)
+
+        def setting(name):
+            return {'search_threads_rebuild_limit': 0}.get(name)
+
+        patches = [
+            mock.patch('alot.buffers.search.ThreadlineWidget', threadline),
+            mock.patch.object(search.settings, 'get',
+                              mock.Mock(side_effect=setting)),
+            mock.patch.object(search.settings, 'get_notmuch_setting',
+                              mock.Mock(return_value=None)),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_focus_last_does_not_build_skipped_lines(self):
+        buf = search.SearchBuffer(mock.Mock(dbman=self.dbman), 'tag:inbox',
+                                  sort_order='unsorted')
+        buf.focus_last()
+        self.assertEqual(buf.get_selected_threadline().tid, '999')
+        # only the initially focussed line and the target line got built
+        self.assertEqual(self.built, ['0', '999'])
+
+    def test_focus_thread_does_not_build_skipped_lines(self):
+        buf = search.SearchBuffer(mock.Mock(dbman=self.dbman), 'tag:inbox',
+                                  sort_order='unsorted')
+        thread = mock.Mock()
+        thread.get_thread_id.return_value = '500'
+        buf.focus_thread(thread)
+        self.assertEqual(buf.get_selected_threadline().tid, '500')
+        # only the initially focussed line and the target line got built
+        self.assertEqual(self.built, ['0', '500'])
@@ -0,0 +1,74 @@
+# This file is released under the GNU GPL, version 3 or a later revision.
+# For further details see the COPYING file
+
+"""Tests for the alot.buffers.thread module."""
+
+import asyncio
+import concurrent.futures
+import unittest
+from unittest import mock
+
+from alot.buffers import thread
+
+from ..utilities import async_test
+
+
+class TestThreadBufferCryptoPool(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = mock.Mock(workers=2)
+        patches = [
+            mock.patch('alot.buffers.thread.cryptopool', self.pool),
+            mock.patch.object(thread.ThreadBuffer, 'rebuild',
+                              lambda buf: setattr(buf, 'body', mock.Mock())),
+            mock.patch.object(thread.settings, 'get',
+                              mock.Mock(return_value=2)),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        self.futures = {}
+        self.messages = [self._message('plain', False),
+                         self._message('signed', True),
+                         self._message('encrypted', True)]
+        self.thread = mock.Mock()
+        self.thread.get_messages.return_value = {m: [] for m in self.messages}
+
+    def _message(self, name, crypto):
+        msg = mock.Mock(name=name)
+        msg.uses_crypto.return_value = crypto
+        self.futures[name] = concurrent.futures.Future()
+        msg.parse_in.return_value = self.futures[name]
+        return msg
+
+    def test_no_workers_without_event_loop(self):
+        thread.ThreadBuffer(mock.Mock(), self.thread)
+        for msg in self.messages:
+            msg.parse_in.assert_not_called()
+
+    @async_test
+    async def test_crypto_messages_are_handed_to_the_pool(self):
+        thread.ThreadBuffer(mock.Mock(), self.thread)
+        self.messages[0].parse_in.assert_not_called()
+        self.messages[1].parse_in.assert_called_once_with(self.pool)
+        self.messages[2].parse_in.assert_called_once_with(self.pool)
+
+    @async_test
+    async def test_progress_is_tracked(self):
+        ui = mock.Mock()
+        buf = thread.ThreadBuffer(ui, self.thread)
+        self.assertEqual(buf._crypto_progress, (0, 2))
+        self.futures['signed'].set_result(mock.Mock())
+        self.futures['encrypted'].set_exception(RuntimeError())
+        await buf._crypto_task
+        self.assertEqual(buf._crypto_progress, (2, 2))
+        ui.update.assert_called()
+
+    @async_test
+    async def test_cleanup_cancels_pending_messages(self):
+        buf = thread.ThreadBuffer(mock.Mock(), self.thread)
+        await asyncio.sleep(0)
+        buf.cleanup()
+        with self.assertRaises(asyncio.CancelledError):
+            await buf._crypto_task
+        self.assertTrue(self.futures['signed'].cancelled())
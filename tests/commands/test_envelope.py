@@ -18,14 +18,17 @@
 
 import email
 import os
+import shutil
 import tempfile
 import textwrap
 import unittest
 from unittest import mock
 
+from alot import outbox
 from alot.commands import envelope
 from alot.db.envelope import Envelope
 from alot.errors import GPGProblem
+from alot.helper import SpooledMail
 from alot.settings.errors import NoMatchingAccount
 from alot.settings.manager import SettingsManager
 from alot.account import Account
@@ -383,3 +386,82 @@ class TestSendCommand(unittest.TestCase):
                                                          return_default=True)
         # check that the apply did run through till the end.
         account.send_mail.assert_called_once_with(mail)
+
+    @utilities.async_test
+    async def test_spooled_mail_is_closed_after_sending(self):
+        mail = SpooledMail(email.message_from_string(self.mail))
+        cmd = envelope.SendCommand(mail=mail)
+        account = mock.Mock(wraps=self.MockedAccount())
+        account.store_sent_mail.return_value = None
+        with mock.patch(
+                'alot.commands.envelope.settings.account_matching_address',
+                mock.Mock(return_value=account)):
+            await cmd.apply(mock.Mock())
+        account.send_mail.assert_called_once_with(mail)
+        self.assertTrue(mail._file.closed)
+
+    @utilities.async_test
+    async def test_changed_attachment_is_not_sent(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        path = os.path.join(tmpdir, 'data.bin')
+        with open(path, 'wb') as f:
+            f.write(b'\x00' * 100)
+        env = Envelope(headers={'From': ['foo@example.com'],
+                                'To': ['bar@example.com'],
+                                'User-Agent': ['alot']},
+                       bodytext='Foo')
+        env.account = self.MockedAccount()
+        env.attach(path)
+        with open(path, 'ab') as f:
+            f.write(b'more')
+        cmd = envelope.SendCommand(envelope=env)
+        account = mock.Mock(wraps=self.MockedAccount())
+        ui = mock.Mock()
+        with mock.patch(
+                'alot.commands.envelope.settings.account_matching_address',
+                mock.Mock(return_value=account)):
+            await cmd.apply(ui)
+        account.send_mail.assert_not_called()
+        ui.notify.assert_called_with(
+            'attachment {} changed since it was attached'.format(path),
+            priority='error')
+
+    @utilities.async_test
+    async def test_mail_is_queued_in_outbox(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        queue = outbox.Outbox(os.path.join(tmpdir, 'outbox'))
+        cmd = envelope.SendCommand(mail=self.mail)
+        account = self.MockedAccount()
+        account.send_mail = mock.Mock()
+        with mock.patch('alot.commands.envelope.settings.get',
+                        mock.Mock(return_value=True)), \
+                mock.patch('alot.commands.envelope.settings.'
+                           'account_matching_address',
+                           mock.Mock(return_value=account)), \
+                mock.patch('alot.commands.envelope.outbox', queue):
+            await cmd.apply(mock.Mock())
+        account.send_mail.assert_not_called()
+        entry, = queue.entries
+        self.assertEqual(entry.account, 'foo@example.com')
+        self.assertEqual(entry.headers['Subject'], 'FooBar')
+
+    @utilities.async_test
+    async def test_send_queued(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        queue = outbox.Outbox(os.path.join(tmpdir, 'outbox'))
+        entry = queue.add(self.mail, 'foo@example.com', tags=['sent'],
+                          replied='<id@example.com>')
+        account = mock.Mock(wraps=self.MockedAccount())
+        account.store_sent_mail.return_value = None
+        ui = mock.Mock()
+        with mock.patch('alot.commands.envelope.settings.'
+                        'account_matching_address',
+                        mock.Mock(return_value=account)), \
+                mock.patch('alot.commands.envelope.outbox', queue):
+            await envelope.send_queued(ui, entry)
+        account.send_mail.assert_called_once()
+        ui.dbman.tag.assert_called_once_with('id:<id@example.com>',
+                                             account.replied_tags)
@@ -17,10 +17,12 @@
 """Tests for global commands."""
 
 import os
+import sys
 import tempfile
 import unittest
 from unittest import mock
 
+from alot import commands
 from alot.commands import globals as g_commands
 
 from .. import utilities
@@ -103,6 +105,39 @@ class TestComposeCommand(unittest.TestCase):
                           'Subject': [subject]}, cmd.envelope.headers)
         self.assertEqual(body, cmd.envelope.body_txt)
 
+    @utilities.async_test
+    async def test_compose_before_envelope_commands_are_loaded(self):
+        async def skip(*args):
+            pass
+
+        steps = ['_get_sender_details', '_set_signature', '_set_to',
+                 '_set_subject', '_set_compose_tags', '_set_gpg_encrypt']
+        patches = [mock.patch.object(g_commands.ComposeCommand, step, skip)
+                   for step in steps]
+        patches.append(mock.patch.object(g_commands.ComposeCommand,
+                                         '_set_gpg_sign'))
+        # forget about the envelope commands, and restore them afterwards
+        patches += [mock.patch.dict(sys.modules),
+                    mock.patch.dict(vars(commands)),
+                    mock.patch.dict(commands.COMMANDS['envelope'])]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        sys.modules.pop('alot.commands.envelope', None)
+        vars(commands).pop('envelope', None)
+
+        applied = []
+
+        async def apply_command(cmd):
+            applied.append(cmd)
+
+        ui = utilities.make_ui(apply_command=apply_command)
+        envelope = self._make_envelope_mock()
+        await g_commands.ComposeCommand(envelope=envelope).apply(ui)
+        cmd, = applied
+        self.assertEqual(type(cmd).__name__, 'EditCommand')
+        self.assertIs(cmd.envelope, envelope)
+
 
 class TestExternalCommand(unittest.TestCase):
 
@@ -121,6 +156,28 @@ class TestExternalCommand(unittest.TestCase):
         await cmd.apply(ui)
         ui.notify.assert_not_called()
 
+    @utilities.async_test
+    async def test_no_spawn_stdin_file_success(self):
+        ui = utilities.make_ui()
+        with tempfile.TemporaryFile() as f:
+            f.write(b'0')
+            f.seek(0)
+            cmd = g_commands.ExternalCommand("awk '{ exit $0 }'", stdin=f,
+                                             refocus=False)
+            await cmd.apply(ui)
+        ui.notify.assert_not_called()
+
+    @utilities.async_test
+    async def test_thread_stdin_file_success(self):
+        ui = utilities.make_ui()
+        with tempfile.TemporaryFile() as f:
+            f.write(b'0')
+            f.seek(0)
+            cmd = g_commands.ExternalCommand("awk '{ exit $0 }'", stdin=f,
+                                             refocus=False, thread=True)
+            await cmd.apply(ui)
+        ui.notify.assert_not_called()
+
     @utilities.async_test
     async def test_no_spawn_no_stdin_attached(self):
         ui = utilities.make_ui()
@@ -5,11 +5,18 @@
 
 """Test suite for alot.commands.thread module."""
 import email
+import email.mime.application
+import os
+import shutil
+import tempfile
 import unittest
 from unittest import mock
 
 from alot.commands import thread
 from alot.account import Account
+from alot.db.attachment import Attachment
+
+from .. import utilities
 
 # Good descriptive test names often don't fit PEP8, which is meant to cover
 # functions meant to be called by humans.
@@ -151,3 +158,49 @@ class TestDetermineSender(unittest.TestCase):
         expected = ('to+some_tag@example.com', account2)
         self._test(accounts=[account1, account2, account3], expected=expected,
                    mail=mail)
+
+
+class TestSaveAttachmentCommand(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+
+    @staticmethod
+    def _attachment(name, data):
+        part = email.mime.application.MIMEApplication(data)
+        part.add_header('Content-Disposition', 'attachment', filename=name)
+        return Attachment(part)
+
+    def _save_all(self, attachments):
+        ui = utilities.make_ui()
+        msg = ui.current_buffer.get_selected_message.return_value
+        msg.get_attachments.return_value = attachments
+        cmd = thread.SaveAttachmentCommand(all=True, path=self.dir)
+        utilities.async_test(cmd.apply)(ui)
+        return ui
+
+    def test_all_attachments_are_saved(self):
+        ui = self._save_all([self._attachment('a', b'A' * 100000),
+                             self._attachment('b', b'B')])
+        with open(os.path.join(self.dir, 'a'), 'rb') as f:
+            self.assertEqual(f.read(), b'A' * 100000)
+        with open(os.path.join(self.dir, 'b'), 'rb') as f:
+            self.assertEqual(f.read(), b'B')
+        ui.notify.assert_any_call(
+            'saved a as: %s' % os.path.join(self.dir, 'a'))
+        ui.notify.assert_any_call('saved 2 of 2 attachments', timeout=-1)
+
+    def test_attachments_of_the_same_name_are_saved_one_by_one(self):
+        self._save_all([self._attachment('a', b'1' * 100000),
+                        self._attachment('a', b'2' * 100)])
+        with open(os.path.join(self.dir, 'a'), 'rb') as f:
+            self.assertEqual(f.read(), b'2' * 100)
+
+    def test_failures_are_reported(self):
+        os.mkdir(os.path.join(self.dir, 'a'))
+        ui = self._save_all([self._attachment('a', b'A'),
+                             self._attachment('b', b'B')])
+        self.assertTrue(os.path.exists(os.path.join(self.dir, 'b')))
+        ui.notify.assert_any_call(mock.ANY, priority='error')
+        ui.notify.assert_any_call('saved 1 of 2 attachments', timeout=-1)
@@ -0,0 +1,66 @@
+# This file is released under the GNU GPL, version 3 or a later revision.
+# For further details see the COPYING file
+import email.mime.application
+import tempfile
+import unittest
+from unittest import mock
+
+from alot.db.attachment import Attachment
+from alot.helper import MAGIC_SAMPLE_SIZE, FilePart
+
+
+class TestAttachmentContentType(unittest.TestCase):
+
+    def _attachment(self, data, ctype='octet-stream'):
+        return Attachment(email.mime.application.MIMEApplication(data, ctype))
+
+    def test_declared_type_is_kept(self):
+        attachment = self._attachment(b'%PDF-1.4\n', 'zip')
+        self.assertEqual(attachment.get_content_type(), 'application/zip')
+
+    def test_underspecified_type_is_guessed(self):
+        attachment = self._attachment(b'%PDF-1.4\n' + b'x' * 100000)
+        self.assertEqual(attachment.get_content_type(), 'application/pdf')
+
+    def test_guess_is_remembered(self):
+        attachment = self._attachment(b'%PDF-1.4\n')
+        with mock.patch('alot.db.attachment.guess_mimetype',
+                        return_value='application/pdf') as guess:
+            attachment.get_content_type()
+            str(attachment)
+        guess.assert_called_once()
+
+    def test_only_the_start_is_decoded(self):
+        data = bytes(range(256)) * 1000
+        attachment = self._attachment(data)
+        with mock.patch.object(attachment, 'get_data') as get_data:
+            sample = attachment._get_sample()
+        get_data.assert_not_called()
+        self.assertGreaterEqual(len(sample), MAGIC_SAMPLE_SIZE)
+        self.assertTrue(data.startswith(sample))
+
+
+class TestAttachmentWrite(unittest.TestCase):
+
+    def test_content_is_written_piecewise(self):
+        data = bytes(range(256)) * 1000
+        attachment = Attachment(email.mime.application.MIMEApplication(data))
+        fhandle = mock.Mock()
+        with mock.patch.object(attachment, 'get_data') as get_data:
+            attachment.write(fhandle)
+        get_data.assert_not_called()
+        self.assertGreater(fhandle.write.call_count, 1)
+        written = b''.join(c[0][0] for c in fhandle.write.call_args_list)
+        self.assertEqual(written, data)
+
+
+class TestFileAttachment(unittest.TestCase):
+
+    def test_size_of_file_parts_is_read_from_disk(self):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write(b'x' * 1000)
+            f.flush()
+            attachment = Attachment(FilePart(f.name, 'application', 'zip'))
+            with mock.patch.object(FilePart, 'get_payload') as payload:
+                self.assertEqual(attachment.get_size(), 1000)
+            payload.assert_not_called()
@@ -0,0 +1,45 @@
+# This file is released under the GNU GPL, version 3 or a later revision.
+# For further details see the COPYING file
+import os
+import shutil
+import tempfile
+import unittest
+
+from alot.db.cryptopool import CryptoPool
+
+
+class TestCryptoPool(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = CryptoPool(workers=2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.shutdown()
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+
+    def test_messages_are_parsed_in_workers(self):
+        path = os.path.join(self.tmpdir, 'mail')
+        with open(path, 'wb') as f:
+            f.write(b'Subject: test\n\nThis is some text\n')
+        mail = self.pool.submit(path, []).result(timeout=60)
+        self.assertEqual(mail['Subject'], 'test')
+        self.assertEqual(mail.get_payload(), 'This is some text\n')
+
+    def test_errors_are_passed_on(self):
+        future = self.pool.submit(os.path.join(self.tmpdir, 'missing'), [])
+        with self.assertRaises(FileNotFoundError):
+            future.result(timeout=60)
+
+    def test_shutdown_drops_waiting_messages(self):
+        path = os.path.join(self.tmpdir, 'mail')
+        with open(path, 'wb') as f:
+            f.write(b'Subject: test\n\nThis is some text\n')
+        pool = CryptoPool(workers=1)
+        futures = [pool.submit(path, []) for _ in range(10)]
+        pool.shutdown()
+        self.assertTrue(futures[-1].cancelled())
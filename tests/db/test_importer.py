@@ -0,0 +1,152 @@
+# This file is released under the GNU GPL, version 3 or a later revision.
+# For further details see the COPYING file
+import itertools
+import mailbox
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from alot.db.errors import DatabaseError
+from alot.db.importer import MailImport
+
+
+MAIL = 'From: me@example.com\nSubject: %s\n\nbody\n'
+
+
+class TestMailImport(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.root = os.path.join(self.tmpdir, 'mail')
+        os.mkdir(self.root)
+        self.indexed = []
+        self.dbman = mock.Mock()
+        self.dbman.path = self.root
+        self.dbman.add_messages.side_effect = self._add_messages
+
+    def _add_messages(self, paths, tags, batchsize, progress):
+        paths = list(paths)
+        self.indexed.extend(paths)
+        progress(len(paths))
+        return len(paths)
+
+    def _import(self, *sources):
+        job = MailImport(self.dbman, sources,
+                         os.path.join(self.root, 'import'), tags=['new'],
+                         journal=os.path.join(self.tmpdir, 'journal'))
+        return job, job.run()
+
+    def _maildir(self, path, count):
+        mdir = mailbox.Maildir(path)
+        for i in range(count):
+            msg = mailbox.MaildirMessage(MAIL % i)
+            if i % 2:
+                msg.set_subdir('cur')
+                msg.set_flags('S')
+            mdir.add(msg)
+        return mdir
+
+    def test_mails_below_the_root_are_indexed_in_place(self):
+        self._maildir(os.path.join(self.root, 'inbox'), 3)
+        with open(os.path.join(self.root, 'inbox', 'tmp', 'partial'),
+                  'w') as f:
+            f.write(MAIL % 'incomplete')
+        job, added = self._import(self.root)
+        self.assertEqual(added, 3)
+        self.assertEqual(job.total, 3)
+        self.assertEqual(job.done, 3)
+        for path in self.indexed:
+            self.assertTrue(path.startswith(
+                os.path.join(self.root, 'inbox', '')))
+        self.assertFalse(os.path.exists(os.path.join(self.root, 'import')))
+
+    def test_other_mails_are_copied_with_their_flags(self):
+        self._maildir(os.path.join(self.tmpdir, 'old'), 2)
+        self._import(os.path.join(self.tmpdir, 'old'))
+        copies = mailbox.Maildir(os.path.join(self.root, 'import'))
+        self.assertEqual(sorted(m['Subject'] for m in copies), ['0', '1'])
+        self.assertEqual(sorted(m.get_flags() for m in copies), ['', 'S'])
+        self.assertEqual(len(self.indexed), 2)
+        for path in self.indexed:
+            self.assertTrue(os.path.exists(path))
+
+    def test_maildir_plus_plus_folders_are_imported(self):
+        self._maildir(os.path.join(self.tmpdir, 'old'), 1)
+        self._maildir(os.path.join(self.tmpdir, 'old', '.Sent'), 2)
+        os.makedirs(os.path.join(self.tmpdir, 'old', '.cache', 'new'))
+        with open(os.path.join(self.tmpdir, 'old', '.cache', 'new', 'x'),
+                  'w') as f:
+            f.write(MAIL % 'hidden')
+        job, added = self._import(os.path.join(self.tmpdir, 'old'))
+        self.assertEqual(job.total, 3)
+        copies = mailbox.Maildir(os.path.join(self.root, 'import'))
+        self.assertEqual(sorted(m['Subject'] for m in copies),
+                         ['0', '0', '1'])
+
+    def test_unreadable_mails_are_counted(self):
+        self._maildir(os.path.join(self.tmpdir, 'old'), 3)
+        real_copy = MailImport._copy
+        calls = itertools.count()
+
+        def copy(job, item):
+            if next(calls) == 0:
+                raise OSError('unreadable')
+            return real_copy(job, item)
+
+        with mock.patch.object(MailImport, '_copy', copy):
+            job, added = self._import(os.path.join(self.tmpdir, 'old'))
+        self.assertEqual(added, 2)
+        self.assertEqual(job.skipped, 1)
+        self.assertEqual(job.done, job.total)
+
+    def test_mbox_files_are_split(self):
+        mbox = mailbox.mbox(os.path.join(self.tmpdir, 'old.mbox'))
+        for i in range(3):
+            mbox.add(MAIL % i)
+        mbox.close()
+        job, added = self._import(os.path.join(self.tmpdir, 'old.mbox'))
+        self.assertEqual(added, 3)
+        copies = mailbox.Maildir(os.path.join(self.root, 'import'))
+        self.assertEqual(sorted(m['Subject'] for m in copies),
+                         ['0', '1', '2'])
+
+    def test_interrupted_imports_are_resumed(self):
+        self._maildir(os.path.join(self.tmpdir, 'old'), 4)
+        self.dbman.add_messages.side_effect = self._fail
+        with self.assertRaises(DatabaseError):
+            self._import(os.path.join(self.tmpdir, 'old'))
+        self.assertTrue(os.path.exists(os.path.join(self.tmpdir, 'journal')))
+        first = sorted(os.listdir(os.path.join(self.root, 'import', 'new')) +
+                       os.listdir(os.path.join(self.root, 'import', 'cur')))
+
+        self.dbman.add_messages.side_effect = self._add_messages
+        self._import(os.path.join(self.tmpdir, 'old'))
+        second = sorted(os.listdir(os.path.join(self.root, 'import', 'new')) +
+                        os.listdir(os.path.join(self.root, 'import', 'cur')))
+        self.assertEqual(first, second)
+        self.assertEqual(len(self.indexed), 4)
+        self.assertFalse(os.path.exists(os.path.join(self.tmpdir, 'journal')))
+
+    def _fail(self, paths, *args, **kwargs):
+        list(paths)
+        raise DatabaseError('disk full')
+
+    def test_cancelled_imports_stop_between_batches(self):
+        self._maildir(os.path.join(self.root, 'inbox'), 5)
+        job = MailImport(self.dbman, [self.root], self.root,
+                         journal=os.path.join(self.tmpdir, 'journal'))
+        job.BATCH_SIZE = 2
+        job.on_progress = lambda job: job.cancel()
+        self.dbman.add_messages.side_effect = self._add_in_batches
+        job.run()
+        self.assertEqual(len(self.indexed), 2)
+
+    def _add_in_batches(self, paths, tags, batchsize, progress):
+        for path in paths:
+            self.indexed.append(path)
+            if len(self.indexed) % batchsize == 0:
+                progress(len(self.indexed))
+        return len(self.indexed)
@@ -8,10 +8,13 @@ import tempfile
 import textwrap
 import os
 import shutil
+import unittest
+from unittest import mock
 
+from alot.db.errors import DatabaseError
 from alot.db.manager import DBManager
 from alot.settings.const import settings
-from notmuch import Database
+from notmuch import Database, NotmuchError
 
 from .. import utilities
 
@@ -50,3 +53,116 @@ class TestDBManager(utilities.TestCaseClassCleanup):
 
         named_queries_dict = self.manager.get_named_queries()
         self.assertDictEqual(named_queries_dict, {alias: querystring})
+
+
+class TestDBManagerTagCache(unittest.TestCase):
+
+    def setUp(self):
+        self.db = mock.Mock()
+        self.db.get_revision.return_value = (1, 'uuid')
+        self.db.get_all_tags.return_value = iter(['inbox', 'attachment'])
+        self.db.end_atomic.return_value = 0
+        self.db.create_query.return_value.search_messages.return_value = [
+            mock.Mock()]
+        patcher = mock.patch('alot.db.manager.Database',
+                             mock.Mock(return_value=self.db))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.manager = DBManager('/tmp')
+
+    def test_tags_are_sorted(self):
+        self.assertListEqual(self.manager.get_all_tags(),
+                             ['attachment', 'inbox'])
+
+    def test_tags_are_cached_while_the_revision_is_unchanged(self):
+        self.manager.get_all_tags()
+        self.manager.get_all_tags()
+        self.db.get_all_tags.assert_called_once_with()
+
+    def test_tags_are_enumerated_again_after_external_changes(self):
+        self.manager.get_all_tags()
+        self.db.get_revision.return_value = (2, 'uuid')
+        self.db.get_all_tags.return_value = iter(['spam'])
+        self.assertListEqual(self.manager.get_all_tags(), ['spam'])
+
+    def test_tags_added_by_flush_are_cached(self):
+        tags = self.manager.get_all_tags()
+        self.manager.tag('*', ['foo', 'inbox'])
+        self.db.get_revision.side_effect = [(1, 'uuid'), (2, 'uuid'),
+                                            (2, 'uuid')]
+        with mock.patch('alot.db.manager.settings.get_notmuch_setting',
+                        mock.Mock(return_value=False)):
+            self.manager.flush()
+        self.assertListEqual(self.manager.get_all_tags(),
+                             ['attachment', 'foo', 'inbox'])
+        self.db.get_all_tags.assert_called_once_with()
+        self.assertListEqual(tags, ['attachment', 'inbox'])
+
+    def test_untagging_invalidates_the_cache(self):
+        self.manager.get_all_tags()
+        self.manager.untag('*', ['inbox'])
+        self.db.get_revision.return_value = (2, 'uuid')
+        with mock.patch('alot.db.manager.settings.get_notmuch_setting',
+                        mock.Mock(return_value=False)):
+            self.manager.flush()
+        self.db.get_all_tags.return_value = iter(['attachment'])
+        self.assertListEqual(self.manager.get_all_tags(), ['attachment'])
+
+    def test_setting_and_untagging_drop_the_cached_tags(self):
+        for remove_rest in (False, True):
+            self.manager.get_all_tags()
+            if remove_rest:
+                self.manager.tag('*', ['inbox'], remove_rest=True)
+            else:
+                self.manager.untag('*', ['inbox'])
+            with mock.patch('alot.db.manager.settings.get_notmuch_setting',
+                            mock.Mock(return_value=False)):
+                self.manager.flush()
+            self.assertIsNone(self.manager._tags)
+
+    def test_writes_are_flushed_through_one_handle(self):
+        called = []
+        self.manager.tag('*', ['foo'], afterwards=lambda: called.append(
+            self.db.close.called))
+        self.manager.untag('*', ['bar'])
+        self.manager.save_named_query('key', 'tag:foo')
+        with mock.patch('alot.db.manager.settings.get_notmuch_setting',
+                        mock.Mock(return_value=False)):
+            self.manager.flush()
+        self.assertEqual(len(self.manager.writequeue), 0)
+        self.assertEqual(self.db.begin_atomic.call_count, 3)
+        self.db.close.assert_called_once_with()
+        # callbacks run once the database is closed again
+        self.assertEqual(called, [True])
+
+    def test_failed_writes_stay_queued(self):
+        self.manager.tag('*', ['foo'])
+        self.manager.untag('*', ['bar'])
+        self.db.create_query.side_effect = [
+            self.db.create_query.return_value, NotmuchError()]
+        with mock.patch('alot.db.manager.settings.get_notmuch_setting',
+                        mock.Mock(return_value=False)):
+            with self.assertRaises(DatabaseError):
+                self.manager.flush()
+        self.assertEqual([item[0] for item in self.manager.writequeue],
+                         ['untag'])
+        self.db.close.assert_called_once_with()
+
+    def test_messages_are_added_in_batches(self):
+        self.db.find_message_by_filename.side_effect = \
+            lambda path: mock.Mock() if path == '/tmp/2' else None
+        self.db.add_message.return_value = (mock.Mock(), 0)
+        progress = mock.Mock()
+        with mock.patch('alot.db.manager.settings.get_notmuch_setting',
+                        mock.Mock(return_value=False)):
+            added = self.manager.add_messages(
+                ('/tmp/%d' % i for i in range(5)), ['new'], batchsize=2,
+                progress=progress)
+        # the indexed file is skipped
+        self.assertEqual(added, 4)
+        self.assertEqual(self.db.begin_atomic.call_count, 3)
+        self.assertEqual([c[0][0] for c in progress.call_args_list],
+                         [2, 4, 5])
+        self.db.add_message.return_value[0].add_tag.assert_called_with(
+            'new', sync_maildir_flags=False)
+        self.db.close.assert_called_once_with()
@@ -14,6 +14,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import concurrent.futures
 import unittest
 from unittest import mock
 
@@ -110,3 +111,59 @@ class TestMessage(unittest.TestCase):
                         mock.Mock(return_value=[acc])):
             msg = message.Message(mock.Mock(), MockNotmuchMessage())
         self.assertEqual(msg.get_author(), ('Unknown', ''))
+
+
+class TestMessageParsedInPool(unittest.TestCase):
+
+    def _message(self, tags=None):
+        with mock.patch('alot.db.message.settings.get_accounts',
+                        mock.Mock(return_value=[])):
+            return message.Message(mock.Mock(), MockNotmuchMessage(
+                headers={'From': 'a@example.com'}, tags=tags))
+
+    def test_uses_crypto(self):
+        self.assertTrue(self._message(tags=['signed']).uses_crypto())
+        self.assertTrue(self._message(tags=['encrypted']).uses_crypto())
+        self.assertFalse(self._message(tags=['inbox']).uses_crypto())
+
+    def test_parse_in_submits_once(self):
+        msg = self._message()
+        pool = mock.Mock()
+        future = msg.parse_in(pool)
+        self.assertIs(msg.parse_in(pool), future)
+        pool.submit.assert_called_once_with('filename', [])
+
+    def test_get_email_uses_the_pool_result(self):
+        msg = self._message()
+        mail = mock.Mock()
+        future = concurrent.futures.Future()
+        future.set_result(mail)
+        msg.parse_in(mock.Mock(submit=mock.Mock(return_value=future)))
+        self.assertIs(msg.get_email(), mail)
+        self.assertIsNone(msg.parse_in(mock.Mock()))
+
+    def test_get_email_parses_itself_if_the_pool_fails(self):
+        msg = self._message()
+        future = concurrent.futures.Future()
+        future.set_exception(RuntimeError('worker died'))
+        msg.parse_in(mock.Mock(submit=mock.Mock(return_value=future)))
+        mail = mock.Mock()
+        with mock.patch('builtins.open', mock.mock_open(read_data=b'')), \
+                mock.patch('alot.db.message.utils.'
+                           'decrypted_message_from_bytes',
+                           return_value=mail) as parse:
+            self.assertIs(msg.get_email(), mail)
+        parse.assert_called_once_with(b'', [])
+
+    def test_get_email_parses_itself_if_the_pool_takes_too_long(self):
+        msg = self._message()
+        msg.POOL_TIMEOUT = 0.01
+        future = concurrent.futures.Future()
+        msg.parse_in(mock.Mock(submit=mock.Mock(return_value=future)))
+        mail = mock.Mock()
+        with mock.patch('builtins.open', mock.mock_open(read_data=b'')), \
+                mock.patch('alot.db.message.utils.'
+                           'decrypted_message_from_bytes',
+                           return_value=mail):
+            self.assertIs(msg.get_email(), mail)
+        self.assertTrue(future.cancelled())
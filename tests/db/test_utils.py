@@ -6,9 +6,11 @@
 import base64
 import codecs
 import email
+import email.encoders
 import email.header
 import email.mime.application
 import email.mime.multipart
+import email.mime.text
 import email.policy
 import email.utils
 from email.message import EmailMessage
@@ -23,8 +25,10 @@ from unittest import mock
 import gpg
 
 from alot import crypto
+from alot import helper
 from alot.db import utils
-from alot.errors import GPGProblem
+from alot.db.verification import VerificationCache
+from alot.errors import GPGCode, GPGProblem
 from alot.account import Account
 from ..utilities import make_key, make_uid, TestCaseClassCleanup
 
@@ -364,6 +368,201 @@ class TestAddSignatureHeaders(unittest.TestCase):
             mail.headers)
 
 
+class TestVerificationCache(unittest.TestCase):
+
+    def setUp(self):
+        self.stamp = 1
+        patchers = [
+            mock.patch('alot.db.utils.verification_cache',
+                       VerificationCache()),
+            mock.patch('alot.db.verification.crypto.keyring.stamp',
+                       lambda: self.stamp),
+            mock.patch('alot.db.utils.crypto.get_key',
+                       side_effect=GPGProblem('no key', 0)),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_verified_content_is_not_checked_again(self):
+        sig = mock.Mock(fpr='ABCD', exp_timestamp=0)
+        with mock.patch('alot.db.utils.crypto.verify_detached',
+                        return_value=[sig]) as verify:
+            first = utils._verify_detached(b'signed', b'signature')
+            second = utils._verify_detached(b'signed', b'signature')
+        verify.assert_called_once_with(b'signed', b'signature')
+        self.assertEqual([s.fpr for s in first], ['ABCD'])
+        self.assertEqual([s.fpr for s in second], ['ABCD'])
+
+    def test_different_content_is_checked(self):
+        with mock.patch('alot.db.utils.crypto.verify_detached',
+                        return_value=[]) as verify:
+            utils._verify_detached(b'signed', b'signature')
+            utils._verify_detached(b'signed!', b'signature')
+        self.assertEqual(verify.call_count, 2)
+
+    def test_content_is_checked_again_after_keyring_changes(self):
+        with mock.patch('alot.db.utils.crypto.verify_detached',
+                        return_value=[]) as verify:
+            utils._verify_detached(b'signed', b'signature')
+            self.stamp = 2
+            utils._verify_detached(b'signed', b'signature')
+        self.assertEqual(verify.call_count, 2)
+
+    def test_bad_signatures_are_remembered(self):
+        error = GPGProblem('bad', code=GPGCode.BAD_SIGNATURE)
+        with mock.patch('alot.db.utils.crypto.verify_detached',
+                        side_effect=error) as verify:
+            for _ in range(2):
+                with self.assertRaises(GPGProblem) as cm:
+                    utils._verify_detached(b'signed', b'signature')
+                self.assertEqual(cm.exception.code, GPGCode.BAD_SIGNATURE)
+        verify.assert_called_once()
+
+    def test_other_errors_are_not_remembered(self):
+        error = GPGProblem('no key', code=GPGCode.NOT_FOUND)
+        with mock.patch('alot.db.utils.crypto.verify_detached',
+                        side_effect=error) as verify:
+            for _ in range(2):
+                with self.assertRaises(GPGProblem):
+                    utils._verify_detached(b'signed', b'signature')
+        self.assertEqual(verify.call_count, 2)
+
+    def test_decryption_skips_known_signatures(self):
+        sig = mock.Mock(fpr='ABCD', exp_timestamp=0)
+        with mock.patch('alot.db.utils.crypto.decrypt_verify',
+                        return_value=([sig], b'text')) \
+                as decrypt:
+            utils._decrypt_verify(b'encrypted', None)
+            sigs, text = utils._decrypt_verify(b'encrypted', None)
+        self.assertEqual(decrypt.call_args_list, [
+            mock.call(b'encrypted', None),
+            mock.call(b'encrypted', None, verify=False)])
+        self.assertEqual([s.fpr for s in sigs], ['ABCD'])
+        self.assertEqual(text, b'text')
+
+    def test_expired_signatures_are_checked_again(self):
+        sig = mock.Mock(fpr='ABCD', exp_timestamp=1000)
+        with mock.patch('alot.db.utils.crypto.verify_detached',
+                        return_value=[sig]) as verify, \
+                mock.patch('alot.db.verification.time.time',
+                           return_value=999):
+            utils._verify_detached(b'signed', b'signature')
+            utils._verify_detached(b'signed', b'signature')
+            verify.assert_called_once()
+            with mock.patch('alot.db.verification.time.time',
+                            return_value=1000):
+                utils._verify_detached(b'signed', b'signature')
+        self.assertEqual(verify.call_count, 2)
+
+    def test_results_expire_with_the_signing_key(self):
+        sig = mock.Mock(fpr='SUB', exp_timestamp=0)
+        key = mock.Mock(subkeys=[mock.Mock(fpr='MAIN', expires=3000),
+                                 mock.Mock(fpr='SUB', expires=2000),
+                                 mock.Mock(fpr='OTHER', expires=1000)])
+        with mock.patch('alot.db.utils.crypto.get_key', return_value=key):
+            self.assertEqual(utils._expiry([sig]), 2000)
+            key.subkeys[0].expires = 1500
+            self.assertEqual(utils._expiry([sig]), 1500)
+            key.subkeys[0].expires = key.subkeys[1].expires = 0
+            self.assertIsNone(utils._expiry([sig]))
+
+
+class TestGetDecodedSize(unittest.TestCase):
+
+    def _part(self, data, encoder):
+        return email.mime.application.MIMEApplication(data, _encoder=encoder)
+
+    def test_base64(self):
+        for size in (0, 1, 2, 3, 56, 57, 58, 1000):
+            data = bytes(range(256)) * 4
+            part = self._part(data[:size], email.encoders.encode_base64)
+            self.assertEqual(utils.get_decoded_size(part), size)
+
+    def test_quoted_printable(self):
+        data = 'Grüße, ' * 30 + 'x = y'
+        part = email.mime.text.MIMEText(data, 'plain', 'utf-8')
+        del part['Content-Transfer-Encoding']
+        part.set_payload(data.encode('utf-8'))
+        email.encoders.encode_quopri(part)
+        self.assertIn('=\n', part.get_payload())
+        self.assertEqual(utils.get_decoded_size(part),
+                         len(part.get_payload(decode=True)))
+
+    def test_unencoded(self):
+        part = self._part(b'abc', email.encoders.encode_7or8bit)
+        self.assertEqual(utils.get_decoded_size(part), 3)
+
+    def test_multipart_counts_its_parts(self):
+        mail = email.mime.multipart.MIMEMultipart()
+        mail.attach(self._part(b'abc', email.encoders.encode_7or8bit))
+        mail.attach(self._part(b'x' * 10, email.encoders.encode_base64))
+        self.assertEqual(utils.get_decoded_size(mail), 13)
+
+    def test_size_is_remembered(self):
+        part = self._part(b'abc', email.encoders.encode_base64)
+        utils.get_decoded_size(part)
+        with mock.patch.object(part, 'get_payload') as get_payload:
+            self.assertEqual(utils.get_decoded_size(part), 3)
+        get_payload.assert_not_called()
+
+    def test_sizes_are_determined_when_parsing(self):
+        mail = email.mime.multipart.MIMEMultipart()
+        mail.attach(self._part(b'abc', email.encoders.encode_base64))
+        parsed = utils.decrypted_message_from_bytes(mail.as_bytes())
+        with mock.patch('alot.db.utils._estimate_decoded_size') as estimate:
+            self.assertEqual(utils.get_decoded_size(parsed), 3)
+            self.assertEqual(
+                utils.get_decoded_size(parsed.get_payload(0)), 3)
+        estimate.assert_not_called()
+
+
+class TestIterDecodedPayload(unittest.TestCase):
+
+    data = bytes(range(256)) * 40
+
+    def _decoded(self, part, chunksize):
+        return list(utils.iter_decoded_payload(part, chunksize))
+
+    def test_base64(self):
+        part = email.mime.application.MIMEApplication(self.data)
+        for chunksize in (1, 7, 100, 76 * 3, len(self.data) * 2):
+            chunks = self._decoded(part, chunksize)
+            self.assertEqual(b''.join(chunks), self.data)
+        self.assertGreater(len(self._decoded(part, 100)), 1)
+
+    def test_base64_without_padding(self):
+        part = email.mime.application.MIMEApplication(b'')
+        part.set_payload('YWJjZA')
+        self.assertEqual(b''.join(self._decoded(part, 3)), b'abcd')
+
+    def test_quoted_printable(self):
+        part = email.mime.application.MIMEApplication(
+            self.data, _encoder=email.encoders.encode_quopri)
+        for chunksize in (1, 50, len(self.data) * 4):
+            chunks = self._decoded(part, chunksize)
+            self.assertEqual(b''.join(chunks),
+                             part.get_payload(decode=True))
+        self.assertGreater(len(self._decoded(part, 50)), 1)
+
+    def test_unencoded(self):
+        part = email.mime.text.MIMEText('Grüße', 'plain', 'utf-8')
+        part.replace_header('Content-Transfer-Encoding', '8bit')
+        part.set_payload('Grüße'.encode('utf-8').decode(
+            'ascii', 'surrogateescape'))
+        self.assertEqual(b''.join(self._decoded(part, 2)),
+                         'Grüße'.encode('utf-8'))
+
+    def test_file_parts_are_read_from_disk(self):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write(self.data)
+            f.flush()
+            part = helper.FilePart(f.name, 'application', 'octet-stream')
+            chunks = self._decoded(part, 1000)
+        self.assertEqual(b''.join(chunks), self.data)
+        self.assertEqual(len(chunks), 11)
+
+
 class TestMessageFromFile(TestCaseClassCleanup):
 
     @classmethod
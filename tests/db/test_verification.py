@@ -0,0 +1,98 @@
+# This file is released under the GNU GPL, version 3 or a later revision.
+# For further details see the COPYING file
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+from alot.db.verification import VerificationCache
+
+
+class TestVerificationCache(unittest.TestCase):
+
+    def setUp(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        self.path = os.path.join(tmpdir, 'alot', 'verification')
+        self.stamp = ('home', 1.0)
+        patcher = mock.patch('alot.db.verification.crypto.keyring.stamp',
+                             lambda: self.stamp)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_digest_depends_on_part_boundaries(self):
+        self.assertNotEqual(VerificationCache.digest(b'ab', b'c'),
+                            VerificationCache.digest(b'a', b'bc'))
+
+    def test_stored_result_is_returned(self):
+        cache = VerificationCache()
+        digest = cache.digest(b'signed', b'signature')
+        self.assertIsNone(cache.get(digest))
+        cache.put(digest, {'fprs': ['ABCD']})
+        self.assertEqual(cache.get(digest), {'fprs': ['ABCD']})
+
+    def test_results_expire_when_the_keyring_changes(self):
+        cache = VerificationCache()
+        digest = cache.digest(b'signed', b'signature')
+        cache.put(digest, {'fprs': ['ABCD']})
+        self.stamp = ('home', 2.0)
+        self.assertIsNone(cache.get(digest))
+
+    def test_results_expire(self):
+        cache = VerificationCache(self.path)
+        digest = cache.digest(b'signed', b'signature')
+        cache.put(digest, {'fprs': ['ABCD']}, expires=1000)
+        with mock.patch('alot.db.verification.time.time', return_value=999):
+            self.assertEqual(cache.get(digest), {'fprs': ['ABCD']})
+        cache.close()
+        cache = VerificationCache(self.path)
+        with mock.patch('alot.db.verification.time.time', return_value=999):
+            self.assertEqual(cache.get(digest), {'fprs': ['ABCD']})
+        with mock.patch('alot.db.verification.time.time', return_value=1000):
+            self.assertIsNone(cache.get(digest))
+        cache.close()
+
+    def test_results_of_older_versions_are_dropped(self):
+        os.makedirs(os.path.dirname(self.path))
+        db = sqlite3.connect(self.path)
+        db.execute('CREATE TABLE results ('
+                   'digest BLOB PRIMARY KEY, stamp TEXT, result TEXT)')
+        db.execute('INSERT INTO results VALUES (?, ?, ?)',
+                   (b'digest', 'stamp', '{}'))
+        db.commit()
+        db.close()
+        cache = VerificationCache(self.path)
+        db = sqlite3.connect(self.path)
+        self.assertEqual(
+            db.execute('SELECT COUNT(*) FROM results').fetchone(), (0,))
+        db.close()
+        digest = cache.digest(b'signed', b'signature')
+        cache.put(digest, {'fprs': []})
+        self.assertEqual(cache.get(digest), {'fprs': []})
+        cache.close()
+
+    def test_results_are_persisted(self):
+        cache = VerificationCache(self.path)
+        digest = cache.digest(b'signed', b'signature')
+        cache.put(digest, {'error': 'bad signature'})
+        cache.close()
+        cache = VerificationCache(self.path)
+        self.assertEqual(cache.get(digest), {'error': 'bad signature'})
+        cache.close()
+
+    def test_unusable_database_falls_back_to_memory(self):
+        os.makedirs(self.path)
+        cache = VerificationCache(self.path)
+        digest = cache.digest(b'signed', b'signature')
+        cache.put(digest, {'fprs': []})
+        self.assertEqual(cache.get(digest), {'fprs': []})
+
+    def test_clear(self):
+        cache = VerificationCache(self.path)
+        digest = cache.digest(b'signed', b'signature')
+        cache.put(digest, {'fprs': []})
+        cache.clear()
+        self.assertIsNone(cache.get(digest))
+        cache.close()
@@ -0,0 +1,48 @@
+# This file is released under the GNU GPL, version 3 or a later revision.
+# For further details see the COPYING file
+
+"""Test suite for alot.settings.keymap module."""
+
+import unittest
+
+from alot.settings.keymap import KeyMap
+
+
+class TestKeyMap(unittest.TestCase):
+
+    def setUp(self):
+        self.keymap = KeyMap({
+            'j': 'move down',
+            'g g': 'move first',
+            'g t': 'bnext',
+            'ctrl f': 'move page down',
+            ' ': 'move page down',
+            'z': 'fold',
+            'z z': 'unfold',
+        })
+
+    def test_get(self):
+        self.assertEqual(self.keymap.get('g g'), 'move first')
+        self.assertIsNone(self.keymap.get('g'))
+        self.assertIsNone(self.keymap.get('x'))
+
+    def test_match_bound_sequence(self):
+        self.assertEqual(self.keymap.match('j'), ('move down', False))
+        self.assertEqual(self.keymap.match('ctrl f'),
+                         ('move page down', False))
+        self.assertEqual(self.keymap.match(' '), ('move page down', False))
+
+    def test_match_prefix_of_longer_sequences(self):
+        self.assertEqual(self.keymap.match('g'), (None, True))
+        self.assertEqual(self.keymap.match('z'), ('fold', True))
+
+    def test_match_unbound_sequence(self):
+        self.assertEqual(self.keymap.match('x'), (None, False))
+        self.assertEqual(self.keymap.match('g x'), (None, False))
+        self.assertEqual(self.keymap.match('j j'), (None, False))
+
+    def test_candidates(self):
+        self.assertCountEqual(self.keymap.candidates('g'), ['g g', 'g t'])
+        self.assertCountEqual(self.keymap.candidates('z'), ['z z', 'z'])
+        self.assertEqual(self.keymap.candidates('x'), [])
+        self.assertEqual(len(self.keymap.candidates(None)), 7)
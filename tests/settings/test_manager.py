@@ -4,15 +4,21 @@
 
 """Test suite for alot.settings.manager module."""
 
+import asyncio
+import mailbox
 import os
 import re
+import shutil
 import tempfile
 import textwrap
 import unittest
 from unittest import mock
 
+from validate import Validator
+
 from alot.settings.manager import SettingsManager
 from alot.settings.errors import ConfigError, NoMatchingAccount
+from alot.settings.utils import ConfigCache
 
 from .. import utilities
 
@@ -197,6 +203,127 @@ class TestSettingsManager(unittest.TestCase):
         manager.read_config(f.name)
         self.assertEqual(manager.get_tagstring_representation(tag)['translated'], translated_goal)
 
+    def test_settings_read_from_the_cache_are_the_same(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        config = os.path.join(tmpdir, 'config')
+        with open(config, 'w') as f:
+            f.write(textwrap.dedent("""\
+                prefer_plaintext = True
+                [tags]
+                    [[foo]]
+                        translated = bar
+                [bindings]
+                    k = search foo
+                """))
+        cache = os.path.join(tmpdir, 'cache')
+
+        results = []
+        for _ in range(2):
+            manager = SettingsManager()
+            manager.cache = ConfigCache(cache)
+            manager.read_config(config)
+            results.append((
+                manager.get('prefer_plaintext'),
+                manager.get_tagstring_representation('foo')['translated'],
+                manager.get_keybinding('global', 'k'),
+                manager.get_theming_attribute('global', 'body')))
+        self.assertTrue(os.path.exists(cache))
+        self.assertEqual(results[0][:3], (True, 'bar', 'search foo'))
+        self.assertEqual(results[0], results[1])
+
+    def test_mailboxes_are_opened_again_with_the_cache(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        config = os.path.join(tmpdir, 'config')
+        with open(config, 'w') as f:
+            f.write(textwrap.dedent("""\
+                [accounts]
+                    [[default]]
+                        realname = That Guy
+                        address = thatguy@example.com
+                        sent_box = mbox://{0}/sent
+                        draft_box = maildir://{0}/drafts
+                """.format(tmpdir)))
+        cache = os.path.join(tmpdir, 'cache')
+
+        for _ in range(2):
+            manager = SettingsManager()
+            manager.cache = ConfigCache(cache)
+            with mock.patch('alot.settings.utils.Validator',
+                            wraps=Validator) as validator:
+                manager.read_config(config)
+            account, = manager.get_accounts()
+            self.assertIsInstance(account.sent_box, mailbox.mbox)
+            self.assertIsInstance(account.draft_box, mailbox.Maildir)
+            self.assertTrue(os.path.isdir(os.path.join(tmpdir, 'drafts')))
+            account.sent_box.close()
+            shutil.rmtree(os.path.join(tmpdir, 'drafts'))
+        # the second run took the config from the cache
+        validator.assert_not_called()
+
+    @utilities.async_test
+    async def test_replaced_accounts_are_closed(self):
+        with tempfile.NamedTemporaryFile(mode='w+', delete=False) as f:
+            f.write(textwrap.dedent("""\
+                [accounts]
+                    [[default]]
+                        realname = That Guy
+                        address = thatguy@example.com
+                        submission_url = smtp://localhost:25
+                """))
+        self.addCleanup(os.unlink, f.name)
+        manager = SettingsManager()
+        manager.read_config(f.name)
+        old, = manager.get_accounts()
+        closed = []
+
+        async def close():
+            closed.append(old)
+
+        old.close = close
+        manager.read_config(f.name)
+        await asyncio.sleep(0)
+        self.assertEqual(closed, [old])
+        self.assertIsNot(manager.get_accounts()[0], old)
+
+
+class TestSettingsManagerKeybindings(unittest.TestCase):
+
+    def setUp(self):
+        with tempfile.NamedTemporaryFile(mode='w+', delete=False) as f:
+            f.write(textwrap.dedent("""\
+                [bindings]
+                    x = bnext
+                    'g x' = bprevious
+                    [[search]]
+                        x = bclose
+                        j =
+                """))
+        self.addCleanup(os.unlink, f.name)
+        self.manager = SettingsManager()
+        self.manager.read_config(f.name)
+
+    def test_mode_bindings_override_global_ones(self):
+        self.assertEqual(self.manager.get_keybinding('search', 'x'), 'bclose')
+        self.assertEqual(self.manager.get_keybinding('thread', 'x'), 'bnext')
+
+    def test_empty_mode_binding_unmaps_global_one(self):
+        self.assertIsNone(self.manager.get_keybinding('search', 'j'))
+        self.assertEqual(self.manager.get_keybinding('thread', 'j'),
+                         'move down')
+
+    def test_mapped_input_keysequences(self):
+        self.assertCountEqual(
+            self.manager.get_mapped_input_keysequences('search', 'g'),
+            ['g g', 'g x'])
+        self.assertEqual(
+            self.manager.get_mapped_input_keysequences('search', 'j'), [])
+        self.assertEqual(
+            self.manager.get_mapped_input_keysequences('envelope', 'j'),
+            ['j'])
+
+
 class TestSettingsManagerExpandEnvironment(unittest.TestCase):
     """ Tests SettingsManager._expand_config_values """
     setting_name = 'template_dir'
@@ -86,3 +86,28 @@ class TestThemeGetAttribute(unittest.TestCase):
     def test_invalid_colorindex_raises_value_error(self):
         with self.assertRaises(ValueError):
             self.theme.get_attribute(0, 'global', 'body')
+
+
+class TestThemeOutbox(unittest.TestCase):
+
+    def test_themes_without_outbox_use_the_bufferlist_attributes(self):
+        lines = DUMMY_THEME.replace(
+            "    line_focus = '', '', '', '', '', ''\n",
+            "    line_focus = 'bold', '', 'bold', '', 'bold', ''\n",
+            1).splitlines()
+        thm = theme.Theme(lines)
+        for colourmode in (1, 16, 256):
+            self.assertEqual(
+                thm.get_attribute(colourmode, 'outbox', 'line_focus'),
+                thm.get_attribute(colourmode, 'bufferlist', 'line_focus'))
+        self.assertIn('bold', thm.get_attribute(
+            256, 'outbox', 'line_focus').foreground)
+
+    def test_outbox_attributes_can_be_set(self):
+        lines = (DUMMY_THEME + "[outbox]\n"
+                 "    line_odd = 'bold', '', 'bold', '', 'bold', ''\n")
+        thm = theme.Theme(lines.splitlines())
+        self.assertIn('bold', thm.get_attribute(
+            256, 'outbox', 'line_odd').foreground)
+        self.assertNotIn('bold', thm.get_attribute(
+            256, 'outbox', 'line_even').foreground)
@@ -4,10 +4,17 @@
 
 """Tests for the alot.setting.utils module."""
 
+import os
+import shutil
+import tempfile
+import threading
 import unittest
 from unittest import mock
 
+from validate import ValidateError
+
 from alot.settings import utils
+from alot.settings.errors import ConfigError
 
 
 class TestResolveAtt(unittest.TestCase):
@@ -71,3 +78,73 @@ class TestResolveAtt(unittest.TestCase):
         expected = attr.foreground, attr.background
         actual = utils.resolve_att(attr, self.fallback)
         self.assertTupleEqual(actual, expected)
+
+
+class TestConfigCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.config = os.path.join(self.tmpdir, 'config')
+        self.spec = os.path.join(self.tmpdir, 'spec')
+        self._write(self.config, 'answer = 42\n')
+        self._write(self.spec, 'answer = integer(default=0)\n')
+        self.path = os.path.join(self.tmpdir, 'cache', 'config')
+
+    @staticmethod
+    def _write(path, text):
+        with open(path, 'w') as f:
+            f.write(text)
+
+    def _read(self):
+        cache = utils.ConfigCache(self.path)
+        config = utils.read_config(self.config, self.spec, cache=cache)
+        cache.save()
+        return config
+
+    def test_unchanged_files_are_not_validated_again(self):
+        self._read()
+        with mock.patch('alot.settings.utils.Validator') as validator:
+            config = self._read()
+        validator.assert_not_called()
+        self.assertEqual(config['answer'], 42)
+
+    def test_changed_files_are_validated_again(self):
+        self._read()
+        for path, text in [(self.config, 'answer = 23\n'),
+                           (self.spec, 'answer = string(default="")\n')]:
+            with self.subTest(path=path):
+                self._write(path, text)
+                with mock.patch('alot.settings.utils.Validator',
+                                wraps=utils.Validator) as validator:
+                    config = self._read()
+                validator.assert_called_once_with()
+        self.assertEqual(config['answer'], '23')
+
+    def test_late_checks_run_on_every_read(self):
+        self._write(self.spec, 'answer = later(default=None)\n')
+        check = mock.Mock(side_effect=lambda value: threading.Lock())
+        for _ in range(2):
+            cache = utils.ConfigCache(self.path)
+            config = utils.read_config(self.config, self.spec, cache=cache,
+                                       late_checks={'later': check})
+            cache.save()
+            self.assertIsInstance(config['answer'], type(threading.Lock()))
+        self.assertEqual(check.call_args_list, [mock.call('42')] * 2)
+        with mock.patch('alot.settings.utils.Validator') as validator:
+            utils.read_config(self.config, self.spec, cache=cache,
+                              late_checks={'later': check})
+        validator.assert_not_called()
+
+    def test_failing_late_checks_raise_config_errors(self):
+        self._write(self.spec, 'answer = later(default=None)\n')
+        check = mock.Mock(side_effect=ValidateError('no such thing'))
+        with self.assertRaisesRegex(ConfigError, 'answer.*no such thing'):
+            utils.read_config(self.config, self.spec,
+                              late_checks={'later': check})
+
+    def test_broken_cache_is_ignored(self):
+        os.makedirs(os.path.dirname(self.path))
+        self._write(self.path, 'not a cache')
+        self.assertEqual(self._read()['answer'], 42)
+        self.assertEqual(self._read()['answer'], 42)
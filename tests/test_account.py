@@ -15,10 +15,17 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 
+import email
 import logging
+import mailbox
+import os
+import shutil
+import tempfile
 import unittest
+from unittest import mock
 
 from alot import account
+from alot import helper
 
 from . import utilities
 
@@ -179,9 +186,120 @@ class TestSend(unittest.TestCase):
         #self.assertIn(cm.output, "sent mail successfullya")
         self.assertIn("INFO:root:sent mail successfully", cm.output)
 
+    @utilities.async_test
+    async def test_spooled_mail_is_piped_to_sendmail(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            out = os.path.join(tmpdir, 'out')
+            a = account.SendmailAccount(address="test@alot.dev",
+                                        cmd="tee " + out)
+            mail = email.message_from_string('Subject: test\n\ntext\n')
+            await a.send_mail(helper.SpooledMail(mail))
+            with open(out, 'rb') as f:
+                self.assertEqual(f.read(), b'Subject: test\r\n\r\ntext\r\n')
+
     @utilities.async_test
     async def test_failing_sendmail_command_is_noticed(self):
         a = account.SendmailAccount(address="test@alot.dev", cmd="false")
         with self.assertRaises(account.SendingMailFailed):
             with self.assertLogs(level=logging.ERROR):
                 await a.send_mail("some text")
+
+
+class TestSMTPAccount(unittest.TestCase):
+
+    async def _account(self, **kwargs):
+        server = await utilities.FakeSMTPServer(**kwargs).start()
+        self.addCleanup(utilities.async_test(server.stop))
+        return server, account.SMTPAccount(server.url,
+                                           address='test@alot.dev')
+
+    @utilities.async_test
+    async def test_envelope_is_taken_from_the_headers(self):
+        server, a = await self._account()
+        mail = email.message_from_string(
+            'From: Me <me@alot.dev>\nTo: a@example.com, B <b@example.com>\n'
+            'Cc: c@example.com\nBcc: d@example.com\n\ntext\n')
+        await a.send_mail(helper.SpooledMail(mail))
+        sender, recipients, data = server.mails[0]
+        self.assertEqual(sender, 'me@alot.dev')
+        self.assertEqual(recipients, ['a@example.com', 'b@example.com',
+                                      'c@example.com', 'd@example.com'])
+        self.assertNotIn(b'Bcc', data)
+
+    @utilities.async_test
+    async def test_bounced_mails_go_to_the_resent_recipients(self):
+        server, a = await self._account()
+        await a.send_mail('From: x@example.com\nTo: me@alot.dev\n'
+                          'Resent-From: me@alot.dev\n'
+                          'Resent-To: y@example.com\n\ntext\n')
+        self.assertEqual(server.mails[0][:2], ('me@alot.dev',
+                                               ['y@example.com']))
+
+    @utilities.async_test
+    async def test_rejected_mails_fail(self):
+        server, a = await self._account(reject=['a@example.com'])
+        with self.assertRaises(account.SendingMailFailed):
+            with self.assertLogs(level=logging.ERROR):
+                await a.send_mail('To: a@example.com\n\ntext\n')
+
+    @utilities.async_test
+    async def test_mails_without_recipients_fail(self):
+        server, a = await self._account()
+        with self.assertRaises(account.SendingMailFailed):
+            await a.send_mail('Subject: test\n\ntext\n')
+        self.assertEqual(server.connections, 0)
+
+
+class TestStoreMail(unittest.TestCase):
+
+    def setUp(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        self.maildir = mailbox.Maildir(os.path.join(tmpdir, 'sent'))
+        self.mail = email.message_from_string(
+            'From: foo@example.com\nSubject: test\n\ntext\n')
+
+    def test_spooled_mail_is_stored_as_seen(self):
+        path = account.Account.store_mail(self.maildir,
+                                          helper.SpooledMail(self.mail))
+        self.assertTrue(path.endswith(':2,S'))
+        stored = self.maildir.get_message(self.maildir.keys()[0])
+        self.assertEqual(stored.get_flags(), 'S')
+        self.assertEqual(stored['Subject'], 'test')
+        with open(path, 'rb') as f:
+            self.assertNotIn(b'\r\n', f.read())
+
+    def test_path_of_the_new_file_is_returned(self):
+        path = account.Account.store_mail(self.maildir, self.mail)
+        key, = self.maildir.keys()
+        self.assertEqual(path, os.path.join(self.maildir._path,
+                                            self.maildir._lookup(key)))
+        self.assertEqual(os.path.dirname(path),
+                         os.path.join(self.maildir._path, 'new'))
+        self.assertEqual(os.listdir(os.path.join(self.maildir._path, 'tmp')),
+                         [])
+
+    def test_incomplete_mails_are_not_left_behind(self):
+        with mock.patch('alot.account._write_message',
+                        mock.Mock(side_effect=OSError('disk full'))):
+            with self.assertRaises(account.StoreMailError):
+                account.Account.store_mail(self.maildir, self.mail)
+        self.assertEqual(os.listdir(os.path.join(self.maildir._path, 'tmp')),
+                         [])
+        self.assertEqual(self.maildir.keys(), [])
+
+    def test_spooled_mail_is_stored_like_a_string(self):
+        spooled = account.Account.store_mail(self.maildir,
+                                             helper.SpooledMail(self.mail))
+        stored = account.Account.store_mail(self.maildir, str(self.mail))
+        with open(spooled, 'rb') as f, open(stored, 'rb') as g:
+            self.assertEqual(f.read(), g.read())
+
+    def test_every_mail_gets_its_own_file(self):
+        mail = b'Subject: a\r\n\r\na\r\n'
+        first = account.add_to_maildir(self.maildir, mail)
+        second = account.add_to_maildir(self.maildir, mail)
+        self.assertNotEqual(first, second)
+        self.assertEqual(len(self.maildir.keys()), 2)
+        with open(first, 'rb') as f:
+            self.assertEqual(f.read(), b'Subject: a\n\na\n')
@@ -8,14 +8,17 @@ import unittest
 from unittest import mock
 
 from alot.completion.abooks import AbooksCompleter
+from alot.completion.multipleselection import MultipleSelectionCompleter
 from alot.completion.stringlist import StringlistCompleter
 
+from . import utilities
+
 # Good descriptive test names often don't fit PEP8, which is meant to cover
 # functions meant to be called by humans.
 # pylint: disable=invalid-name
 
 
-def _mock_lookup(query):
+def _mock_lookup(query, limit=None):
     """Look up the query from fixed list of names and email addresses."""
     abook = [
         ("", "no-real-name@example.com"),
@@ -30,7 +33,7 @@ def _mock_lookup(query):
     for name, email in abook:
         if query in name or query in email:
             results.append((name, email))
-    return results
+    return results[:limit]
 
 
 class AbooksCompleterTest(unittest.TestCase):
@@ -102,3 +105,57 @@ class StringlistCompleterTest(unittest.TestCase):
         actual = completer.complete('[', 1)
         expected = [(tags[0], len(tags[0]))]
         self.assertListEqual(actual, expected)
+
+    def test_prefix_matches_keep_the_order_of_the_list(self):
+        completer = StringlistCompleter(['foo', 'bar', 'Fab', 'fa'])
+        actual = completer.complete('fa', 2)
+        self.assertListEqual(actual, [('Fab', 3), ('fa', 2)])
+
+    def test_case_sensitive_matching(self):
+        completer = StringlistCompleter(['Foo', 'foo'], ignorecase=False)
+        self.assertListEqual(completer.complete('F', 1), [('Foo', 3)])
+
+    def test_match_anywhere(self):
+        completer = StringlistCompleter(['afoo', 'bar', 'FOO'],
+                                        match_anywhere=True)
+        actual = completer.complete('foo', 3)
+        self.assertListEqual(actual, [('afoo', 4), ('FOO', 3)])
+
+    def test_only_text_before_cursor_is_matched(self):
+        completer = StringlistCompleter(['foo', 'bar'])
+        self.assertListEqual(completer.complete('fxx', 1), [('foo', 3)])
+
+    def test_replaced_resultlist_is_used(self):
+        completer = StringlistCompleter(['foo'])
+        completer.complete('f', 1)
+        completer.resultlist = ['fun']
+        self.assertListEqual(completer.complete('f', 1), [('fun', 3)])
+
+
+class AsyncCompletionTest(unittest.TestCase):
+    """Tests for the asynchronous completion interface."""
+
+    @utilities.async_test
+    async def test_default_runs_complete(self):
+        completer = StringlistCompleter(['foo', 'bar'])
+        actual = await completer.complete_async('f', 1)
+        self.assertListEqual(actual, [('foo', 3)])
+
+    @utilities.async_test
+    async def test_abooks_are_looked_up_asynchronously(self):
+        abook = mock.Mock()
+        abook.lookup_async = mock.AsyncMock(side_effect=_mock_lookup)
+        completer = AbooksCompleter([abook, abook], addressesonly=True)
+        actual = await completer.complete_async('foo', 3)
+        self.assertListEqual(actual, [('foo@example.com', 15)] * 2)
+        abook.lookup.assert_not_called()
+        abook.lookup_async.assert_awaited_with('foo', AbooksCompleter.LIMIT)
+
+    @utilities.async_test
+    async def test_multiple_selection_delegates_to_async_completer(self):
+        inner = mock.Mock()
+        inner.complete_async = mock.AsyncMock(return_value=[('foo', 3)])
+        completer = MultipleSelectionCompleter(inner)
+        actual = await completer.complete_async('bar, f', 6)
+        inner.complete_async.assert_awaited_once_with('f', 1)
+        self.assertListEqual(actual, [('bar, foo, ', 10)])
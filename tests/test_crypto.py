@@ -365,6 +365,99 @@ class TestGetKey(unittest.TestCase):
         self.assertEqual(cm.exception.code, GPGCode.NOT_FOUND)
 
 
+class TestKeyringIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = crypto.KeyringIndex(size=2)
+        self.key = make_key()
+        self.key.fpr = FPR
+
+    def _patch_get_key(self, **kwargs):
+        kwargs.setdefault('return_value', self.key)
+        return mock.patch('alot.crypto._get_key', mock.Mock(**kwargs))
+
+    def test_lookups_are_remembered(self):
+        with self._patch_get_key() as get_key:
+            self.index.get_key('a')
+            self.assertIs(self.index.get_key('a'), self.key)
+        get_key.assert_called_once()
+
+    def test_lookups_by_fingerprint_use_earlier_lookups(self):
+        with self._patch_get_key() as get_key:
+            self.index.get_key('me@example.com', validate=True)
+            self.index.get_key(FPR, validate=True)
+        get_key.assert_called_once()
+
+    def test_validation_arguments_are_part_of_the_lookup(self):
+        with self._patch_get_key() as get_key:
+            self.index.get_key('a')
+            self.index.get_key('a', validate=True, encrypt=True)
+        self.assertEqual(get_key.call_count, 2)
+
+    def test_failed_lookups_are_remembered(self):
+        problem = GPGProblem('not found', code=GPGCode.NOT_FOUND)
+        with self._patch_get_key(side_effect=problem) as get_key:
+            for _ in range(2):
+                with self.assertRaises(GPGProblem) as caught:
+                    self.index.get_key('a')
+                self.assertEqual(caught.exception.code, GPGCode.NOT_FOUND)
+        get_key.assert_called_once()
+
+    def test_index_is_cleared_when_the_keyring_changes(self):
+        with self._patch_get_key() as get_key, \
+                mock.patch.object(self.index, '_keyring_stamp',
+                                  mock.Mock(side_effect=[1, 1, 2])):
+            for _ in range(3):
+                self.index.get_key('a')
+        self.assertEqual(get_key.call_count, 2)
+
+    def test_keyboxd_database_is_part_of_the_stamp(self):
+        home = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, home)
+        os.mkdir(os.path.join(home, 'public-keys.d'))
+        for name in ['pubring.db', 'pubring.db-wal']:
+            path = os.path.join(home, 'public-keys.d', name)
+            open(path, 'w').close()
+            os.utime(path, ns=(0, 0))
+        with mock.patch.dict(os.environ, {'GNUPGHOME': home}):
+            stamp = self.index.stamp()
+            for name in ['pubring.db', 'pubring.db-wal']:
+                os.utime(os.path.join(home, 'public-keys.d', name),
+                         ns=(0, 10 ** 9))
+                self.assertNotEqual(self.index.stamp(), stamp)
+                stamp = self.index.stamp()
+
+    def test_least_recently_used_lookups_are_dropped(self):
+        with self._patch_get_key(side_effect=lambda *args, **kwargs: self.key
+                                 ) as get_key:
+            for keyid in ['a', 'b', 'a', 'c', 'a', 'b']:
+                self.index.get_key(keyid, signed_only=True)
+        looked_up = [c[0][2] for c in get_key.call_args_list]
+        self.assertListEqual(looked_up, ['a', 'b', 'c', 'b'])
+
+    def test_uid_validity_is_remembered(self):
+        with mock.patch('alot.crypto.check_uid_validity',
+                        mock.Mock(return_value=True)) as check:
+            self.assertTrue(self.index.check_uid_validity(self.key, 'a@b'))
+            self.assertTrue(self.index.check_uid_validity(self.key, 'a@b'))
+        check.assert_called_once_with(self.key, 'a@b')
+
+    def test_keyring(self):
+        index = crypto.KeyringIndex()
+        self.assertEqual(index.get_key(FPR).fpr, FPR)
+        self.assertEqual(len(index.list_keys(hint='ambig')), 2)
+        self.assertIs(index.list_keys(hint='ambig'),
+                      index.list_keys(hint='ambig'))
+
+    def test_cached_lookups_use_the_shared_index(self):
+        with mock.patch.object(crypto.keyring, 'get_key',
+                               mock.Mock(return_value=self.key)) as get_key:
+            self.assertIs(crypto.get_key('a', sign=True, cached=True),
+                          self.key)
+        get_key.assert_called_once_with('a', validate=False, encrypt=False,
+                                        sign=True, signed_only=False)
+
+
 class TestEncrypt(unittest.TestCase):
 
     def test_encrypt(self):
@@ -18,12 +18,22 @@
 """Test suite for alot.helper module."""
 
 import datetime
+import email
+import email.encoders
+import email.policy
+from email.mime.base import MIMEBase
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
 import errno
 import os
 import random
+import shutil
+import sys
+import tempfile
 import unittest
 from unittest import mock
 
+from alot import errors
 from alot import helper
 
 from . import utilities
@@ -345,6 +355,14 @@ class TestCallCmd(unittest.TestCase):
         self.assertEqual(err, '')
         self.assertEqual(code, 0)
 
+    def test_stdin_file(self):
+        with tempfile.TemporaryFile() as f:
+            f.write('�'.encode('utf-8'))
+            f.seek(0)
+            out, err, code = helper.call_cmd(['cat'], stdin=f)
+        self.assertEqual(out, '�')
+        self.assertEqual(code, 0)
+
     def test_no_such_command(self):
         out, err, code = helper.call_cmd(['thiscommandabsolutelydoesntexist'])
         self.assertEqual(out, '')
@@ -422,6 +440,14 @@ class TestCallCmdAsync(unittest.TestCase):
         ret = await helper.call_cmd_async(['cat', '-'], stdin='foo')
         self.assertEqual(ret[0], 'foo')
 
+    @utilities.async_test
+    async def test_stdin_file(self):
+        with tempfile.TemporaryFile() as f:
+            f.write(b'foo')
+            f.seek(0)
+            ret = await helper.call_cmd_async(['cat', '-'], stdin=f)
+        self.assertEqual(ret[0], 'foo')
+
     @utilities.async_test
     async def test_env_set(self):
         with mock.patch.dict(os.environ, {}, clear=True):
@@ -480,3 +506,130 @@ class TestParseMailto(unittest.TestCase):
                      'Subject': ['Re: Hello'],
                      'In-reply-to': ['<C8CE9EFD-CB23-4BC0-B70D-9B7FEAD59F8C@example.org>']}, '')
         self.assertEqual(actual, expected)
+
+
+class TestMagic(unittest.TestCase):
+
+    def setUp(self):
+        # start every test with fresh handles
+        patcher = mock.patch('alot.helper._magic_handles',
+                             helper.threading.local())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_guess_mimetype(self):
+        self.assertEqual(helper.guess_mimetype(b'%PDF-1.4\n'),
+                         'application/pdf')
+
+    def test_guess_encoding(self):
+        self.assertEqual(helper.guess_encoding('äöü'.encode('utf-8')),
+                         'utf-8')
+
+    def test_magic_handle_is_reused(self):
+        with mock.patch('alot.helper.magic.Magic',
+                        wraps=helper.magic.Magic) as magic_cls, \
+                mock.patch('alot.helper.magic.open',
+                           wraps=getattr(helper.magic, 'open', None),
+                           create=True) as magic_open:
+            for _ in range(3):
+                helper.guess_mimetype(b'some text\n')
+        self.assertEqual(magic_cls.call_count + magic_open.call_count, 1)
+
+    def test_only_the_start_is_looked_at(self):
+        detect = mock.Mock(return_value='text/plain')
+        with mock.patch('alot.helper._magic_detector',
+                        mock.Mock(return_value=detect)):
+            helper.guess_mimetype(b'x' * (helper.MAGIC_SAMPLE_SIZE * 4))
+        sample = detect.call_args[0][0]
+        self.assertEqual(len(sample), helper.MAGIC_SAMPLE_SIZE)
+
+    def test_sample_does_not_split_characters(self):
+        blob = b'x' * (helper.MAGIC_SAMPLE_SIZE - 1) + 'ä'.encode('utf-8') * 2
+        sample = helper._magic_sample(blob)
+        self.assertEqual(len(sample), helper.MAGIC_SAMPLE_SIZE - 1)
+
+    def test_non_ascii_after_the_sample_is_detected(self):
+        blob = b'x' * helper.MAGIC_SAMPLE_SIZE + 'ä'.encode('utf-8')
+        self.assertEqual(helper.guess_encoding(blob), 'utf-8')
+
+    def test_try_decode_retries_with_the_whole_blob(self):
+        blob = 'ä'.encode('utf-8') * helper.MAGIC_SAMPLE_SIZE + \
+            'ä and more'.encode('latin-1')
+        self.assertEqual(helper.try_decode(blob), blob.decode('latin-1'))
+
+
+class TestSpooledMail(unittest.TestCase):
+
+    def setUp(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        self.path = os.path.join(tmpdir, 'data.bin')
+        self.data = bytes(range(256)) * 1000
+        with open(self.path, 'wb') as f:
+            f.write(self.data)
+
+    def _mail(self, attachment):
+        mail = MIMEMultipart('mixed', boundary='outer')
+        mail['From'] = 'foo@example.com'
+        mail['Subject'] = 'a long subject ' * 10
+        inner = MIMEMultipart('alternative', boundary='inner')
+        inner.attach(MIMEText('plain'))
+        inner.attach(MIMEText('<p>html</p>', 'html'))
+        mail.attach(inner)
+        attachment.add_header('Content-Disposition', 'attachment',
+                              filename='data.bin')
+        mail.attach(attachment)
+        return mail
+
+    def test_mimewrap_leaves_binary_content_in_the_file(self):
+        part = helper.mimewrap(self.path)
+        self.assertIsInstance(part, helper.FilePart)
+        self.assertEqual(part.get_filename(), 'data.bin')
+        self.assertEqual(part.get_payload(decode=True), self.data)
+
+    def test_mimewrap_reads_text(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'some text\n')
+        part = helper.mimewrap(self.path)
+        self.assertEqual(part.get_content_type(), 'text/plain')
+        self.assertEqual(part.get_payload(decode=True), b'some text\n')
+
+    def test_file_part_is_encoded_like_other_parts(self):
+        part = MIMEBase('application', 'octet-stream')
+        part.set_payload(self.data)
+        email.encoders.encode_base64(part)
+        expected = self._mail(part).as_bytes(
+            policy=email.policy.SMTP.clone(max_line_length=sys.maxsize))
+
+        mail = self._mail(helper.FilePart(self.path, 'application',
+                                          'octet-stream'))
+        self.assertEqual(helper.SpooledMail(mail).as_bytes(), expected)
+
+    def test_file_part_is_read_in_chunks(self):
+        part = helper.FilePart(self.path, 'application', 'octet-stream')
+        with mock.patch.object(helper.FilePart, 'get_payload') as payload:
+            helper.SpooledMail(self._mail(part))
+        payload.assert_not_called()
+
+    def test_changed_file_part_is_not_read(self):
+        part = helper.FilePart(self.path, 'application', 'octet-stream')
+        with open(self.path, 'ab') as f:
+            f.write(b'more')
+        with self.assertRaises(errors.AttachmentChanged):
+            helper.SpooledMail(self._mail(part))
+        with self.assertRaises(errors.AttachmentChanged):
+            part.get_payload(decode=True)
+
+    def test_removed_file_part_is_not_read(self):
+        part = helper.FilePart(self.path, 'application', 'octet-stream')
+        os.remove(self.path)
+        self.assertEqual(part.get_size(), len(self.data))
+        with self.assertRaises(errors.AttachmentChanged):
+            helper.SpooledMail(self._mail(part))
+
+    def test_headers(self):
+        part = helper.FilePart(self.path, 'application', 'octet-stream')
+        spool = helper.SpooledMail(self._mail(part))
+        self.assertEqual(spool.headers['From'], 'foo@example.com')
+        self.assertEqual(
+            email.message_from_string(str(spool))['From'], 'foo@example.com')
@@ -0,0 +1,169 @@
+# This file is released under the GNU GPL, version 3 or a later revision.
+# For further details see the COPYING file
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from alot import outbox
+
+from . import utilities
+
+
+MAIL = ('From: me@example.com\n'
+        'To: you@example.com\n'
+        'Subject: test\n'
+        '\n'
+        'body\n')
+
+
+class TestOutbox(unittest.TestCase):
+
+    def setUp(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        self.path = os.path.join(tmpdir, 'outbox')
+        self.outbox = outbox.Outbox(self.path)
+        self.addCleanup(self.outbox.stop)
+
+    async def _wait_for(self, condition):
+        for _ in range(100):
+            if condition():
+                return
+            await asyncio.sleep(0.01)
+        self.fail('condition not met')
+
+    def test_queued_mails_are_kept(self):
+        self.outbox.add(MAIL, 'me@example.com', tags=['sent'],
+                        replied='<id@example.com>')
+        entry, = outbox.Outbox(self.path).entries
+        self.assertEqual(entry.account, 'me@example.com')
+        self.assertEqual(entry.tags, ['sent'])
+        self.assertEqual(entry.replied, '<id@example.com>')
+        self.assertEqual(entry.headers['Subject'], 'test')
+        mail = outbox.Outbox(self.path).get_mail(entry)
+        self.addCleanup(mail.close)
+        self.assertEqual(mail.as_bytes().decode(), MAIL)
+
+    def test_mails_without_metadata_are_sent_from_their_sender(self):
+        entry = self.outbox.add(MAIL, 'other@example.com')
+        os.remove(self.outbox._metafile(entry.key))
+        entry, = outbox.Outbox(self.path).entries
+        self.assertEqual(entry.account, 'me@example.com')
+
+    @utilities.async_test
+    async def test_sent_mails_are_removed(self):
+        sent = []
+
+        async def deliver(entry):
+            sent.append(entry.key)
+
+        entry = self.outbox.add(MAIL, 'me@example.com')
+        self.outbox.start(deliver)
+        await self._wait_for(lambda: not self.outbox.entries)
+        self.assertEqual(sent, [entry.key])
+        self.assertEqual(outbox.Outbox(self.path).entries, [])
+
+    @utilities.async_test
+    async def test_failed_mails_are_retried_later(self):
+        async def deliver(entry):
+            raise OSError('connection refused')
+
+        entry = self.outbox.add(MAIL, 'me@example.com')
+        self.outbox.start(deliver)
+        await self._wait_for(lambda: entry.attempts and not entry.sending)
+        self.assertEqual(entry.attempts, 1)
+        self.assertEqual(entry.error, 'connection refused')
+        self.assertGreater(entry.next_attempt,
+                           time.time() + self.outbox.RETRY_DELAY - 5)
+        kept, = outbox.Outbox(self.path).entries
+        self.assertEqual(kept.attempts, 1)
+
+    @utilities.async_test
+    async def test_failures_are_reported(self):
+        failed = []
+
+        async def deliver(entry):
+            raise OSError('connection refused')
+
+        entry = self.outbox.add(MAIL, 'me@example.com')
+        self.outbox.on_failure = failed.append
+        self.outbox.start(deliver)
+        with self.assertLogs(level='WARNING') as logs:
+            await self._wait_for(lambda: failed)
+        self.assertEqual(failed, [entry])
+        self.assertIn('connection refused', logs.output[0])
+
+    @utilities.async_test
+    async def test_retry_sends_right_away(self):
+        failing = True
+
+        async def deliver(entry):
+            if failing:
+                raise OSError('connection refused')
+
+        entry = self.outbox.add(MAIL, 'me@example.com')
+        self.outbox.start(deliver)
+        await self._wait_for(lambda: entry.attempts and not entry.sending)
+        failing = False
+        self.outbox.retry(entry)
+        await self._wait_for(lambda: not self.outbox.entries)
+
+    @utilities.async_test
+    async def test_concurrency_is_limited_per_account(self):
+        self.outbox.concurrency = 2
+        running = {'me@example.com': 0, 'other@example.com': 0}
+        most = dict(running)
+        done = asyncio.Event()
+
+        async def deliver(entry):
+            running[entry.account] += 1
+            most[entry.account] = max(most[entry.account],
+                                      running[entry.account])
+            await done.wait()
+            running[entry.account] -= 1
+
+        for _ in range(3):
+            self.outbox.add(MAIL, 'me@example.com')
+        self.outbox.add(MAIL, 'other@example.com')
+        self.outbox.start(deliver)
+        await self._wait_for(lambda: sum(running.values()) == 3)
+        done.set()
+        await self._wait_for(lambda: not self.outbox.entries)
+        self.assertEqual(most, {'me@example.com': 2, 'other@example.com': 1})
+
+    @utilities.async_test
+    async def test_shutdown_waits_for_mails_being_sent(self):
+        started = asyncio.Event()
+
+        async def deliver(entry):
+            started.set()
+            await asyncio.sleep(0.05)
+
+        self.outbox.add(MAIL, 'me@example.com')
+        self.outbox.start(deliver)
+        await started.wait()
+        self.assertEqual(await self.outbox.shutdown(), 0)
+        self.assertEqual(self.outbox.entries, [])
+        self.assertEqual(outbox.Outbox(self.path).entries, [])
+
+    @utilities.async_test
+    async def test_shutdown_gives_up_after_a_while(self):
+        started = asyncio.Event()
+        done = asyncio.Event()
+
+        async def deliver(entry):
+            started.set()
+            await done.wait()
+
+        self.outbox.SHUTDOWN_TIMEOUT = 0.01
+        self.outbox.add(MAIL, 'me@example.com')
+        self.outbox.start(deliver)
+        await started.wait()
+        with self.assertLogs(level='WARNING'):
+            self.assertEqual(await self.outbox.shutdown(), 1)
+        self.assertEqual(len(outbox.Outbox(self.path).entries), 1)
+        done.set()
+        await self._wait_for(lambda: not self.outbox.entries)
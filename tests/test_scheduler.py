@@ -0,0 +1,83 @@
+# This file is released under the GNU GPL, version 3 or a later revision.
+# For further details see the COPYING file
+
+"""Tests for the alot.scheduler module."""
+
+import asyncio
+import unittest
+
+from alot.scheduler import IdleScheduler, Job
+
+from . import utilities
+
+
+class TestIdleScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.scheduler = IdleScheduler(idle_delay=0.05)
+        self.log = []
+
+    def _job(self, name, steps):
+        for i in range(steps):
+            self.log.append((name, i))
+            yield
+
+    async def _finish(self, *jobs):
+        while not all(job.finished for job in jobs):
+            await asyncio.sleep(0)
+
+    @utilities.async_test
+    async def test_jobs_run_by_priority(self):
+        low = self.scheduler.schedule(self._job('low', 2), priority=5)
+        high = self.scheduler.schedule(self._job('high', 2), priority=1)
+        await self._finish(low, high)
+        self.assertEqual([name for name, _ in self.log],
+                         ['high', 'high', 'low', 'low'])
+        self.assertEqual(low.state, Job.DONE)
+
+    @utilities.async_test
+    async def test_jobs_yield_after_their_budget(self):
+        first = self.scheduler.schedule(self._job('a', 3), budget=0)
+        second = self.scheduler.schedule(self._job('b', 3), budget=0)
+        await self._finish(first, second)
+        self.assertEqual([name for name, _ in self.log],
+                         ['a', 'b', 'a', 'b', 'a', 'b'])
+        self.assertEqual(first.slices, 4)
+
+    @utilities.async_test
+    async def test_cancelled_jobs_stop(self):
+        job = self.scheduler.schedule(self._job('a', 100), budget=0)
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        job.cancel()
+        await asyncio.sleep(0)
+        self.assertEqual(job.state, Job.CANCELLED)
+        self.assertLess(len(self.log), 100)
+        self.assertEqual(self.scheduler.jobs(), [])
+
+    @utilities.async_test
+    async def test_jobs_wait_for_input_to_settle(self):
+        self.scheduler.input_received()
+        job = self.scheduler.schedule(self._job('a', 1))
+        await asyncio.sleep(0.01)
+        self.assertEqual(self.log, [])
+        self.assertEqual(self.scheduler.jobs(), [job])
+        await asyncio.sleep(0.06)
+        self.assertEqual(job.state, Job.DONE)
+
+    @utilities.async_test
+    async def test_failing_jobs_are_dropped(self):
+        def fail():
+            yield
+            raise ValueError()
+        job = self.scheduler.schedule(fail())
+        other = self.scheduler.schedule(self._job('a', 1))
+        await self._finish(job, other)
+        self.assertEqual(job.state, Job.FAILED)
+        self.assertEqual(other.state, Job.DONE)
+
+    def test_jobs_describe_themselves(self):
+        job = self.scheduler.schedule(self._job('a', 1), name='count',
+                                      priority=3)
+        self.assertIn('count', str(job))
+        self.assertIn('queued', str(job))
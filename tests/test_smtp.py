@@ -0,0 +1,148 @@
+# This file is released under the GNU GPL, version 3 or a later revision.
+# For further details see the COPYING file
+import asyncio
+import io
+import unittest
+
+from alot import smtp
+
+from . import utilities
+
+
+MAIL = (b'From: me@example.com\n'
+        b'To: you@example.com\n'
+        b'Bcc: secret@example.com,\n'
+        b' other@example.com\n'
+        b'Subject: test\n'
+        b'\n'
+        b'.hidden dot\n'
+        b'body\n')
+
+
+class TestSMTPPool(unittest.TestCase):
+
+    async def _server(self, **kwargs):
+        server = await utilities.FakeSMTPServer(**kwargs).start()
+        self.addCleanup(utilities.async_test(server.stop))
+        return server
+
+    async def _send(self, pool, recipients=('you@example.com',)):
+        await pool.send('me@example.com', list(recipients), io.BytesIO(MAIL),
+                        hidden=['Bcc'])
+
+    @utilities.async_test
+    async def test_mail_is_sent(self):
+        server = await self._server()
+        await self._send(smtp.SMTPPool(server.url))
+        self.assertEqual(len(server.mails), 1)
+        sender, recipients, data = server.mails[0]
+        self.assertEqual(sender, 'me@example.com')
+        self.assertEqual(recipients, ['you@example.com'])
+        self.assertEqual(data, MAIL.replace(b'\n', b'\r\n').replace(
+            b'Bcc: secret@example.com,\r\n other@example.com\r\n', b''))
+
+    @utilities.async_test
+    async def test_connection_is_reused(self):
+        server = await self._server()
+        pool = smtp.SMTPPool(server.url)
+        for _ in range(3):
+            await self._send(pool)
+        self.assertEqual(len(server.mails), 3)
+        self.assertEqual(server.connections, 1)
+
+    @utilities.async_test
+    async def test_without_pipelining(self):
+        server = await self._server(pipelining=False)
+        await self._send(smtp.SMTPPool(server.url))
+        self.assertEqual(len(server.mails), 1)
+
+    @utilities.async_test
+    async def test_rejected_recipients_fail_the_mail(self):
+        server = await self._server(reject=['nobody@example.com'])
+        pool = smtp.SMTPPool(server.url)
+        with self.assertRaisesRegex(smtp.SMTPError, '550 no such user'):
+            await self._send(pool, ['you@example.com', 'nobody@example.com'])
+        self.assertEqual(server.mails, [])
+        await self._send(pool)
+        self.assertEqual(len(server.mails), 1)
+
+    @utilities.async_test
+    async def test_connection_is_reused_after_rejected_mails(self):
+        server = await self._server(reject=['nobody@example.com'])
+        pool = smtp.SMTPPool(server.url)
+        with self.assertRaises(smtp.SMTPError):
+            await self._send(pool, ['nobody@example.com'])
+        await self._send(pool)
+        self.assertEqual(len(server.mails), 1)
+        self.assertEqual(server.connections, 1)
+
+    @utilities.async_test
+    async def test_closed_connections_are_replaced(self):
+        server = await self._server()
+        pool = smtp.SMTPPool(server.url)
+        await self._send(pool)
+        server.drop_connections()
+        await self._send(pool)
+        self.assertEqual(len(server.mails), 2)
+        self.assertEqual(server.connections, 2)
+
+    @utilities.async_test
+    async def test_lmtp(self):
+        server = await self._server(lmtp=True)
+        await self._send(smtp.SMTPPool(server.url),
+                         ['you@example.com', 'other@example.com'])
+        self.assertEqual(server.mails[0][1],
+                         ['you@example.com', 'other@example.com'])
+        self.assertIn('LHLO', server.commands[0])
+
+    @utilities.async_test
+    async def test_ascii_addresses_do_not_need_smtputf8(self):
+        server = await self._server(smtputf8=True)
+        await self._send(smtp.SMTPPool(server.url))
+        self.assertNotIn('SMTPUTF8', server.commands[1])
+
+    @utilities.async_test
+    async def test_non_ascii_addresses_use_smtputf8(self):
+        server = await self._server(smtputf8=True)
+        await self._send(smtp.SMTPPool(server.url), ['jürgen@example.com'])
+        self.assertIn('SMTPUTF8', server.commands[1])
+        self.assertEqual(server.mails[0][1], ['jürgen@example.com'])
+
+    @utilities.async_test
+    async def test_non_ascii_addresses_need_smtputf8(self):
+        server = await self._server()
+        with self.assertRaisesRegex(smtp.SMTPError, 'non-ascii'):
+            await self._send(smtp.SMTPPool(server.url),
+                             ['jürgen@example.com'])
+        self.assertEqual(server.mails, [])
+
+    @utilities.async_test
+    async def test_close_quits_idle_connections(self):
+        server = await self._server()
+        pool = smtp.SMTPPool(server.url)
+        await self._send(pool)
+        await pool.close()
+        self.assertEqual(server.commands[-1], 'QUIT')
+
+    @utilities.async_test
+    async def test_close_quits_busy_connections_when_they_are_done(self):
+        server = await self._server()
+        pool = smtp.SMTPPool(server.url)
+        sending = asyncio.ensure_future(self._send(pool))
+        await asyncio.sleep(0)
+        await pool.close()
+        await sending
+        for _ in range(100):
+            if server.commands[-1] == 'QUIT':
+                break
+            await asyncio.sleep(0.01)
+        self.assertEqual(server.commands[-1], 'QUIT')
+        self.assertEqual(len(server.mails), 1)
+
+    @utilities.async_test
+    async def test_unreachable_server(self):
+        server = await self._server()
+        url = server.url
+        await server.stop()
+        with self.assertRaisesRegex(smtp.SMTPError, 'could not connect'):
+            await self._send(smtp.SMTPPool(url))
@@ -0,0 +1,148 @@
+# This file is released under the GNU GPL, version 3 or a later revision.
+# For further details see the COPYING file
+
+"""Tests for the alot.ui module."""
+
+import asyncio
+import unittest
+from unittest import mock
+
+import urwid
+
+from alot import ui
+
+from . import utilities
+
+
+def _make_ui():
+    """create a UI without setting up (and running) urwid's main loop"""
+    interface = ui.UI.__new__(ui.UI)
+    interface.dbman = mock.Mock()
+    interface.dbman.count_messages.return_value = 10
+    interface.dbman.writequeue = []
+    interface.dbman.imports = []
+    interface.buffers = []
+    interface.current_buffer = None
+    interface.input_queue = []
+    interface._notificationbar = None
+    interface._show_statusbar = True
+    interface._redraw_handle = None
+    interface._redraw_screen = False
+    interface._last_redraw = 0
+    interface._statusbar = (None, None)
+    interface._footer = None
+    interface.root_widget = urwid.AttrMap(urwid.Frame(urwid.SolidFill()),
+                                          None)
+    interface.mainloop = mock.Mock()
+    interface.mainloop.screen.started = True
+    return interface
+
+
+class TestUIUpdate(unittest.TestCase):
+
+    def setUp(self):
+        self.ui = _make_ui()
+        settings = {'redraw_max_fps': 0}
+        patches = [
+            mock.patch.object(ui.settings, 'get',
+                              mock.Mock(side_effect=settings.get)),
+            mock.patch.object(ui.settings, 'get_theming_attribute',
+                              mock.Mock(return_value=None)),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_update_draws_right_away_without_event_loop(self):
+        self.ui.update()
+        self.ui.mainloop.draw_screen.assert_called_once_with()
+
+    @utilities.async_test
+    async def test_updates_are_coalesced(self):
+        for _ in range(10):
+            self.ui.update()
+        self.ui.mainloop.draw_screen.assert_not_called()
+        await asyncio.sleep(0)
+        self.ui.mainloop.draw_screen.assert_called_once_with()
+
+    @utilities.async_test
+    async def test_update_without_redraw_does_not_draw(self):
+        self.ui.update(redraw=False)
+        await asyncio.sleep(0)
+        self.ui.mainloop.draw_screen.assert_not_called()
+        self.assertIsNotNone(self.ui.root_widget.original_widget.footer)
+
+    def test_statusbar_is_reused_while_unchanged(self):
+        first = self.ui.build_statusbar()
+        self.assertIs(self.ui.build_statusbar(), first)
+        self.ui.dbman.writequeue.append('tag')
+        self.assertIsNot(self.ui.build_statusbar(), first)
+
+    def test_footer_is_kept_while_unchanged(self):
+        self.ui.update()
+        footer = self.ui.root_widget.original_widget.footer
+        self.ui.update()
+        self.assertIs(self.ui.root_widget.original_widget.footer, footer)
+
+    @utilities.async_test
+    async def test_redraws_are_rate_limited(self):
+        ui.settings.get.side_effect = {'redraw_max_fps': 20}.get
+        self.ui.update()
+        await asyncio.sleep(0)
+        self.ui.mainloop.draw_screen.assert_called_once_with()
+        self.ui.update()
+        await asyncio.sleep(0)
+        self.ui.mainloop.draw_screen.assert_called_once_with()
+        await asyncio.sleep(0.1)
+        self.assertEqual(self.ui.mainloop.draw_screen.call_count, 2)
+
+
+class TestUIOutbox(unittest.TestCase):
+
+    def test_failed_mails_are_notified(self):
+        interface = _make_ui()
+        interface.notify = mock.Mock()
+        entry = mock.Mock(error='connection refused\ndetails',
+                          next_attempt=0,
+                          headers={'Subject': 'hello'})
+        interface._outbox_failed(entry)
+        message = interface.notify.call_args[0][0]
+        self.assertTrue(message.startswith(
+            'could not send "hello": connection refused (retrying at '))
+        self.assertEqual(interface.notify.call_args[1],
+                         {'priority': 'error'})
+
+    @utilities.async_test
+    async def test_exit_waits_for_mails_being_sent(self):
+        interface = _make_ui()
+        interface.notify = mock.Mock()
+        interface.clear_notify = mock.Mock()
+        shutdowns = []
+
+        async def shutdown():
+            shutdowns.append(True)
+            return 0
+
+        queue = mock.Mock(entries=[mock.Mock(sending=True)],
+                          shutdown=shutdown)
+        with mock.patch('alot.ui.outbox', queue):
+            await interface.finish_sending()
+        self.assertEqual(shutdowns, [True])
+        interface.clear_notify.assert_called_once_with(
+            [interface.notify.return_value])
+
+    @utilities.async_test
+    async def test_exit_closes_the_accounts(self):
+        interface = _make_ui()
+        closed = []
+
+        class Account:
+            async def close(self):
+                closed.append(self)
+
+        accounts = [Account(), Account()]
+        with mock.patch('alot.ui.outbox', mock.Mock(entries=[])), \
+                mock.patch.object(ui.settings, 'get_accounts',
+                                  mock.Mock(return_value=accounts)):
+            await interface.finish_sending()
+        self.assertEqual(closed, accounts)
@@ -0,0 +1,199 @@
+# This file is released under the GNU GPL, version 3 or a later revision.
+# For further details see the COPYING file
+
+"""Tests for the alot.walker module."""
+
+import asyncio
+import unittest
+
+import urwid
+
+from alot.walker import IterableWalker
+
+from . import utilities
+
+
+class _Line(urwid.Text):
+    def __init__(self, value):
+        super().__init__(str(value))
+        self.value = value
+
+
+def _walker(count, **kwargs):
+    return IterableWalker(iter(range(count)), _Line,
+                          key=lambda value: value, **kwargs)
+
+
+class TestIterableWalker(unittest.TestCase):
+
+    def _consume(self, walker):
+        while walker._get_next_item() is not None:
+            pass
+
+    def test_lines_are_consumed_lazily(self):
+        walker = _walker(10)
+        walker.get_focus()
+        widget, pos = walker.get_next(0)
+        self.assertEqual((widget.value, pos), (1, 1))
+        self.assertEqual(len(walker.get_lines()), 2)
+
+    def test_get_position_by_key(self):
+        walker = _walker(10)
+        self._consume(walker)
+        self.assertEqual(walker.get_position(7), 7)
+        self.assertIsNone(walker.get_position(11))
+
+    def test_contains_uses_object_identity(self):
+        walker = _walker(3)
+        self._consume(walker)
+        line = walker.get_lines()[1]
+        self.assertIn(line, walker)
+        self.assertNotIn(_Line(1), walker)
+
+    def test_removed_lines_are_skipped(self):
+        walker = _walker(5)
+        self._consume(walker)
+        walker.remove(walker.get_lines()[2])
+        widget, pos = walker.get_next(1)
+        self.assertEqual(widget.value, 3)
+        widget, pos = walker.get_prev(3)
+        self.assertEqual(widget.value, 1)
+        self.assertEqual([l.value for l in walker.get_lines()], [0, 1, 3, 4])
+        self.assertIsNone(walker.get_position(2))
+
+    def test_remove_focussed_line_moves_focus_to_next(self):
+        walker = _walker(5)
+        self._consume(walker)
+        walker.set_focus(2)
+        walker.remove(walker.get_lines()[2])
+        self.assertEqual(walker.get_focus()[0].value, 3)
+
+    def test_remove_focussed_line_consumes_next(self):
+        walker = _walker(5)
+        walker.get_focus()
+        walker.remove(walker.get_lines()[0])
+        self.assertEqual(walker.get_focus()[0].value, 1)
+
+    def test_remove_last_line_moves_focus_to_previous(self):
+        walker = _walker(3)
+        self._consume(walker)
+        walker.set_focus(2)
+        walker.remove(walker.get_lines()[2])
+        self.assertEqual(walker.get_focus()[0].value, 1)
+
+    def test_compaction_keeps_focus_and_index(self):
+        walker = _walker(200)
+        self._consume(walker)
+        walker.set_focus(150)
+        for value in range(0, 101):
+            walker.remove(walker.lines[walker.get_position(value)])
+        self.assertNotIn(None, walker.lines)
+        self.assertEqual(len(walker.lines), 99)
+        self.assertEqual(walker.get_focus()[0].value, 150)
+        self.assertEqual(walker.get_position(199), 98)
+
+    def test_get_last_position(self):
+        walker = _walker(3)
+        self.assertIsNone(walker.get_last_position())
+        self._consume(walker)
+        walker.remove(walker.get_lines()[2])
+        self.assertEqual(walker.get_last_position(), 1)
+
+    def test_reset_reindexes_lines(self):
+        walker = _walker(3)
+        self._consume(walker)
+        lines = walker.get_lines()
+        walker.reset(iter([5]), [2, 0], [lines[2], lines[0]])
+        self.assertEqual(walker.get_position(2), 0)
+        self.assertIsNone(walker.get_position(1))
+        self._consume(walker)
+        self.assertEqual(walker.get_position(5), 2)
+
+    def test_reset_leaves_missing_lines_pending(self):
+        walker = _walker(3)
+        self._consume(walker)
+        walker.reset(iter([]), [1, 7], [walker.get_lines()[1], None])
+        self.assertEqual(len(walker.get_lines()), 1)
+        self.assertEqual(walker.get_next(0)[0].value, 7)
+
+    def test_find_reads_items_without_building_lines(self):
+        built = []
+        walker = IterableWalker(iter(range(100)), lambda v: built.append(v)
+                                or _Line(v), key=lambda value: value)
+        self.assertEqual(walker.find(50), 50)
+        self.assertEqual(built, [])
+        self.assertEqual(walker.get_position(20), 20)
+        walker.set_focus(50)
+        self.assertEqual(walker.get_focus()[0].value, 50)
+        self.assertEqual(walker.get_prev(50)[0].value, 49)
+        self.assertEqual(built, [50, 49])
+
+    def test_find_respects_limit(self):
+        walker = _walker(100)
+        self.assertIsNone(walker.find(50, limit=10))
+        self.assertEqual(len(walker.items), 10)
+        self.assertIsNone(walker.find(500))
+        self.assertTrue(walker.empty)
+
+    def test_read_all_and_last_position(self):
+        walker = _walker(1000)
+        walker.read_all()
+        self.assertEqual(walker.get_lines(), [])
+        last = walker.get_last_position()
+        self.assertEqual(last, 999)
+        walker.set_focus(last)
+        self.assertEqual(walker.get_focus()[0].value, 999)
+        self.assertEqual(len(walker.get_lines()), 1)
+
+    def test_window_evicts_lines_far_from_focus(self):
+        walker = _walker(1000, window=10)
+        walker.get_focus()
+        for pos in range(999):
+            walker.set_focus(walker.get_next(pos)[1])
+        self.assertLessEqual(len(walker.get_lines()), 4 * 10)
+        self.assertEqual(walker.get_focus()[0].value, 999)
+        self.assertIsNotNone(walker.get_position(0))
+        first = walker.get_lines()[0]
+        self.assertGreaterEqual(first.value, 999 - 4 * 10)
+
+    def test_window_rebuilds_evicted_lines(self):
+        walker = _walker(1000, window=10)
+        walker.read_all()
+        walker.set_focus(0)
+        line = walker.get_focus()[0]
+        walker.set_focus(999)
+        for pos in range(999, 949, -1):
+            walker.set_focus(walker.get_prev(pos)[1])
+        self.assertNotIn(line, walker)
+        walker.set_focus(0)
+        widget, pos = walker.get_focus()
+        self.assertEqual((widget.value, pos), (0, 0))
+        self.assertIsNot(widget, line)
+        self.assertIn(widget, walker)
+
+    @utilities.async_test
+    async def test_prefetch_reads_ahead_of_focus(self):
+        walker = _walker(100, prefetch=10)
+        walker.get_focus()
+        self.assertEqual(len(walker.lines), 1)
+        while walker._prefetch_job is not None:
+            await asyncio.sleep(0)
+        self.assertEqual(len(walker.lines), 11)
+
+    @utilities.async_test
+    async def test_prefetch_stops_at_end_of_iterable(self):
+        walker = _walker(5, prefetch=10)
+        walker.get_focus()
+        while walker._prefetch_job is not None:
+            await asyncio.sleep(0)
+        self.assertTrue(walker.empty)
+        self.assertEqual(len(walker.lines), 5)
+
+    @utilities.async_test
+    async def test_prefetch_can_be_cancelled(self):
+        walker = _walker(100, prefetch=10)
+        walker.get_focus()
+        walker.cancel_prefetch()
+        await asyncio.sleep(0)
+        self.assertIsNone(walker._prefetch_job)
+        self.assertEqual(len(walker.lines), 1)
@@ -189,3 +189,108 @@ def async_test(coro):
         return loop.run_until_complete(coro(*args, **kwargs))
 
     return _actual
+
+
+class FakeSMTPServer:
+    """
+    stand-in for an SMTP or LMTP server on localhost that accepts all mails,
+    except for the recipients in `reject`. If it announces pipelining, it
+    only replies to MAIL and RCPT commands once it got the DATA command.
+    """
+
+    def __init__(self, lmtp=False, pipelining=True, reject=(),
+                 smtputf8=False):
+        self.lmtp = lmtp
+        self.pipelining = pipelining
+        self.smtputf8 = smtputf8
+        self.reject = reject
+        self.connections = 0
+        self.commands = []
+        self.mails = []
+        """accepted mails as (sender, recipients, data) triples"""
+        self._server = None
+        self._writers = []
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, '127.0.0.1',
+                                                  0)
+        port = self._server.sockets[0].getsockname()[1]
+        self.url = '%s://127.0.0.1:%d' % ('lmtp' if self.lmtp else 'smtp',
+                                          port)
+        return self
+
+    def drop_connections(self):
+        """close all connections, as after an idle timeout"""
+        for writer in self._writers:
+            writer.close()
+        self._writers = []
+
+    async def stop(self):
+        self.drop_connections()
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        self._writers.append(writer)
+        writer.write(b'220 fake ready\r\n')
+        sender, recipients, pending = None, [], []
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            command = line.decode('utf-8').rstrip('\r\n')
+            self.commands.append(command)
+            verb = command[:4].upper()
+            if verb in ('EHLO', 'LHLO'):
+                extensions = ['8BITMIME']
+                if self.smtputf8:
+                    extensions.append('SMTPUTF8')
+                if self.pipelining:
+                    extensions.append('PIPELINING')
+                writer.write(b'250-fake\r\n' + b''.join(
+                    b'250%s%s\r\n' % (b' ' if i == len(extensions) - 1
+                                      else b'-', e.encode())
+                    for i, e in enumerate(extensions)))
+            elif verb == 'MAIL':
+                sender, recipients = command[11:].split('>')[0], []
+                pending.append(b'250 ok\r\n')
+            elif verb == 'RCPT':
+                recipient = command[9:].rstrip('>')
+                if recipient in self.reject:
+                    pending.append(b'550 no such user\r\n')
+                else:
+                    recipients.append(recipient)
+                    pending.append(b'250 ok\r\n')
+            elif verb == 'DATA':
+                if not recipients:
+                    pending.append(b'503 no valid recipients\r\n')
+                    writer.write(b''.join(pending))
+                    pending = []
+                    continue
+                writer.write(b''.join(pending) + b'354 go ahead\r\n')
+                pending = []
+                data = []
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        # the client hung up: drop the mail
+                        return
+                    if line == b'.\r\n':
+                        break
+                    data.append(line[1:] if line.startswith(b'.') else line)
+                self.mails.append((sender, recipients, b''.join(data)))
+                for _ in recipients if self.lmtp else [None]:
+                    writer.write(b'250 queued\r\n')
+            elif verb == 'RSET':
+                pending.append(b'250 ok\r\n')
+            elif verb == 'QUIT':
+                writer.write(b'221 bye\r\n')
+                writer.close()
+                break
+            else:
+                pending.append(b'500 unknown command\r\n')
+            if not self.pipelining or verb == 'RSET':
+                writer.write(b''.join(pending))
+                pending = []
+            await writer.drain()
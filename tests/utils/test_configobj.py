@@ -1,6 +1,8 @@
 # encoding=utf-8
 import unittest
 
+from validate import VdtTypeError
+
 from alot.utils import configobj as checks
 
 # Good descriptive test names often don't fit PEP8, which is meant to cover
@@ -17,3 +19,17 @@ class TestForceList(unittest.TestCase):
     def test_empty_strings_are_converted_to_empty_lists(self):
         forced = checks.force_list('')
         self.assertEqual(forced, [])
+
+
+class TestSubmissionURL(unittest.TestCase):
+
+    def test_smtp_and_lmtp_urls_are_accepted(self):
+        for url in ('smtp://localhost', 'smtp://localhost:587',
+                    'lmtp:///run/dovecot/lmtp'):
+            self.assertEqual(checks.submission_url(url), url)
+
+    def test_other_values_are_rejected(self):
+        for url in ('localhost', 'http://localhost', 'smtp://',
+                    'smtp://localhost:port'):
+            with self.assertRaises(VdtTypeError):
+                checks.submission_url(url)
@@ -0,0 +1,39 @@
+# This file is released under the GNU GPL, version 3 or a later revision.
+# For further details see the COPYING file
+"""Tests for alot.utils.lazy"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from alot.utils.lazy import lazy_import
+
+
+class TestLazyImport(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        with open(os.path.join(self.path, 'lazymod.py'), 'w') as f:
+            f.write('import sys\n'
+                    'sys.lazymod_loaded = True\n'
+                    'answer = 42\n')
+        sys.path.insert(0, self.path)
+        self.addCleanup(sys.path.remove, self.path)
+        self.addCleanup(sys.modules.pop, 'lazymod', None)
+        self.addCleanup(lambda: vars(sys).pop('lazymod_loaded', None))
+
+    def test_module_is_loaded_on_first_use(self):
+        module = lazy_import('lazymod')
+        self.assertFalse(hasattr(sys, 'lazymod_loaded'))
+        self.assertEqual(module.answer, 42)
+        self.assertTrue(sys.lazymod_loaded)
+
+    def test_imported_modules_are_reused(self):
+        self.assertIs(lazy_import('os'), os)
+
+    def test_missing_modules_raise_import_error(self):
+        with self.assertRaises(ImportError):
+            lazy_import('no_such_module_for_alot')
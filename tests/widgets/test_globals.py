@@ -16,11 +16,16 @@
 
 """Tests for the alot.widgets.globals module."""
 
+import asyncio
 import unittest
 from unittest import mock
 
+from alot.completion.completer import Completer
+from alot.errors import CompletionError
 from alot.widgets import globals as globals_
 
+from .. import utilities
+
 
 class TestTagWidget(unittest.TestCase):
 
@@ -48,3 +53,90 @@ class TestTagWidget(unittest.TestCase):
             # test should even test the correct thing if this is changed and
             # the hash is only computed in __hash__.
             hash(globals_.TagWidget('unread'))
+
+
+class SlowCompleter(Completer):
+    """completes 'f' to 'foo' and 'fun' once `done` is set"""
+
+    def __init__(self):
+        self.done = asyncio.Event()
+
+    def complete(self, original, pos):
+        return [('foo', 3), ('fun', 3)]
+
+    async def complete_async(self, original, pos):
+        await self.done.wait()
+        return self.complete(original, pos)
+
+
+class TestCompleteEdit(unittest.TestCase):
+
+    def _edit(self, completer, **kwargs):
+        return globals_.CompleteEdit(completer, on_exit=mock.Mock(),
+                                     edit_text='f', history=[], **kwargs)
+
+    def test_completes_synchronously_without_event_loop(self):
+        edit = self._edit(SlowCompleter())
+        edit.keypress((20,), 'tab')
+        self.assertEqual(edit.edit_text, 'foo')
+        edit.keypress((20,), 'tab')
+        self.assertEqual(edit.edit_text, 'fun')
+
+    @utilities.async_test
+    async def test_results_are_shown_when_ready(self):
+        completer = SlowCompleter()
+        on_update = mock.Mock()
+        edit = self._edit(completer, on_update=on_update)
+        edit.keypress((20,), 'tab')
+        await asyncio.sleep(0)
+        self.assertEqual(edit.edit_text, 'f')
+        completer.done.set()
+        await asyncio.sleep(0.01)
+        self.assertEqual(edit.edit_text, 'foo')
+        on_update.assert_called_once_with()
+
+    @utilities.async_test
+    async def test_tabs_while_waiting_are_applied(self):
+        completer = SlowCompleter()
+        edit = self._edit(completer)
+        edit.keypress((20,), 'tab')
+        edit.keypress((20,), 'tab')
+        completer.done.set()
+        await asyncio.sleep(0.01)
+        self.assertEqual(edit.edit_text, 'fun')
+
+    @utilities.async_test
+    async def test_typing_cancels_completion(self):
+        completer = SlowCompleter()
+        edit = self._edit(completer)
+        edit.set_edit_pos(1)
+        edit.keypress((20,), 'tab')
+        edit.keypress((20,), 'u')
+        completer.done.set()
+        await asyncio.sleep(0.01)
+        self.assertEqual(edit.edit_text, 'fu')
+        self.assertIsNone(edit.completions)
+
+    @utilities.async_test
+    async def test_timeout_is_reported(self):
+        on_error = mock.Mock()
+        edit = self._edit(SlowCompleter(), on_error=on_error, timeout=0.01)
+        edit.keypress((20,), 'tab')
+        await asyncio.sleep(0.1)
+        self.assertEqual(edit.edit_text, 'f')
+        self.assertIsInstance(on_error.call_args[0][0], CompletionError)
+
+    @utilities.async_test
+    async def test_cancelled_completion_leaves_the_next_one_alone(self):
+        completer = SlowCompleter()
+        edit = self._edit(completer)
+        edit.set_edit_pos(1)
+        edit.keypress((20,), 'tab')
+        edit.keypress((20,), 'u')
+        edit.keypress((20,), 'tab')
+        pending = edit._completion
+        await asyncio.sleep(0.01)
+        self.assertIs(edit._completion, pending)
+        completer.done.set()
+        await asyncio.sleep(0.01)
+        self.assertEqual(edit.edit_text, 'foo')